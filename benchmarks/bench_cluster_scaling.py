@@ -0,0 +1,158 @@
+"""
+Benchmark: thông lượng của cluster khi tăng số worker (1 -> N).
+
+Mỗi phòng có sẵn M người nghe. Các "người chơi churn" liên tục kết nối,
+LOGIN vào 1 phòng, chờ LOGIN_OK rồi ngắt; mỗi lần vào/ra phòng server
+phải broadcast INFO tới cả phòng. Đo số lượt login/giây và số gói INFO
+người nghe nhận được mỗi giây. Tải sinh từ nhiều tiến trình để bản thân
+bộ sinh tải không là nút cổ chai.
+
+Chạy từ thư mục gốc dự án (cần Linux vì cluster dùng socket.send_fds):
+    python benchmarks/bench_cluster_scaling.py --max-workers 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "src", "server.py")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol import FrameDecoder, encode
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Server không khởi động được")
+
+
+async def listener(port, room, counter, ready):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(encode({"type": "LOGIN", "name": "listener", "room": room}))
+    decoder = FrameDecoder()
+    ready.release()
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            return
+        counter[0] += len(decoder.feed(data))
+
+
+async def churn(port, rooms, index, stop_at, counter):
+    i = index
+    while time.perf_counter() < stop_at:
+        room = rooms[i % len(rooms)]
+        i += 1
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(encode({"type": "LOGIN", "name": f"bot{index}", "room": room}))
+            decoder = FrameDecoder()
+            while not decoder.feed(await reader.read(4096)):
+                pass
+            counter[0] += 1
+            writer.close()
+        except OSError:
+            counter[1] += 1
+
+
+async def load_main(port, rooms, listeners, concurrency, duration):
+    received = [0]
+    ready = asyncio.Semaphore(0)
+    tasks = [asyncio.ensure_future(listener(port, room, received, ready))
+             for room in rooms for _ in range(listeners)]
+    for _ in tasks:
+        await ready.acquire()
+    await asyncio.sleep(0.5)
+    received[0] = 0
+    stats = [0, 0]
+    stop_at = time.perf_counter() + duration
+    await asyncio.gather(*(churn(port, rooms, i, stop_at, stats) for i in range(concurrency)))
+    result = {"logins": stats[0], "errors": stats[1], "received": received[0]}
+    for t in tasks:
+        t.cancel()
+    return result
+
+
+def load_process(port, rooms, listeners, concurrency, duration, queue):
+    queue.put(asyncio.run(load_main(port, rooms, listeners, concurrency, duration)))
+
+
+def run(workers, args):
+    port = free_port()
+    # Người nghe chỉ đọc, không trả lời PING -> tắt heartbeat để không bị đóng giữa chừng
+    cmd = [sys.executable, SERVER, "--mode", "async", "--port", str(port), "--workers", str(workers),
+           "--heartbeat", "0"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdin=subprocess.PIPE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_port(port)
+        queue = multiprocessing.Queue()
+        procs = []
+        for p in range(args.load_procs):
+            rooms = [f"room-{p}-{r}" for r in range(args.rooms // args.load_procs)]
+            lp = multiprocessing.Process(target=load_process, args=(
+                port, rooms, args.listeners, args.concurrency, args.duration, queue))
+            lp.start()
+            procs.append(lp)
+        totals = {"logins": 0, "errors": 0, "received": 0}
+        for _ in procs:
+            for key, value in queue.get().items():
+                totals[key] += value
+        for lp in procs:
+            lp.join()
+        totals["workers"] = workers
+        totals["logins_per_s"] = round(totals["logins"] / args.duration)
+        totals["msgs_per_s"] = round(totals["received"] / args.duration)
+        return totals
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--rooms", type=int, default=40)
+    parser.add_argument("--listeners", type=int, default=50, help="Số người nghe mỗi phòng")
+    parser.add_argument("--concurrency", type=int, default=20, help="Số vòng churn song song mỗi tiến trình tải")
+    parser.add_argument("--load-procs", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    results = []
+    workers = 1
+    while workers <= args.max_workers:
+        results.append(run(workers, args))
+        workers *= 2
+
+    print(f"CPU: {os.cpu_count()}")
+    print(f"{'workers':>8}{'logins/s':>10}{'INFO/s':>10}{'errors':>8}")
+    for r in results:
+        print(f"{r['workers']:>8}{r['logins_per_s']:>10}{r['msgs_per_s']:>10}{r['errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
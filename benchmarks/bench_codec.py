@@ -0,0 +1,65 @@
+"""
+Benchmark: kích thước và thời gian mã hóa/giải mã của các codec (codec.py)
+so với đường json.dumps cũ, trên các gói tin tiêu biểu của game.
+
+    python benchmarks/bench_codec.py --players 500
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from codec import CODECS, decode_body
+
+
+def sample_messages(players):
+    with open(os.path.join(ROOT, "data", "questions.json"), encoding="utf-8") as f:
+        q = json.load(f)[0]
+    names = [f"Người chơi {i}" for i in range(players)]
+    return {
+        "ANSWER": {"type": "ANSWER", "question_id": q["id"], "answer": "C"},
+        "QUESTION": {"type": "QUESTION", "question": q["question"],
+                     "options": [q["options"][k] for k in sorted(q["options"])],
+                     "question_number": 7, "total_questions": 20, "time_limit": 15},
+        "RESULT": {"type": "RESULT", "correct": True, "points": 10, "score": 70, "rank": 12},
+        "ROUND_RESULT": {"type": "ROUND_RESULT", "question_number": 7, "correct_answer": "C",
+                         "distribution": {"A": players // 10, "B": players // 5, "C": players // 2, "D": players // 5},
+                         "total_players": players,
+                         "top": [{"name": n, "score": 1000 - 10 * i} for i, n in enumerate(names[:10])]},
+        "GAME_OVER": {"type": "GAME_OVER", "message": "Trò chơi kết thúc!",
+                      "leaderboard": [{"name": n, "score": 1000 - i} for i, n in enumerate(names)]},
+    }
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=500, help="Số người trong bảng GAME_OVER")
+    parser.add_argument("--number", type=int, default=2000, help="Số lần lặp mỗi phép đo")
+    args = parser.parse_args()
+
+    print(f"{'gói tin':<12} {'codec':<13} {'bytes':>7} {'% JSON':>7} {'mã hóa µs':>10} {'giải mã µs':>11}")
+    for label, message in sample_messages(args.players).items():
+        number = max(1, args.number // 50) if label == "GAME_OVER" else args.number
+        # Đường cũ: json.dumps(...).encode() / json.loads
+        baseline = json.dumps(message).encode("utf-8")
+        enc = per_call_us(lambda: json.dumps(message).encode("utf-8"), number)
+        dec = per_call_us(lambda: json.loads(baseline), number)
+        print(f"{label:<12} {'json.dumps':<13} {len(baseline):>7} {100:>6}% {enc:>10.2f} {dec:>11.2f}")
+        for name, codec in CODECS.items():
+            body = codec.encode(message)
+            assert decode_body(body) == message
+            enc = per_call_us(lambda: codec.encode(message), number)
+            dec = per_call_us(lambda: decode_body(body), number)
+            print(f"{'':<12} {name:<13} {len(body):>7} {len(body) * 100 // len(baseline):>6}% {enc:>10.2f} {dec:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
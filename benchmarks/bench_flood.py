@@ -0,0 +1,255 @@
+"""
+Benchmark: độ trễ của người chơi thật khi có 1 máy spam server (src/ratelimit.py).
+
+Chạy server (--mode) trên localhost; --players người chơi thật (từ 127.0.0.1) vào
+cùng 1 phòng và cứ --ping-interval giây gửi PING, đo thời gian tới lúc nhận PONG.
+Sau --duration giây đo nền, 1 tiến trình spam (từ 127.0.0.2, không nằm trong IP
+tin cậy) mở --flood-connections kết nối song song: mỗi kết nối LOGIN vào phòng đó
+(server báo cả phòng) rồi gửi liên tục LOGIN/ANSWER/PING/START/gói lạ, bị ngắt thì
+mở kết nối mới. Chạy 2 lượt: có giới hạn tốc độ (mặc định) và --rate-limit 0.
+
+Đo cho từng lượt, trước và trong lúc spam:
+- độ trễ PING -> PONG p50/p99/max của người chơi thật,
+- số gói rác (INFO vào/rời phòng do spam) mỗi người chơi nhận, số người bị ngắt,
+- số kết nối spam mở được, số gói server nhận/bỏ, số lần ngắt / từ chối kết nối spam.
+
+    python benchmarks/bench_flood.py --players 50 --duration 5 --flood-connections 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "src", "server.py")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol import FrameDecoder, encode
+
+ROOM = "flood-bench"
+FLOOD_IP = "127.0.0.2" # Linux: cả dải 127.0.0.0/8 là loopback
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Cổng {port} không mở")
+
+
+def read_gauges(metrics_port, names):
+    values = dict.fromkeys(names, 0.0)
+    with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5) as resp:
+        for line in resp.read().decode("utf-8").splitlines():
+            name, _, value = line.partition(" ")
+            if name in values:
+                values[name] = float(value)
+    return values
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# --- TIẾN TRÌNH SPAM ---
+async def flood_connection(port, blob, deadline, counters):
+    login = encode({"type": "LOGIN", "name": "spam", "room": ROOM})
+    while time.time() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port, local_addr=(FLOOD_IP, 0))
+        except OSError:
+            counters["connect_errors"] += 1
+            await asyncio.sleep(0.01)
+            continue
+        counters["connections"] += 1
+        # Đọc bỏ mọi thứ server gửi về (để server không ngắt vì hàng đợi gửi đầy)
+        closed = asyncio.ensure_future(reader.read(-1))
+        try:
+            writer.write(login)
+            while time.time() < deadline and not closed.done():
+                writer.write(blob)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.transport.abort()
+            closed.cancel()
+
+
+async def flood(port, connections, duration):
+    messages = [{"type": "LOGIN", "name": "spam", "room": ROOM}, {"type": "ANSWER", "answer": "A"},
+                {"type": "PING"}, {"type": "START"}, {"type": "NOISE", "data": "x" * 64}]
+    blob = b"".join(encode(m) for m in messages) * 20
+    counters = {"connections": 0, "connect_errors": 0}
+    deadline = time.time() + duration
+    await asyncio.gather(*(flood_connection(port, blob, deadline, counters) for _ in range(connections)))
+    return counters
+
+
+# --- NGƯỜI CHƠI THẬT ---
+class Player:
+    def __init__(self, name, port, phase):
+        self.name, self.port = name, port
+        self.phase = phase         # ["tên giai đoạn hiện tại"], dùng chung
+        self.rtt = {}              # {giai đoạn: [giây]}
+        self.noise = {}            # {giai đoạn: số gói INFO nhận được}
+        self.sent = []             # Thời điểm gửi các PING chưa có PONG (FIFO)
+        self.logged_in = asyncio.Event()
+        self.disconnected = False
+        self.writer = None
+
+    async def run(self, interval):
+        reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.writer.write(encode({"type": "LOGIN", "name": self.name, "room": ROOM}))
+        pinger = asyncio.ensure_future(self.ping_loop(interval))
+        decoder = FrameDecoder()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                now = time.perf_counter()
+                for msg in decoder.feed(data):
+                    self.on_message(msg, now)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.disconnected = True
+            pinger.cancel()
+
+    async def ping_loop(self, interval):
+        await self.logged_in.wait()
+        while True:
+            self.sent.append((time.perf_counter(), self.phase[0]))
+            self.writer.write(encode({"type": "PING"}))
+            await asyncio.sleep(interval)
+
+    def on_message(self, msg, now):
+        msg_type = msg.get("type")
+        phase = self.phase[0]
+        if msg_type == "LOGIN_OK":
+            self.logged_in.set()
+        elif msg_type == "PONG" and self.sent:
+            sent_at, sent_phase = self.sent.pop(0)
+            self.rtt.setdefault(sent_phase, []).append(now - sent_at)
+        elif msg_type == "PING":
+            self.writer.write(encode({"type": "PONG"}))
+        elif msg_type == "INFO":
+            self.noise[phase] = self.noise.get(phase, 0) + 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.transport.abort()
+
+
+GAUGES = ("quiz_rate_limited", "quiz_kicked_flood", "quiz_refused_connections", "quiz_messages_in_total")
+
+
+async def measure(args, port, metrics_port):
+    phase = ["setup"]
+    players = [Player(f"player{i}", port, phase) for i in range(args.players)]
+    tasks = [asyncio.ensure_future(p.run(args.ping_interval)) for p in players]
+    await asyncio.wait_for(asyncio.gather(*(p.logged_in.wait() for p in players)), 30)
+
+    phase[0] = "baseline"
+    await asyncio.sleep(args.duration)
+    before = read_gauges(metrics_port, GAUGES)
+
+    phase[0] = "flood"
+    flooder = await asyncio.create_subprocess_exec(
+        sys.executable, __file__, "--flood-worker", str(port), "--flood-connections", str(args.flood_connections),
+        "--duration", str(args.duration), stdout=subprocess.PIPE, cwd=ROOT)
+    out, _ = await flooder.communicate()
+    phase[0] = "after"
+    await asyncio.sleep(0.5)
+    after = read_gauges(metrics_port, GAUGES)
+    disconnected = sum(p.disconnected for p in players)
+
+    for p in players:
+        p.close()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    result = {"flooder": json.loads(out.decode("utf-8") or "{}"),
+              "server": {name: after[name] - before[name] for name in GAUGES},
+              "disconnected": disconnected}
+    for name in ("baseline", "flood"):
+        rtt = [x for p in players for x in p.rtt.get(name, [])]
+        result[name] = {"samples": len(rtt), "p50_ms": percentile(rtt, 0.5) * 1000,
+                        "p99_ms": percentile(rtt, 0.99) * 1000, "max_ms": max(rtt, default=0.0) * 1000,
+                        "noise": sum(p.noise.get(name, 0) for p in players) / max(1, len(players))}
+    return result
+
+
+def run(args, rate_limit):
+    port, metrics_port = free_port(), free_port()
+    proc = subprocess.Popen([sys.executable, SERVER, "--mode", args.mode, "--port", str(port),
+                             "--metrics-port", str(metrics_port), "--rate-limit", str(rate_limit),
+                             "--log-level", "ERROR"],
+                            cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_port(port)
+        return asyncio.run(measure(args, port, metrics_port))
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["thread", "async"], default="async")
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--ping-interval", type=float, default=0.5, help="Giây giữa 2 PING của 1 người chơi")
+    parser.add_argument("--duration", type=float, default=5.0, help="Số giây mỗi giai đoạn (nền, spam)")
+    parser.add_argument("--flood-connections", type=int, default=20)
+    parser.add_argument("--flood-worker", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    if args.flood_worker:
+        print(json.dumps(asyncio.run(flood(args.flood_worker, args.flood_connections, args.duration))))
+        return
+
+    results = {"on": run(args, 1.0), "off": run(args, 0)}
+    print(f"{args.players} người chơi, spam {args.flood_connections} kết nối từ {FLOOD_IP}, "
+          f"mỗi giai đoạn {args.duration:g}s, server --mode {args.mode}")
+    print(f"{'giới hạn':<10}{'giai đoạn':<11}{'PONG p50':>10}{'p99':>10}{'max':>10}{'gói rác/người':>15}"
+          f"{'bị ngắt':>9}")
+    for label, r in results.items():
+        for name in ("baseline", "flood"):
+            row = r[name]
+            print(f"{label:<10}{name:<11}{row['p50_ms']:>8.1f}ms{row['p99_ms']:>8.1f}ms{row['max_ms']:>8.1f}ms"
+                  f"{row['noise']:>15.1f}{r['disconnected'] if name == 'flood' else 0:>9}")
+    print(f"{'giới hạn':<10}{'kết nối spam':>14}{'server nhận':>13}{'bỏ':>10}{'ngắt':>7}"
+          f"{'từ chối':>9}")
+    for label, r in results.items():
+        f, s = r["flooder"], r["server"]
+        print(f"{label:<10}{f.get('connections', 0):>14}{s['quiz_messages_in_total']:>13.0f}"
+              f"{s['quiz_rate_limited']:>10.0f}{s['quiz_kicked_flood']:>7.0f}{s['quiz_refused_connections']:>9.0f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
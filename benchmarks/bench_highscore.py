@@ -0,0 +1,99 @@
+"""
+Benchmark: lưu điểm cuối ván khi đã có nhiều lịch sử highscore.
+
+So sánh cách cũ (mỗi người chơi: đọc cả highscore.json, thêm 1 dòng, ghi lại
+toàn bộ với indent=4) với DataManager mới (cả ván xếp hàng 1 lần, luồng nền
+ghi thêm vào log rồi định kỳ gộp). Chạy trong thư mục tạm, không đụng data/.
+
+    python benchmarks/bench_highscore.py --history 100000 --players 50 --games 20
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from data_manager import DataManager
+
+
+def old_save_score(h_file, name, score):
+    """Bản sao cách lưu cũ của DataManager.save_score"""
+    results = []
+    if os.path.exists(h_file):
+        with open(h_file, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    results.append({"name": name, "score": score})
+    with open(h_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+
+
+def make_history(data_dir, n):
+    history = [{"name": f"player{i}", "score": (i * 37) % 500} for i in range(n)]
+    with open(os.path.join(data_dir, "highscore.json"), 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=4)
+
+
+def game_entries(game, players):
+    return [{"name": f"g{game}p{p}", "score": p * 10} for p in range(players)]
+
+
+def bench_old(data_dir, args):
+    h_file = os.path.join(data_dir, "highscore.json")
+    stalls = []
+    start = time.perf_counter()
+    for game in range(args.games):
+        t = time.perf_counter()
+        for entry in game_entries(game, args.players):
+            old_save_score(h_file, entry["name"], entry["score"])
+        stalls.append(time.perf_counter() - t)
+    return stalls, time.perf_counter() - start
+
+
+def bench_new(data_dir, args):
+    db = DataManager(data_dir)
+    stalls = []
+    start = time.perf_counter()
+    for game in range(args.games):
+        t = time.perf_counter()
+        db.save_scores(game_entries(game, args.players))
+        stalls.append(time.perf_counter() - t)
+    db.flush()
+    total = time.perf_counter() - start
+    expected = args.history + args.games * args.players
+    count = len(db.load_highscores())
+    assert count == expected, f"Mất dữ liệu: {count} != {expected}"
+    return stalls, total
+
+
+def report(label, stalls, total, args):
+    stalls = sorted(stalls)
+    print(f"{label:<28} chặn luồng game/ván: trung bình {sum(stalls) / len(stalls) * 1000:8.2f} ms,"
+          f" max {stalls[-1] * 1000:8.2f} ms | tổng tới khi ghi xong {total:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, default=100000, help="Số bản ghi lịch sử có sẵn")
+    parser.add_argument("--players", type=int, default=50, help="Số người chơi mỗi ván")
+    parser.add_argument("--games", type=int, default=20, help="Số ván liên tiếp")
+    parser.add_argument("--skip-old", action="store_true", help="Bỏ qua cách cũ (rất chậm)")
+    args = parser.parse_args()
+
+    print(f"Lịch sử {args.history} bản ghi, {args.games} ván x {args.players} người chơi")
+    if not args.skip_old:
+        with tempfile.TemporaryDirectory() as data_dir:
+            make_history(data_dir, args.history)
+            stalls, total = bench_old(data_dir, args)
+            report("Cũ (ghi lại cả file)", stalls, total, args)
+    with tempfile.TemporaryDirectory() as data_dir:
+        make_history(data_dir, args.history)
+        stalls, total = bench_new(data_dir, args)
+        report("Mới (log + luồng nền)", stalls, total, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: journal của ván (src/journal.py) - chi phí ghi và thời gian khôi phục.
+
+Giả lập 1 ván N người chơi x Q câu, mỗi câu mọi người trả lời, chấm theo lượt
+--batch câu trả lời (1 bản ghi ANSWERS mỗi lượt như server). Đo:
+- chi phí trên luồng game cho mỗi câu trả lời (mã hóa + cập nhật MatchState),
+- thời gian luồng nền ghi hết (kể cả fsync) và kích thước file,
+- thời gian khôi phục giữa câu cuối: đọc lại cả journal (không ảnh chụp) vs
+  ảnh chụp + phần đuôi, cộng thời gian nạp vào engine chấm điểm (dict/columnar).
+
+    python benchmarks/bench_journal.py --players 10000 --questions 20
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import journal
+from journal import JournalStore, load_state, restore_game, players_in_order, pack_answers, QUESTION, ANSWERS, RESULT
+from room import Room, ENGINES
+
+
+def make_questions(n):
+    keys = "ABCD"
+    return [{"id": i, "question": f"Câu hỏi số {i}?", "options": {k: f"Đáp án {k}{i}" for k in keys},
+             "answer": keys[i % 4], "time_limit": 15} for i in range(n)]
+
+
+def write_game(journal_dir, players, questions, batch, snapshot_every):
+    """Ghi 1 ván tới giữa câu cuối (câu đang mở, đã có nửa số câu trả lời) như lúc server chết"""
+    journal.SNAPSHOT_EVERY = snapshot_every
+    store = JournalStore(journal_dir)
+    rng = random.Random(1)
+    roster = [[pid, f"player{pid}", f"token-{pid:022d}"] for pid in range(1, players + 1)]
+    game = store.open_game("bench", {"count": questions}, make_questions(questions), roster)
+    answers = 0
+    record_time = 0.0
+    for q in range(1, questions + 1):
+        game.record(QUESTION, [q, 15])
+        correct = "ABCD"[(q - 1) % 4]
+        voters = players if q < questions else players // 2
+        for start in range(0, voters, batch):
+            rows = []
+            for pid in range(start + 1, min(start + batch, voters) + 1):
+                choice = rng.choice("ABCD")
+                rows.append([pid, choice, 10 if choice == correct else 0])
+            started = time.perf_counter()
+            game.record(ANSWERS, pack_answers(rows))
+            record_time += time.perf_counter() - started
+            answers += len(rows)
+        if q < questions:
+            started = time.perf_counter()
+            game.record(RESULT, q)
+            game.maybe_snapshot()
+            record_time += time.perf_counter() - started
+    started = time.perf_counter()
+    store.flush()
+    flush_time = time.perf_counter() - started
+    return game, answers, record_time, flush_time
+
+
+def recover(path, engine):
+    started = time.perf_counter()
+    state, _, replayed = load_state(path)
+    loaded = time.perf_counter()
+    room = Room(state.room, None, engine=ENGINES[engine])
+    for pid, entry in players_in_order(state):
+        room.game.add_player(pid, entry[0])
+    restore_game(state, room.game)
+    done = time.perf_counter()
+    return state, replayed, (loaded - started) * 1000, (done - loaded) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=500, help="Số câu trả lời mỗi lượt chấm")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-journal-")
+    try:
+        print(f"{args.players} người chơi x {args.questions} câu, lượt chấm {args.batch} câu trả lời")
+        print(f"{'ảnh chụp':<16}{'µs/câu trả lời':>15}{'ghi đĩa':>10}{'file':>10}{'bản ghi đọc lại':>17}"
+              f"{'đọc':>10}{'nạp dict':>10}{'nạp columnar':>14}")
+        expected = None
+        for label, every in (("không", 1 << 62), (f"mỗi {journal.SNAPSHOT_EVERY}", journal.SNAPSHOT_EVERY)):
+            journal_dir = os.path.join(tmp, str(every))
+            game, answers, record_time, flush_time = write_game(journal_dir, args.players, args.questions,
+                                                                args.batch, every)
+            size = os.path.getsize(game.path)
+            row = None
+            for engine in ("dict", "columnar"):
+                state, replayed, load_ms, restore_ms = recover(game.path, engine)
+                if row is None:
+                    row = [replayed, load_ms]
+                row.append(restore_ms)
+                ranking = state.ranking()
+                if expected is None:
+                    expected = ranking
+                assert ranking == expected, "Khôi phục từ ảnh chụp khác với đọc lại cả journal!"
+            print(f"{label:<16}{record_time / answers * 1e6:>15.2f}{flush_time * 1000:>8.0f}ms{size / 2**20:>8.1f}MB"
+                  f"{row[0]:>17}{row[1]:>8.1f}ms{row[2]:>8.1f}ms{row[3]:>12.1f}ms")
+        print("OK: trạng thái khôi phục từ ảnh chụp giống hệt đọc lại cả journal")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
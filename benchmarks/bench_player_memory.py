@@ -0,0 +1,120 @@
+"""
+Benchmark: bộ nhớ cho mỗi người chơi đang kết nối, cách lưu cũ vs bản ghi Player.
+
+- "dict (cũ)": cách lưu trước khi có player.py, dựng lại ở đây để so sánh:
+  QuizServer.clients {socket: {"addr", "name", "room", "outbox", "codec", "prefetch", "token"}}
+  + Room.members {socket: name} + GameLogic.players {socket: {"name", "score"}}
+  + round_answers {socket: (đáp án, điểm)} + Leaderboard theo socket.
+- "Player": code hiện tại: ClientRegistry {socket: Player} + Room/GameLogic theo player.id.
+- "Player+columnar": như trên, phòng dùng engine columnar (điểm/đáp án trong mảng).
+
+Socket, outbox, tên, token... được tạo trước khi đo (cả 2 cách đều có), nên chỉ đo
+phần cấu trúc lưu người chơi. Mỗi người đều đã trả lời câu hiện tại.
+
+    python benchmarks/bench_player_memory.py --players 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from codec import JSON
+from leaderboard import Leaderboard
+from player import Player
+from registry import ClientRegistry
+from room import Room, ENGINES
+
+QUESTION = {"id": 0, "question": "Q", "options": {k: k for k in "ABCD"}, "answer": "A"}
+
+
+class FakeConn:
+    """Đứng thay socket: chỉ cần hash được"""
+    __slots__ = ()
+
+
+def make_inputs(n):
+    return {
+        "conns": [FakeConn() for _ in range(n)],
+        "addrs": [("127.0.0.1", 10000 + i % 50000) for i in range(n)],
+        "names": [f"player{i}" for i in range(n)],
+        "tokens": [f"token-{i:022d}" for i in range(n)],
+        "outbox": object(), # Hàng đợi gửi: như nhau ở cả 2 cách, dùng chung 1 object
+        "choices": ["ABCD"[i % 4] for i in range(n)],
+    }
+
+
+def build_dict_layout(inputs, room_id="bench"):
+    clients, members, players, round_answers = {}, {}, {}, {}
+    leaderboard = Leaderboard()
+    for conn, addr, name, token, choice in zip(inputs["conns"], inputs["addrs"], inputs["names"],
+                                               inputs["tokens"], inputs["choices"]):
+        clients[conn] = {"addr": addr, "name": name, "room": room_id, "outbox": inputs["outbox"],
+                         "codec": JSON, "prefetch": False, "token": token}
+        members[conn] = name
+        players[conn] = {"name": name, "score": 0}
+        leaderboard.add(conn, 0)
+        points = 10 if choice == "A" else 0
+        players[conn]["score"] += points
+        leaderboard.update(conn, players[conn]["score"])
+        round_answers[conn] = (choice, points)
+    return clients, members, players, round_answers, leaderboard
+
+
+def build_player_layout(inputs, engine="dict", room_id="bench"):
+    clients = ClientRegistry()
+    room = Room(room_id, None, engine=ENGINES[engine])
+    game = room.game
+    game.questions, game.total_questions = [QUESTION], 1
+    for i, (conn, addr, name, token) in enumerate(zip(inputs["conns"], inputs["addrs"], inputs["names"],
+                                                      inputs["tokens"])):
+        player = Player(conn=conn, addr=addr, outbox=inputs["outbox"])
+        clients.add(conn, player)
+        player.id, player.name, player.room, player.token = i + 1, name, room_id, token
+        room.add_member(player)
+    game.start_game()
+    game.next_question()
+    for i, choice in enumerate(inputs["choices"]):
+        game.check_answer(i + 1, choice)
+    return clients, room
+
+
+def measure(build, *args):
+    """Số byte cấp phát thêm (tracemalloc) để dựng xong cấu trúc"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = build(*args)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del keep
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=100000)
+    args = parser.parse_args()
+    n = args.players
+
+    inputs = make_inputs(n)
+    layouts = [
+        ("dict (cũ)", build_dict_layout, (inputs,)),
+        ("Player", build_player_layout, (inputs, "dict")),
+        ("Player+columnar", build_player_layout, (inputs, "columnar")),
+    ]
+    print(f"{n} người chơi (mỗi bản ghi: dict 7 khóa {sys.getsizeof(dict.fromkeys('abcdefg'))} B, "
+          f"Player {sys.getsizeof(Player())} B)")
+    baseline = None
+    for label, build, build_args in layouts:
+        used = measure(build, *build_args)
+        baseline = baseline or used
+        print(f"  {label:<16} {used / 2**20:8.1f} MiB  {used / n:7.0f} B/người  ({used / baseline:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: ngân hàng câu hỏi lớn.
+
+Sinh file questions.json với N câu (có chủ đề, độ khó) trong thư mục tạm rồi so sánh:
+  - cách cũ: json.load cả file vào list (thời gian + bộ nhớ)
+  - QuestionBank lần đầu (dựng chỉ mục, ghi .idx) và lần sau (đọc .idx)
+  - bốc ngẫu nhiên 1 bộ câu hỏi đã lọc theo chủ đề + độ khó
+
+    python benchmarks/bench_question_bank.py --questions 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from question_bank import QuestionBank
+
+CATEGORIES = ["Khoa học", "Lịch sử", "Địa lý", "Văn học", "Thể thao", "Âm nhạc"]
+DIFFICULTIES = ["dễ", "vừa", "khó"]
+
+
+def make_bank(path, n):
+    rng = random.Random(1)
+    questions = [{
+        "id": i + 1,
+        "category": rng.choice(CATEGORIES),
+        "difficulty": rng.choice(DIFFICULTIES),
+        "question": f"Câu hỏi số {i + 1}: đâu là đáp án đúng?",
+        "options": {k: f"Phương án {k} của câu {i + 1}" for k in "ABCD"},
+        "answer": rng.choice("ABCD"),
+    } for i in range(n)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(questions, f, ensure_ascii=False, indent=2)
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms | giữ lại {retained / 2**20:7.1f} MB (đỉnh {peak / 2**20:7.1f} MB)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=200000)
+    parser.add_argument("--per-game", type=int, default=10)
+    parser.add_argument("--games", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "questions.json")
+        make_bank(path, args.questions)
+        print(f"{args.questions} câu hỏi, file {os.path.getsize(path) / 2**20:.1f} MB")
+
+        questions = measure("Cũ: json.load cả file", lambda: json.load(open(path, encoding="utf-8")))
+        del questions
+        measure("QuestionBank lần đầu (dựng .idx)", lambda: QuestionBank(path)).close()
+        bank = measure("QuestionBank lần sau (đọc .idx)", lambda: QuestionBank(path))
+
+        category, difficulty = CATEGORIES[0], DIFFICULTIES[2]
+        measure("Lọc lần đầu (chủ đề + độ khó)", lambda: bank.select(category, difficulty))
+        start = time.perf_counter()
+        for _ in range(args.games):
+            picked = bank.sample(args.per_game, category, difficulty)
+        per_game = (time.perf_counter() - start) / args.games
+        assert all(q["category"] == category and q["difficulty"] == difficulty for q in picked)
+        assert len({q["id"] for q in picked}) == len(picked)
+        print(f"Bốc {args.per_game} câu đã lọc / ván: {per_game * 1e6:.1f} µs (trung bình {args.games} ván)")
+        bank.close()
+
+
+if __name__ == "__main__":
+    main()
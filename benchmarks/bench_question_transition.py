@@ -0,0 +1,136 @@
+"""
+Benchmark: độ trễ chuyển câu hỏi.
+
+Một phòng có P người chơi; mỗi khi nhận QUESTION, tất cả trả lời ngay.
+Đo thời gian từ lúc gửi câu trả lời cuối cùng đến lúc nhận RESULT
+(server phải nhận ra "mọi người đã trả lời" nhanh đến đâu), và từ RESULT
+đến QUESTION kế tiếp (thời gian nghỉ giữa 2 câu).
+
+    python benchmarks/bench_question_transition.py --mode async --questions 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "src", "server.py")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol import FrameDecoder, encode
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Server không khởi động được")
+
+
+class Player:
+    def __init__(self, name):
+        self.name = name
+        self.decoder = FrameDecoder()
+        self.events = asyncio.Queue()
+
+    async def connect(self, port, room):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        self.writer.write(encode({"type": "LOGIN", "name": self.name, "room": room}))
+        asyncio.ensure_future(self.read_loop())
+
+    async def read_loop(self):
+        while True:
+            data = await self.reader.read(65536)
+            if not data:
+                return
+            now = time.perf_counter()
+            for msg in self.decoder.feed(data):
+                await self.events.put((msg.get("type"), now))
+
+    async def wait_for(self, msg_type):
+        while True:
+            t, ts = await self.events.get()
+            if t == msg_type:
+                return ts
+
+    def send(self, msg):
+        self.writer.write(encode(msg))
+
+
+async def bench(port, players, questions):
+    room = "bench"
+    ps = [Player(f"p{i}") for i in range(players)]
+    # p0 vào trước hẳn để chắc chắn là chủ phòng (được gửi START)
+    await ps[0].connect(port, room)
+    await ps[0].wait_for("LOGIN_OK")
+    for p in ps[1:]:
+        await p.connect(port, room)
+    for p in ps[1:]:
+        await p.wait_for("LOGIN_OK")
+    ps[0].send({"type": "START"})
+
+    answer_to_result = []
+    result_to_question = []
+    for _ in range(questions):
+        await asyncio.gather(*(p.wait_for("QUESTION") for p in ps))
+        for p in ps:
+            p.send({"type": "ANSWER", "answer": "A"})
+        last_answer = time.perf_counter()
+        results = await asyncio.gather(*(p.wait_for("RESULT") for p in ps))
+        answer_to_result.append(max(results) - last_answer)
+        if len(answer_to_result) < questions:
+            ts = await ps[0].wait_for("QUESTION")
+            result_to_question.append(ts - results[0])
+            ps[0].events.put_nowait(("QUESTION", ts))
+    return answer_to_result, result_to_question
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default="async", choices=["thread", "async"])
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    port = free_port()
+    # Người chơi giả không trả lời PING -> tắt heartbeat
+    proc = subprocess.Popen([sys.executable, SERVER, "--mode", args.mode, "--port", str(port), "--heartbeat", "0"],
+                            cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_port(port)
+        a2r, r2q = asyncio.run(bench(port, args.players, args.questions))
+    finally:
+        proc.kill()
+        proc.wait()
+
+    ms = lambda xs: [round(x * 1000, 1) for x in xs]
+    result = {
+        "mode": args.mode,
+        "answer_to_result_ms": ms(a2r),
+        "answer_to_result_mean_ms": round(statistics.mean(a2r) * 1000, 1),
+        "result_to_question_ms": ms(r2q),
+    }
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Benchmark: khán giả xem trực tiếp từ server vs qua cây relay (src/relay.py).
+
+Chạy 1 server async + (tùy chọn) 1 cây relay trên localhost: --fanout relay nối
+vào server, mỗi relay lại có --fanout relay con, sâu --depth tầng. Khán giả chia
+đều vào các relay lá (hoặc nối thẳng server ở lượt "direct"). Vài người chơi nối
+thẳng server, chủ phòng bắt đầu ván, ai cũng trả lời ngay khi nhận câu hỏi.
+
+Đo:
+- số kết nối server phải giữ (quiz_clients từ --metrics-port của server),
+- số gói QUESTION / ROUND_RESULT / GAME_OVER mỗi khán giả nhận được (phải đủ),
+- độ trễ QUESTION tới khán giả so với người chơi đầu tiên nhận được câu đó.
+
+    python benchmarks/bench_relay_tree.py --spectators 1000 --depth 2 --fanout 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "src", "server.py")
+RELAY = os.path.join(ROOT, "src", "relay.py")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol import FrameDecoder, encode
+
+ROOM = "relay-bench"
+COUNTED = ("QUESTION", "ROUND_RESULT", "GAME_OVER")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Cổng {port} không mở")
+
+
+def read_gauge(metrics_port, name):
+    with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=2) as resp:
+        for line in resp.read().decode("utf-8").splitlines():
+            if line.startswith(name + " "):
+                return float(line.split()[1])
+    return 0.0
+
+
+def spawn(cmd):
+    return subprocess.Popen([sys.executable] + cmd, cwd=ROOT, stdin=subprocess.PIPE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def build_tree(server_port, depth, fanout, procs):
+    """Dựng cây relay, trả về [(port, tầng)] của các relay lá"""
+    level = [(server_port, 0)]
+    for d in range(1, depth + 1):
+        children = []
+        for parent_port, _ in level:
+            for _ in range(fanout):
+                port = free_port()
+                procs.append(spawn([RELAY, "--upstream-port", str(parent_port), "--port", str(port),
+                                    "--log-level", "WARNING"]))
+                children.append((port, d))
+        for port, _ in children:
+            wait_port(port)
+        level = children
+    return level
+
+
+class Client:
+    """1 kết nối (người chơi hoặc khán giả): trả lời PING, ghi lại lúc nhận mỗi câu hỏi"""
+
+    def __init__(self, name, port, depth, spectator, first_seen):
+        self.name, self.port, self.depth, self.spectator = name, port, depth, spectator
+        self.first_seen = first_seen # {số câu: lúc người chơi đầu tiên nhận}, dùng chung
+        self.received = dict.fromkeys(COUNTED, 0)
+        self.question_at = {}
+        self.logged_in = asyncio.Event()
+        self.done = asyncio.Event()
+        self.writer = None
+
+    async def run(self):
+        reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        login = {"type": "LOGIN", "name": self.name, "room": ROOM}
+        if self.spectator:
+            login["role"] = "spectator"
+        self.writer.write(encode(login))
+        decoder = FrameDecoder()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    return
+                now = time.perf_counter()
+                for msg in decoder.feed(data):
+                    self.on_message(msg, now)
+        finally:
+            self.done.set()
+
+    def on_message(self, msg, now):
+        msg_type = msg.get("type")
+        if msg_type in COUNTED:
+            self.received[msg_type] += 1
+        if msg_type == "LOGIN_OK":
+            self.logged_in.set()
+        elif msg_type == "PING":
+            self.writer.write(encode({"type": "PONG"}))
+        elif msg_type == "QUESTION":
+            q_no = msg.get("question_number")
+            self.question_at[q_no] = now
+            if not self.spectator:
+                self.first_seen[q_no] = min(self.first_seen.get(q_no, now), now)
+                self.writer.write(encode({"type": "ANSWER", "answer": "A"}))
+        elif msg_type == "GAME_OVER":
+            self.done.set()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.transport.abort()
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def play(args, server_port, metrics_port, leaves, expected_spectators):
+    first_seen = {}
+    players = [Client(f"player{i}", server_port, 0, False, first_seen) for i in range(args.players)]
+    spectators = [Client(f"viewer{i}", leaves[i % len(leaves)][0], leaves[i % len(leaves)][1], True, first_seen)
+                  for i in range(args.spectators)]
+    tasks = [asyncio.ensure_future(players[0].run())]
+    await players[0].logged_in.wait() # Người đầu tiên là chủ phòng
+    tasks += [asyncio.ensure_future(c.run()) for c in players[1:] + spectators]
+    await asyncio.wait_for(asyncio.gather(*(c.logged_in.wait() for c in players + spectators)), 60)
+
+    # Chờ cả cây relay nối xong lên server (khán giả của server = relay tầng 1 hoặc khán giả trực tiếp)
+    deadline = time.time() + 15
+    while read_gauge(metrics_port, "quiz_spectators") < expected_spectators and time.time() < deadline:
+        await asyncio.sleep(0.1)
+    server_clients = int(read_gauge(metrics_port, "quiz_clients"))
+
+    started = time.perf_counter()
+    players[0].writer.write(encode({"type": "START", "count": args.questions}))
+    try:
+        await asyncio.wait_for(asyncio.gather(*(c.done.wait() for c in players + spectators)),
+                               args.questions * 25 + 30)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - started
+    for c in players + spectators:
+        c.close()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    by_depth = {}
+    for c in spectators:
+        row = by_depth.setdefault(c.depth, {"viewers": 0, "complete": 0, "latency": []})
+        row["viewers"] += 1
+        row["complete"] += (c.received["QUESTION"] == args.questions and c.received["ROUND_RESULT"] == args.questions
+                            and c.received["GAME_OVER"] == 1)
+        row["latency"] += [at - first_seen[q] for q, at in c.question_at.items() if q in first_seen]
+    return {"server_clients": server_clients, "elapsed": elapsed,
+            "depths": {d: {"viewers": r["viewers"], "complete": r["complete"],
+                           "p50_ms": percentile(r["latency"], 0.5) * 1000,
+                           "p95_ms": percentile(r["latency"], 0.95) * 1000}
+                       for d, r in sorted(by_depth.items())}}
+
+
+def run(args, depth):
+    server_port, metrics_port = free_port(), free_port()
+    procs = [spawn([SERVER, "--mode", "async", "--port", str(server_port), "--metrics-port", str(metrics_port),
+                    "--log-level", "WARNING"])]
+    try:
+        wait_port(server_port)
+        leaves = build_tree(server_port, depth, args.fanout, procs) if depth else [(server_port, 0)]
+        expected = args.fanout if depth else args.spectators
+        result = asyncio.run(play(args, server_port, metrics_port, leaves, expected))
+        result["relays"] = len(procs) - 1
+        return result
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectators", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=2, help="Số tầng relay (0 = chỉ chạy lượt xem trực tiếp)")
+    parser.add_argument("--fanout", type=int, default=2, help="Số relay con của mỗi nút")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    results = {"direct": run(args, 0)}
+    if args.depth:
+        results["relay"] = run(args, args.depth)
+
+    print(f"{args.players} người chơi, {args.spectators} khán giả, {args.questions} câu, "
+          f"cây relay {args.depth} tầng x {args.fanout} nhánh")
+    print(f"{'cách xem':<10}{'relay':>6}{'kết nối server':>16}{'tầng':>6}{'khán giả':>10}{'đủ gói':>8}"
+          f"{'trễ p50':>10}{'trễ p95':>10}")
+    for label, r in results.items():
+        for depth, row in r["depths"].items():
+            print(f"{label:<10}{r['relays']:>6}{r['server_clients']:>16}{depth:>6}{row['viewers']:>10}"
+                  f"{row['complete']:>8}{row['p50_ms']:>8.1f}ms{row['p95_ms']:>8.1f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
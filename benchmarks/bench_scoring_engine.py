@@ -0,0 +1,77 @@
+"""
+Benchmark: chấm điểm 1 câu cho phòng rất đông, engine "dict" (GameLogic) vs "columnar".
+
+Mỗi câu: N câu trả lời vào hàng đợi -> process_answers -> check_all_answered ->
+round_summary (phân bố đáp án) -> round_results (hạng/điểm từng người) -> get_top(10),
+đo thời gian từng bước (trung vị qua các câu) và bắt đầu ván (reset điểm).
+
+    python benchmarks/bench_scoring_engine.py --players 1000 10000 50000 --rounds 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from room import ENGINES
+
+STEPS = ["process_answers", "check_all_answered", "round_summary", "round_results", "get_top10"]
+
+
+def make_questions(n):
+    rng = random.Random(1)
+    return [{"id": i, "question": f"Q{i}", "options": {k: k for k in "ABCD"}, "answer": rng.choice("ABCD")}
+            for i in range(n)]
+
+
+def run(engine, players, rounds, seed):
+    game = ENGINES[engine](questions=make_questions(rounds))
+    ids = list(range(players))
+    for pid in ids:
+        game.add_player(pid, f"p{pid}")
+    rng = random.Random(seed)
+    choices = [rng.choice("ABCD") for _ in range(players * rounds)]
+
+    t0 = time.perf_counter()
+    game.start_game()
+    timings = {"start_game": [time.perf_counter() - t0]}
+    for r in range(rounds):
+        game.next_question()
+        for pid in ids:
+            game.submit_answer(pid, choices[r * players + pid])
+        steps = [game.process_answers, game.check_all_answered, game.round_summary,
+                 lambda: game.round_results(ids), lambda: game.get_top(10)]
+        for name, step in zip(STEPS, steps):
+            t0 = time.perf_counter()
+            step()
+            timings.setdefault(name, []).append(time.perf_counter() - t0)
+    checksum = sum(game.players[pid].score for pid in ids)
+    return {name: statistics.median(values) * 1000 for name, values in timings.items()}, checksum
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    columns = ["start_game"] + STEPS
+    print(f"{'engine':<9} {'người':>7} " + " ".join(f"{c[:14]:>14}" for c in columns) + f" {'tổng/câu':>10}  (ms)")
+    for players in args.players:
+        checksums = set()
+        for engine in ENGINES:
+            result, checksum = run(engine, players, args.rounds, args.seed)
+            checksums.add(checksum)
+            per_round = sum(result[s] for s in STEPS)
+            print(f"{engine:<9} {players:>7} " + " ".join(f"{result[c]:>14.2f}" for c in columns) + f" {per_round:>10.2f}")
+        if len(checksums) != 1:
+            sys.exit("Tổng điểm 2 engine khác nhau!")
+
+
+if __name__ == "__main__":
+    main()
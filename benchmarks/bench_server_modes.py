@@ -0,0 +1,138 @@
+"""
+Benchmark: so sánh server đa luồng (thread) và event loop (async).
+
+Mở N kết nối rảnh (idle) tới server chạy trong tiến trình con, rồi đo:
+  - số kết nối server giữ được,
+  - RSS và số luồng của tiến trình server,
+  - bộ nhớ tăng thêm trên mỗi kết nối.
+
+Chạy từ thư mục gốc dự án (chỉ hỗ trợ Linux vì đọc /proc):
+    python benchmarks/bench_server_modes.py --connections 10000
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "src", "server.py")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def proc_status(pid):
+    """Đọc VmRSS (KB) và số luồng từ /proc/<pid>/status"""
+    info = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "Threads"):
+                info[key] = int(value.split()[0])
+    return info["VmRSS"], info["Threads"]
+
+
+def open_fds(pid):
+    return len(os.listdir(f"/proc/{pid}/fd"))
+
+
+def wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Server không khởi động được")
+
+
+def run_mode(mode, connections, settle):
+    port = free_port()
+    proc = subprocess.Popen(
+        # Kết nối rảnh không trả lời PING -> tắt heartbeat, nếu không server sẽ đóng chúng
+        [sys.executable, SERVER, "--mode", mode, "--port", str(port), "--heartbeat", "0"],
+        cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    socks = []
+    try:
+        wait_port(port)
+        time.sleep(0.5)
+        base_fds = open_fds(proc.pid)
+        rss_before, _ = proc_status(proc.pid)
+
+        failed = 0
+        start = time.perf_counter()
+        for _ in range(connections):
+            try:
+                socks.append(socket.create_connection(("127.0.0.1", port), timeout=5))
+            except OSError:
+                failed += 1
+        connect_time = time.perf_counter() - start
+
+        # Chờ server accept hết hàng đợi
+        deadline = time.time() + settle
+        held = 0
+        while time.time() < deadline:
+            held = open_fds(proc.pid) - base_fds
+            if held >= len(socks):
+                break
+            time.sleep(0.2)
+        time.sleep(0.5)
+        held = open_fds(proc.pid) - base_fds
+        rss_after, threads = proc_status(proc.pid)
+
+        return {
+            "mode": mode,
+            "requested": connections,
+            "connect_failed": failed,
+            "held": held,
+            "connect_seconds": round(connect_time, 3),
+            "rss_before_kb": rss_before,
+            "rss_after_kb": rss_after,
+            "threads": threads,
+            "bytes_per_conn": round((rss_after - rss_before) * 1024 / max(held, 1)),
+            "alive": proc.poll() is None,
+        }
+    finally:
+        for s in socks:
+            s.close()
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--modes", default="thread,async")
+    parser.add_argument("--settle", type=float, default=30.0, help="Thời gian tối đa chờ server accept hết")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    # Mỗi kết nối tốn 1 fd ở tiến trình benchmark
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.connections + 100 > hard:
+        print(f"Cảnh báo: giới hạn fd ({hard}) nhỏ hơn số kết nối yêu cầu")
+
+    results = [run_mode(m.strip(), args.connections, args.settle) for m in args.modes.split(",")]
+
+    print(f"{'mode':<8}{'held':>8}{'failed':>8}{'threads':>9}{'RSS MB':>9}{'B/conn':>9}{'alive':>7}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['held']:>8}{r['connect_failed']:>8}{r['threads']:>9}"
+              f"{r['rss_after_kb'] / 1024:>9.1f}{r['bytes_per_conn']:>9}{str(r['alive']):>7}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: thời gian vẽ lại giao diện (QuizUI) cho mỗi gói tin trong 1 ván dài.
+
+Chạy QuizUI thật (cần màn hình / $DISPLAY), đưa thẳng các gói QUESTION,
+ROUND_RESULT, RESULT, GAME_OVER vào process_message rồi chờ Tk vẽ xong
+(update_idletasks), đo thời gian mỗi gói và số widget còn sống sau ván.
+
+    python benchmarks/bench_ui_render.py --questions 300 --players 200
+
+So sánh với bản trước: chạy script này trên 2 commit (git stash / git checkout).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "client"))
+
+import tkinter as tk
+from ui import QuizUI
+
+
+def game_messages(questions, players, rng):
+    """Các gói tin server gửi cho 1 người chơi trong 1 ván: (gói, đáp án người chơi chọn)"""
+    with open(os.path.join(ROOT, "data", "questions.json"), encoding="utf-8") as f:
+        bank = json.load(f)
+    names = [f"Người chơi {i}" for i in range(players)]
+    scores = [0] * players
+    for n in range(1, questions + 1):
+        q = bank[(n - 1) % len(bank)]
+        yield {"type": "QUESTION", "question": q["question"],
+               "options": [q["options"][k] for k in sorted(q["options"])],
+               "question_number": n, "total_questions": questions, "time_limit": 15}, rng.choice("ABCD")
+        correct = [rng.random() < 0.5 for _ in range(players)]
+        for i in range(players):
+            scores[i] += 10 * correct[i]
+        top = sorted(range(players), key=lambda i: -scores[i])[:10]
+        yield {"type": "ROUND_RESULT", "question_number": n, "correct_answer": q["answer"],
+               "distribution": {"A": sum(correct), "B": players - sum(correct), "C": 0, "D": 0},
+               "top": [{"name": names[i], "score": scores[i]} for i in top], "total_players": players}, None
+        yield {"type": "RESULT", "correct": correct[0], "points": 10 * correct[0], "score": scores[0],
+               "rank": 1 + sum(s > scores[0] for s in scores)}, None
+    order = sorted(range(players), key=lambda i: -scores[i])
+    yield {"type": "GAME_OVER", "message": "Trò chơi kết thúc!",
+           "leaderboard": [{"name": names[i], "score": scores[i]} for i in order]}, None
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=300, help="Số câu hỏi trong ván")
+    parser.add_argument("--players", type=int, default=200, help="Số người trong bảng xếp hạng")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        app = QuizUI(demo_mode=True)
+    except tk.TclError as e:
+        sys.exit(f"Không mở được cửa sổ Tk ({e}). Cần chạy trên máy có màn hình hoặc Xvfb.")
+
+    # Vào phòng chờ như sau khi đăng nhập (không gửi gì qua mạng)
+    app.username = "bench"
+    app.build_waiting_screen()
+    app.process_message({"type": "LOGIN_OK", "room": "bench", "host": True})
+    app.root.update()
+    widgets_start = count_widgets(app.root)
+
+    timings = {}
+    widgets_peak = widgets_start
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    for message, choice in game_messages(args.questions, args.players, rng):
+        if message["type"] == "GAME_OVER":
+            widgets_peak = max(widgets_peak, count_widgets(app.root))
+        t0 = time.perf_counter()
+        app.process_message(message)
+        app.root.update_idletasks() # Tính lại bố cục + vẽ (các việc "idle" của Tk)
+        timings.setdefault(message["type"], []).append((time.perf_counter() - t0) * 1000)
+        if choice:
+            app.selected_answer.set(choice) # Người chơi chọn đáp án trước khi hết giờ
+        app.root.update() # Xử lý sự kiện còn lại như mainloop giữa 2 gói tin
+    total = time.perf_counter() - started
+    widgets_end = count_widgets(app.root)
+    app.root.destroy()
+
+    print(f"{args.questions} câu, {args.players} người, {total:.2f}s")
+    print(f"{'gói tin':<12} {'n':>5} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for msg_type, values in timings.items():
+        values.sort()
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{msg_type:<12} {len(values):>5} {statistics.median(values):>8.2f} {p95:>8.2f} {values[-1]:>8.2f}")
+    print(f"Số widget: lúc vào phòng {widgets_start}, trước GAME_OVER {widgets_peak}, cuối ván {widgets_end}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Micro-benchmark các đường nóng của server, lưu kết quả JSON để so sánh giữa các commit.
+
+    python benchmarks/microbench.py                     # chạy tất cả, in bảng
+    python benchmarks/microbench.py -o before.json      # lưu kết quả
+    python benchmarks/microbench.py -k leaderboard      # chỉ chạy case có chứa chữ này
+    python benchmarks/microbench.py --quick             # cỡ nhỏ, chạy nhanh
+    python benchmarks/microbench.py --compare before.json after.json
+
+Mỗi case đo thời gian / 1 thao tác: chạy `number` lần liên tiếp, lặp lại
+`--repeat` lần, báo median và min (µs). Những gì server in ra stdout (print) bị
+bỏ đi trong lúc chuẩn bị và đo; log (logs.py) không được cấu hình nên chỉ hiện
+từ mức WARNING.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import selectors
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from game_logic import GameLogic
+from data_manager import DataManager
+from outbox import ThreadOutbox
+import server as server_module
+
+CASES = []
+REGRESSION_THRESHOLD = 10.0 # % chậm hơn thì đánh dấu
+
+
+def case(name, sizes, quick_sizes=None):
+    """Đăng ký 1 case: hàm setup(size) trả về (fn, number[, cleanup])"""
+    def register(setup):
+        CASES.append((name, setup, sizes, quick_sizes or sizes[:1]))
+        return setup
+    return register
+
+
+def make_questions(n):
+    rng = random.Random(1)
+    return [{"id": i + 1, "question": f"Câu hỏi {i + 1}?",
+             "options": {k: f"Đáp án {k}{i}" for k in "ABCD"}, "answer": rng.choice("ABCD")}
+            for i in range(n)]
+
+
+def make_game(players, questions=10):
+    game = GameLogic(questions=make_questions(questions))
+    for i in range(players):
+        game.add_player(i, f"p{i}")
+    game.start_game()
+    game.next_question()
+    return game
+
+
+# --- GAME LOGIC ---
+@case("check_answer", [100, 10000], [100])
+def bench_check_answer(players):
+    game = make_game(players)
+    correct = game.current_question_data["answer"]
+
+    def run():
+        game._new_round()
+        for pid in range(players):
+            game.check_answer(pid, correct if pid % 2 else "Z")
+    return run, 1
+
+
+@case("get_leaderboard", [100, 10000], [100])
+def bench_get_leaderboard(players):
+    game = make_game(players)
+    rng = random.Random(2)
+    for pid in range(players):
+        game.players[pid].score = rng.randrange(0, 500, 10)
+        game.leaderboard.update(pid, game.players[pid].score)
+    return game.get_leaderboard, 10
+
+
+@case("get_top10", [100, 10000], [100])
+def bench_get_top(players):
+    run, number = bench_get_leaderboard(players)
+    game = run.__self__
+    return (lambda: game.get_top(10)), 1000
+
+
+@case("next_question", [50, 10000], [50])
+def bench_next_question(questions):
+    game = make_game(1, questions)
+
+    def run():
+        game.current_q_index = 0
+        for _ in range(questions):
+            game.next_question()
+    return run, 1
+
+
+# --- BROADCAST QUA SOCKETPAIR ---
+class Drain:
+    """1 luồng đọc hết dữ liệu ở đầu kia của mọi socketpair, báo khi đủ số byte"""
+
+    def __init__(self, socks):
+        self.selector = selectors.DefaultSelector()
+        for s in socks:
+            s.setblocking(False)
+            self.selector.register(s, selectors.EVENT_READ)
+        self.received = 0
+        self.target = 0
+        self.done = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def expect(self, nbytes):
+        self.done.clear()
+        self.target += nbytes
+        if self.received >= self.target:
+            self.done.set()
+
+    def _run(self):
+        while self.running:
+            for key, _ in self.selector.select(0.1):
+                try:
+                    data = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                self.received += len(data)
+            if self.received >= self.target:
+                self.done.set()
+
+    def close(self):
+        """Dừng luồng đọc trước khi đóng socket (tránh select/recv trên fd đã đóng)"""
+        self.running = False
+        self.thread.join()
+        self.selector.close()
+
+
+@case("broadcast_room", [100, 1000], [100])
+def bench_broadcast(clients):
+    srv = server_module.QuizServer(listen=False, heartbeat=0) # Socket giả không trả lời PING
+    pairs = [socket.socketpair() for _ in range(clients)]
+    for i, (ours, _) in enumerate(pairs):
+        player = srv.register(ours, None, ThreadOutbox(ours, srv.max_queue_bytes, srv.write_timeout))
+        player.name = f"p{i}"
+        srv.join_room(player, "bench")
+    room = srv.rooms["bench"]
+    drain = Drain([theirs for _, theirs in pairs])
+    msg = {"type": "LEADERBOARD", "top": [{"name": f"p{i}", "score": 100 - i} for i in range(10)],
+           "total_players": clients}
+    frame_len = len(server_module.encode(msg))
+
+    def run():
+        drain.expect(frame_len * clients)
+        srv.broadcast_room(room, msg)
+        if not drain.done.wait(30):
+            raise RuntimeError("broadcast không tới đủ client")
+
+    def cleanup():
+        drain.close()
+        for ours, theirs in pairs:
+            srv.clients.get(ours).outbox.close()
+            ours.close()
+            theirs.close()
+    return run, 20, cleanup
+
+
+@case("send_results", [100, 1000], [100])
+def bench_send_results(clients):
+    """Kết quả 1 câu cho cả phòng: ROUND_RESULT chung + RESULT riêng từng người"""
+    srv = server_module.QuizServer(listen=False, heartbeat=0) # Socket giả không trả lời PING
+    pairs = [socket.socketpair() for _ in range(clients)]
+    for i, (ours, _) in enumerate(pairs):
+        player = srv.register(ours, None, ThreadOutbox(ours, srv.max_queue_bytes, srv.write_timeout))
+        player.name = f"p{i}"
+        srv.join_room(player, "bench")
+    room = srv.rooms["bench"]
+    game = room.game
+    game.questions = make_questions(1)
+    game.total_questions = 1
+    game.start_game()
+    game.next_question()
+    for i, (ours, _) in enumerate(pairs):
+        game.check_answer(srv.clients[ours].id, "ABCD"[i % 4])
+    drain = Drain([theirs for _, theirs in pairs])
+
+    def run():
+        before = srv.m_bytes_out.value
+        srv._send_results(room)
+        drain.expect(srv.m_bytes_out.value - before)
+        if not drain.done.wait(30):
+            raise RuntimeError("kết quả không tới đủ client")
+
+    def cleanup():
+        drain.close()
+        for ours, theirs in pairs:
+            srv.clients.get(ours).outbox.close()
+            ours.close()
+            theirs.close()
+    return run, 20, cleanup
+
+
+# --- DATA MANAGER ---
+def make_data_dir(history, questions):
+    data_dir = tempfile.mkdtemp(prefix="microbench-")
+    with open(os.path.join(data_dir, "highscore.json"), "w", encoding="utf-8") as f:
+        json.dump([{"name": f"h{i}", "score": i % 500} for i in range(history)], f)
+    with open(os.path.join(data_dir, "questions.json"), "w", encoding="utf-8") as f:
+        json.dump(make_questions(questions), f, ensure_ascii=False, indent=2)
+    return data_dir
+
+
+@case("save_scores_game50", [1000, 100000], [1000])
+def bench_save_scores(history):
+    """1 ván 50 người: thời gian luồng game bị chặn + chờ ghi xong xuống đĩa"""
+    data_dir = make_data_dir(history, 1)
+    db = DataManager(data_dir)
+    entries = [{"name": f"p{i}", "score": i * 10} for i in range(50)]
+
+    def run():
+        db.save_scores(entries)
+        db.flush()
+    return run, 5, lambda: shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@case("load_questions", [1000, 100000], [1000])
+def bench_load_questions(questions):
+    data_dir = make_data_dir(0, questions)
+    db = DataManager(data_dir)
+    return db.load_questions, 1, lambda: shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@case("question_bank_open", [1000, 100000], [1000])
+def bench_question_bank(questions):
+    data_dir = make_data_dir(0, questions)
+    db = DataManager(data_dir)
+    db.question_bank().close() # Lần đầu dựng .idx, các lần đo sau đọc từ cache
+    return (lambda: db.question_bank().close()), 10, lambda: shutil.rmtree(data_dir, ignore_errors=True)
+
+
+# --- RUNNER ---
+def measure(fn, number, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    return times
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(args):
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        for name, setup, sizes, quick_sizes in CASES:
+            for size in (quick_sizes if args.quick else sizes):
+                key = f"{name}[{size}]"
+                if args.filter and args.filter not in key:
+                    continue
+                with contextlib.redirect_stdout(devnull):
+                    prepared = setup(size)
+                    fn, number = prepared[0], prepared[1]
+                    cleanup = prepared[2] if len(prepared) > 2 else None
+                    try:
+                        fn() # Chạy nóng 1 lần
+                        times = measure(fn, number, args.repeat)
+                    finally:
+                        if cleanup:
+                            cleanup()
+                results[key] = {"median_us": statistics.median(times), "min_us": min(times),
+                                "number": number, "repeat": args.repeat}
+                print(f"{key:<34} median {results[key]['median_us']:12.1f} µs   "
+                      f"min {results[key]['min_us']:12.1f} µs")
+    return results
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    regressions = 0
+    for key in sorted(set(old["results"]) | set(new["results"])):
+        a, b = old["results"].get(key), new["results"].get(key)
+        if not a or not b:
+            print(f"{key:<34} {'(chỉ có ở 1 bên)':>40}")
+            continue
+        change = (b["median_us"] - a["median_us"]) / a["median_us"] * 100
+        mark = ""
+        if change > threshold:
+            mark = "  <-- CHẬM HƠN"
+            regressions += 1
+        print(f"{key:<34} {a['median_us']:12.1f} -> {b['median_us']:12.1f} µs  {change:+7.1f}%{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", help="Ghi kết quả ra file JSON")
+    parser.add_argument("-k", "--filter", help="Chỉ chạy case có tên chứa chuỗi này")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Chỉ chạy cỡ nhỏ nhất của mỗi case")
+    parser.add_argument("--compare", nargs=2, metavar=("CŨ", "MỚI"), help="So sánh 2 file kết quả")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="%% chậm hơn thì coi là hồi quy (mặc định 10)")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    os.chdir(ROOT) # Server đọc data/ theo đường dẫn tương đối
+    results = run_all(args)
+    if args.output:
+        report = {
+            "meta": {"commit": git_commit(), "python": platform.python_version(),
+                     "platform": platform.platform(), "cpus": os.cpu_count(),
+                     "date": datetime.datetime.now().isoformat(timespec="seconds"), "quick": args.quick},
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Đã lưu {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Stress test: hàng nghìn ANSWER đồng thời vào 1 phòng, kiểm tra điểm chính xác.
+
+Dùng QuizServer thật (đường nhận gói handle_message, scheduler, người ghi
+duy nhất của phòng) với các client giả lập trong tiến trình. Nhiều luồng gửi
+câu trả lời cùng lúc (mỗi người gửi 2 lần, chỉ lần đầu được tính), trong khi
+1 luồng khác liên tục cho người chơi vào/ra phòng và đọc bảng xếp hạng.
+Cuối cùng so điểm từng người với điểm tính trước; sai lệch -> exit code 1.
+
+    python benchmarks/stress_answers.py --players 2000 --rounds 10 --threads 32
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import server as server_module
+
+
+class FakeOutbox:
+    def put(self, data):
+        return None
+
+    def depth(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class FakeClient:
+    """Đứng thay socket: server chỉ cần dùng nó làm khóa và gọi shutdown/close"""
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_questions(n):
+    keys = "ABCD"
+    return [{"id": i, "question": f"Q{i}", "options": {k: f"{k}{i}" for k in keys},
+             "answer": keys[i % 4]} for i in range(n)]
+
+
+def register(srv, name, room_id):
+    client = FakeClient()
+    srv.register(client, None, FakeOutbox())
+    srv.handle_message(client, {"type": "LOGIN", "name": name, "room": room_id})
+    return client
+
+
+def wait_question(room, q_no, timeout=30):
+    deadline = time.time() + timeout
+    while not (room.phase == "QUESTION" and room.game.current_q_index == q_no):
+        if time.time() > deadline:
+            raise RuntimeError(f"Câu {q_no} không bắt đầu")
+        time.sleep(0.001)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["thread"], default="thread")
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--engine", choices=sorted(server_module.ENGINES), default="dict")
+    args = parser.parse_args()
+
+    server_module.RESULT_PAUSE = 0.05
+    questions = make_questions(args.rounds)
+    rng = random.Random(1)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Client giả không trả lời PING, và gửi ANSWER dồn dập hơn người thật (không bị giới hạn tốc độ)
+        srv = server_module.QuizServer("127.0.0.1", 0, engine=args.engine, heartbeat=0, rate_limit=0)
+    srv.save_scores = lambda entries: None # Không ghi highscore.json thật
+    room_id = "stress"
+
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        players = [register(srv, f"p{i}", room_id) for i in range(args.players)]
+    room = srv.rooms[room_id]
+    # Bộ câu hỏi cố định theo thứ tự (không bốc ngẫu nhiên từ ngân hàng) để tính điểm mong đợi
+    room.game.bank = None
+    room.game.questions = questions
+    room.game.total_questions = len(questions)
+
+    # Trước: chọn đáp án cho từng người từng câu, tính điểm mong đợi
+    plans = [[rng.choice("ABCD") for _ in range(args.rounds)] for _ in players]
+    expected = [sum(10 for r, c in enumerate(plan) if c == questions[r]["answer"]) for plan in plans]
+
+    stop_churn = threading.Event()
+    churn_ops = [0]
+
+    def churn():
+        # Người chơi vào rồi ra liên tục, kèm đọc bảng xếp hạng/kiểm tra đủ người
+        i = 0
+        while not stop_churn.is_set():
+            c = register(srv, f"churn{i}", room_id)
+            srv.handle_message(c, {"type": "ANSWER", "answer": "A"})
+            room.game.get_leaderboard()
+            room.game.check_all_answered()
+            srv.remove_client(c)
+            i += 1
+            churn_ops[0] += 1
+            time.sleep(0.001)
+
+    def answer_worker(indices, r):
+        for i in indices:
+            srv.handle_message(players[i], {"type": "ANSWER", "answer": plans[i][r]})
+            # Gửi lần 2 với đáp án khác: không được tính
+            srv.handle_message(players[i], {"type": "ANSWER", "answer": questions[r]["answer"]})
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        churn_thread = threading.Thread(target=churn)
+        churn_thread.start()
+        srv.start_room(room)
+        for r in range(args.rounds):
+            wait_question(room, r + 1)
+            slices = [range(t, args.players, args.threads) for t in range(args.threads)]
+            workers = [threading.Thread(target=answer_worker, args=(sl, r)) for sl in slices]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+        while room.is_game_running:
+            time.sleep(0.01)
+        stop_churn.set()
+        churn_thread.join()
+    elapsed = time.perf_counter() - start
+
+    actual = [room.game.players[srv.clients[c].id].score for c in players]
+    mismatches = [(i, e, a) for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+    answers = args.players * args.rounds * 2
+    print(f"{answers} ANSWER từ {args.threads} luồng, {args.rounds} câu, {churn_ops[0]} lượt vào/ra phòng, "
+          f"{elapsed:.2f}s ({answers / elapsed:.0f} ANSWER/s)")
+    if mismatches:
+        print(f"SAI ĐIỂM: {len(mismatches)} người, ví dụ {mismatches[:5]}")
+        sys.exit(1)
+    print(f"OK: điểm của {args.players} người chơi chính xác tuyệt đối")
+
+
+if __name__ == "__main__":
+    main()
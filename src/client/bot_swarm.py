@@ -0,0 +1,383 @@
+"""
+Tạo tải bằng bầy bot không giao diện (headless).
+
+Mỗi bot là 1 người chơi thật qua TCP: LOGIN (đề nghị codec giống NetworkClient),
+chờ QUESTION, "suy nghĩ" một lúc rồi ANSWER đúng với xác suất cho trước, tự kết
+nối lại khi bị ngắt (RESUME bằng token để giữ điểm, trừ khi --no-resume), trả
+lời PING của server. --hang-rate giả lập kết nối treo (half-open): bot im lặng hẳn
+nhưng không đóng socket, server phải tự phát hiện bằng heartbeat. Bot chạy trên asyncio (hàng nghìn bot / tiến trình), có thể
+chia ra nhiều tiến trình bằng --procs.
+
+Báo cáo p50/p95/p99 của:
+  - QUESTION fan-out: thời điểm bot nhận câu hỏi - thời điểm bot đầu tiên nhận
+    cùng câu đó (cùng máy nên các tiến trình dùng chung đồng hồ)
+  - ANSWER -> RESULT: từ lúc gửi đáp án đến lúc nhận kết quả câu đó
+  - số lần kết nối lỗi, bị ngắt, kết nối lại
+
+    python src/client/bot_swarm.py --bots 2000 --room-size 50 --questions 5 --procs 2
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# Dùng chung module giao thức/codec với Server và NetworkClient (thư mục src)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import FrameDecoder, RECV_SIZE, encode
+from codec import JSON, get_codec, decode_body
+from prefetch import PrefetchStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CHOICES = "ABCD"
+
+
+def load_answers(path):
+    """{nội dung câu hỏi: đáp án đúng} để bot trả lời đúng theo tỉ lệ --accuracy"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return {}
+    if text.lstrip().startswith("["):
+        questions = json.loads(text)
+    else:
+        questions = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return {q["question"]: q["answer"] for q in questions}
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Stats:
+    """Số liệu của 1 tiến trình, gửi về tiến trình cha để gộp"""
+
+    def __init__(self):
+        self.receipts = {}          # {"phòng|câu": [thời điểm nhận QUESTION]}
+        self.answer_to_result = []  # giây
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.reconnects = 0
+        self.logins = 0
+        self.games_finished = 0
+        self.answers = 0
+        self.revealed = 0           # Câu nhận bằng PREFETCH + REVEAL (--prefetch)
+        self.reveal_failures = 0
+        self.resumes = 0            # Kết nối lại giữa ván bằng token (RESUME_OK)
+        self.resume_failures = 0
+        self.hangs = 0              # Số lần giả lập kết nối treo (--hang-rate)
+        self.pings = 0
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class Bot:
+    def __init__(self, swarm, name, room):
+        self.swarm = swarm
+        self.name = name
+        self.room = room
+        self.is_host = False        # Server báo trong LOGIN_OK; chủ phòng gửi START
+        self.rng = random.Random(name)
+        self.answer_sent_at = None
+        self.finished = False
+        self.logged_in = asyncio.Event()
+        self.writer = None
+        self.codec = JSON
+        self.token = None           # Token phiên trong LOGIN_OK, dùng cho RESUME
+
+    async def run(self):
+        args, stats = self.swarm.args, self.swarm.stats
+        attempt = 0
+        while not self.finished and not self.swarm.stopping:
+            if self.room in self.swarm.finished_rooms:
+                return # Phòng đã chơi xong trong lúc bot rớt mạng
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(args.host, args.port), args.connect_timeout)
+            except (OSError, asyncio.TimeoutError):
+                stats.connect_failures += 1
+                attempt += 1
+                await asyncio.sleep(min(5.0, 0.1 * 2 ** attempt) * self.rng.random())
+                continue
+            if attempt or self.logged_in.is_set():
+                stats.reconnects += 1
+            attempt = 0
+            try:
+                await self.session(reader, writer)
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                writer.close()
+            if not self.finished and not self.swarm.stopping:
+                stats.disconnects += 1
+                await asyncio.sleep(self.rng.uniform(0.05, 0.5))
+
+    async def session(self, reader, writer):
+        args, stats = self.swarm.args, self.swarm.stats
+        self.writer, self.codec = writer, JSON
+        if self.token and not args.no_resume:
+            writer.write(encode(self.hello({"type": "RESUME", "token": self.token, "room": self.room})))
+        else:
+            writer.write(encode(self.hello({"type": "LOGIN", "name": self.name, "room": self.room})))
+        prefetched = PrefetchStore()
+
+        decoder = FrameDecoder()
+        while True:
+            data = await reader.read(RECV_SIZE)
+            if not data:
+                return
+            now = time.time()
+            for msg in decoder.feed(data):
+                msg_type = msg.get("type")
+                if msg_type == "PING":
+                    stats.pings += 1
+                    writer.write(encode({"type": "PONG"}, self.codec))
+                    continue
+                if msg_type == "PREFETCH":
+                    prefetched.add(msg)
+                    continue
+                if msg_type == "REVEAL":
+                    body = prefetched.reveal(msg)
+                    if body is None:
+                        stats.reveal_failures += 1
+                        continue
+                    stats.revealed += 1
+                    msg, msg_type = decode_body(body), "QUESTION"
+                if msg_type == "RESUME_OK":
+                    self.codec, self.token = get_codec(msg.get("codec")), msg.get("token")
+                    self.is_host = bool(msg.get("host"))
+                    stats.resumes += 1
+                    self.logged_in.set()
+                    question = msg.get("question")
+                    if question and not msg.get("answered"):
+                        asyncio.ensure_future(self.answer(writer, self.codec, question))
+                elif msg_type == "RESUME_FAILED":
+                    # Hết hạn giữ chỗ -> vào lại phòng như người mới
+                    stats.resume_failures += 1
+                    self.token = None
+                    writer.write(encode(self.hello({"type": "LOGIN", "name": self.name, "room": self.room})))
+                elif msg_type == "LOGIN_OK":
+                    self.codec, self.token = get_codec(msg.get("codec")), msg.get("token")
+                    self.is_host = bool(msg.get("host"))
+                    stats.logins += 1
+                    self.logged_in.set()
+                elif msg_type == "QUESTION":
+                    key = f"{self.room}|{msg.get('question_number')}"
+                    stats.receipts.setdefault(key, []).append(now)
+                    asyncio.ensure_future(self.answer(writer, self.codec, msg))
+                elif msg_type == "RESULT" and self.answer_sent_at is not None:
+                    stats.answer_to_result.append(time.perf_counter() - self.answer_sent_at)
+                    self.answer_sent_at = None
+                elif msg_type == "GAME_OVER":
+                    stats.games_finished += 1
+                    self.swarm.finished_rooms.add(self.room)
+                    self.finished = True
+                    return
+                if args.drop_rate and msg_type == "QUESTION" and self.rng.random() < args.drop_rate:
+                    return # Giả lập rớt mạng để thử kết nối lại
+                if args.hang_rate and msg_type == "QUESTION" and self.rng.random() < args.hang_rate:
+                    # Kết nối treo: không đọc, không gửi, không đóng socket; hết giờ thì kết nối lại
+                    stats.hangs += 1
+                    await asyncio.sleep(args.hang_seconds)
+                    return
+
+    def hello(self, message):
+        """LOGIN/RESUME kèm codec và prefetch đề nghị (giống NetworkClient)"""
+        args = self.swarm.args
+        if args.codec != "json":
+            message.update(codecs=[args.codec, "json"], compress=["zlib"] if args.compress else [])
+        if args.prefetch:
+            message["prefetch"] = True
+        return message
+
+    def start_game(self):
+        """Chủ phòng gửi START qua kết nối hiện tại"""
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(encode({"type": "START", "count": self.swarm.args.questions}, self.codec))
+
+    async def answer(self, writer, codec, question):
+        args = self.swarm.args
+        think = max(0.0, self.rng.gauss(args.think_ms, args.think_jitter_ms)) / 1000
+        await asyncio.sleep(think)
+        correct = self.swarm.answers.get(question.get("question"))
+        if correct and self.rng.random() < args.accuracy:
+            choice = correct
+        else:
+            choice = self.rng.choice([c for c in CHOICES if c != correct])
+        try:
+            writer.write(encode({"type": "ANSWER", "answer": choice}, codec))
+        except (OSError, RuntimeError):
+            return
+        self.answer_sent_at = time.perf_counter()
+        self.swarm.stats.answers += 1
+
+
+class Swarm:
+    """Các bot của 1 tiến trình"""
+
+    def __init__(self, args, index):
+        self.args = args
+        self.index = index
+        self.stats = Stats()
+        self.answers = load_answers(args.questions_file)
+        self.finished_rooms = set()
+        self.stopping = False
+
+    async def run(self, count, start_offset):
+        args = self.args
+        bots = []
+        for i in range(count):
+            global_index = start_offset + i
+            room = f"{args.room_prefix}-{global_index // args.room_size}"
+            bots.append(Bot(self, f"bot{global_index}", room))
+
+        tasks = []
+        for i, bot in enumerate(bots):
+            tasks.append(asyncio.ensure_future(bot.run()))
+            if args.connect_rate and i % args.connect_rate == args.connect_rate - 1:
+                await asyncio.sleep(1) # Giới hạn tốc độ mở kết nối
+        # Chờ mọi bot LOGIN xong (hoặc hết thời gian) rồi chủ phòng mới START
+        try:
+            await asyncio.wait_for(asyncio.gather(*(b.logged_in.wait() for b in bots)), args.login_timeout)
+        except asyncio.TimeoutError:
+            pass
+        for bot in bots:
+            if bot.is_host:
+                bot.start_game()
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks), args.duration)
+        except asyncio.TimeoutError:
+            pass
+        self.stopping = True
+        for task in tasks:
+            task.cancel()
+        return self.stats.to_dict()
+
+
+def process_main(args, index, count, start_offset, queue):
+    swarm = Swarm(args, index)
+    stats = asyncio.run(swarm.run(count, start_offset))
+    queue.put(stats)
+
+
+def aggregate(results):
+    total = Stats().to_dict()
+    receipts = {}
+    for result in results:
+        for key, value in result.items():
+            if key == "receipts":
+                for q, times in value.items():
+                    receipts.setdefault(q, []).extend(times)
+            elif key == "answer_to_result":
+                total[key].extend(value)
+            else:
+                total[key] += value
+    fan_out = []
+    for times in receipts.values():
+        first = min(times)
+        fan_out.extend(t - first for t in times)
+    del total["receipts"]
+    total["questions"] = len(receipts) # Số lượt (phòng, câu) đã phát
+    total["fan_out"] = fan_out
+    return total
+
+
+def report(total):
+    def line(label, values):
+        values = sorted(v * 1000 for v in values)
+        if not values:
+            print(f"  {label:<26} (không có mẫu)")
+            return
+        p = lambda x: percentile(values, x)
+        print(f"  {label:<26} p50 {p(50):8.1f} ms   p95 {p(95):8.1f} ms   p99 {p(99):8.1f} ms   (n={len(values)})")
+
+    print("Kết quả:")
+    line("QUESTION fan-out", total["fan_out"])
+    line("ANSWER -> RESULT", total["answer_to_result"])
+    print(f"  đăng nhập {total['logins']}, câu trả lời {total['answers']}, xong ván {total['games_finished']}")
+    print(f"  kết nối lỗi {total['connect_failures']}, bị ngắt {total['disconnects']}, kết nối lại {total['reconnects']}")
+    if total["revealed"] or total["reveal_failures"]:
+        print(f"  câu mở bằng khóa (REVEAL) {total['revealed']}, mở lỗi {total['reveal_failures']}")
+    if total["resumes"] or total["resume_failures"]:
+        print(f"  kết nối lại bằng token (RESUME) {total['resumes']}, thất bại {total['resume_failures']}")
+    if total["hangs"]:
+        print(f"  kết nối treo {total['hangs']}, PING đã trả lời {total['pings']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--bots", type=int, default=100, help="Tổng số bot")
+    parser.add_argument("--procs", type=int, default=1, help="Số tiến trình chạy bot")
+    parser.add_argument("--room-size", type=int, default=50, help="Số bot mỗi phòng")
+    parser.add_argument("--room-prefix", default="swarm")
+    parser.add_argument("--questions", type=int, default=5, help="Số câu mỗi ván (gửi trong START)")
+    parser.add_argument("--think-ms", type=float, default=500, help="Thời gian suy nghĩ trung bình")
+    parser.add_argument("--think-jitter-ms", type=float, default=200)
+    parser.add_argument("--accuracy", type=float, default=0.7, help="Xác suất trả lời đúng")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Xác suất tự rớt mạng sau mỗi câu hỏi")
+    parser.add_argument("--hang-rate", type=float, default=0.0,
+                        help="Xác suất kết nối treo (im lặng, không đóng socket) sau mỗi câu hỏi")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="Thời gian treo trước khi tự kết nối lại")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Kết nối lại bằng LOGIN mới thay cho RESUME (để so sánh)")
+    parser.add_argument("--codec", default="json", choices=["json", "msgpack"])
+    parser.add_argument("--compress", action="store_true", help="Đề nghị nén zlib")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Nhận trước câu hỏi đã mã hóa, lúc mở câu chỉ nhận khóa (REVEAL)")
+    parser.add_argument("--connect-rate", type=int, default=0, help="Số kết nối mới mỗi giây / tiến trình (0 = không giới hạn)")
+    parser.add_argument("--connect-timeout", type=float, default=10)
+    parser.add_argument("--login-timeout", type=float, default=30)
+    parser.add_argument("--duration", type=float, default=300, help="Thời gian chạy tối đa (giây)")
+    parser.add_argument("--questions-file", default=os.path.join(ROOT, "data", "questions.json"))
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Chia bot theo nguyên phòng cho từng tiến trình để chủ phòng biết khi nào đủ người
+    rooms = -(-args.bots // args.room_size)
+    per_proc = -(-rooms // args.procs) * args.room_size
+    start = time.time()
+    if args.procs == 1:
+        results = [asyncio.run(Swarm(args, 0).run(args.bots, 0))]
+    else:
+        queue = multiprocessing.Queue()
+        procs = []
+        for i in range(args.procs):
+            offset = i * per_proc
+            count = max(0, min(per_proc, args.bots - offset))
+            if count:
+                proc = multiprocessing.Process(target=process_main, args=(args, i, count, offset, queue))
+                proc.start()
+                procs.append(proc)
+        results = [queue.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    total = aggregate(results)
+    print(f"{args.bots} bot, {rooms} phòng, {args.procs} tiến trình, {time.time() - start:.1f}s")
+    report(total)
+    if args.json:
+        summary = {k: v for k, v in total.items() if not isinstance(v, list)}
+        for label in ("fan_out", "answer_to_result"):
+            values = sorted(total[label])
+            summary[label + "_ms"] = {f"p{p}": None if not values else round(percentile(values, p) * 1000, 2)
+                                      for p in (50, 95, 99)}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
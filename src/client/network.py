@@ -1,15 +1,39 @@
 ﻿import socket
 import threading
-import json
+import time
+import sys
+import os
+
+# Dùng chung module giao thức với Server (nằm ở thư mục src)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import FrameDecoder, RECV_SIZE, encode
+from codec import JSON, SUPPORTED, COMPRESSIONS, get_codec, decode_body
+from prefetch import PrefetchStore
+from session import RESUME_GRACE
+
+RECONNECT_DELAYS = (0.2, 0.5, 1, 2, 4) # Chờ giữa các lần thử kết nối lại (giây), lần sau cùng lặp lại
 
 class NetworkClient:
     # SỬA 1: Thêm tham số callback vào hàm khởi tạo __init__
-    def __init__(self, callback, host='127.0.0.1', port=65432):
+    def __init__(self, callback, host='127.0.0.1', port=65432, codecs=SUPPORTED, compress=COMPRESSIONS, prefetch=True):
         self.host = host
         self.port = port
         self.client_socket = None
         self.running = False
         self.callback = callback # Lưu hàm callback ngay từ đầu
+        # Codec đề nghị khi LOGIN; trước khi Server trả lời thì gửi JSON
+        self.codecs = list(codecs)
+        self.compress = list(compress)
+        self.codec = JSON
+        # Câu hỏi mã hóa nhận trước (PREFETCH), mở khi Server gửi khóa (REVEAL)
+        self.prefetch = prefetch
+        self.prefetched = PrefetchStore()
+        # Token phiên (LOGIN_OK) để kết nối lại giữa ván bằng RESUME khi rớt mạng
+        self.token = None
+        self.room = None
+        self.resume_grace = RESUME_GRACE
+        self._generation = 0 # Tăng mỗi lần connect(): luồng nhận của kết nối cũ tự dừng
 
     # SỬA 2: Hàm connect không cần nhận callback nữa
     def connect(self):
@@ -18,9 +42,12 @@ class NetworkClient:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.client_socket.connect((self.host, self.port))
             self.running = True
+            self._generation += 1
+            self.token = None
+            self.codec = JSON
             
             # Tạo luồng phụ để nhận tin nhắn từ Server
-            receive_thread = threading.Thread(target=self._receive_loop)
+            receive_thread = threading.Thread(target=self._receive_loop, args=(self._generation,))
             receive_thread.daemon = True # Tự tắt khi chương trình chính tắt
             receive_thread.start()
             return True
@@ -29,32 +56,112 @@ class NetworkClient:
             # Có thể ném lỗi ra ngoài để UI bắt được và hiện thông báo
             raise e
 
-    def _receive_loop(self):
+    def _active(self, generation):
+        return self.running and generation == self._generation
+
+    def _receive_loop(self, generation):
         """Luồng chạy ngầm để nhận dữ liệu JSON liên tục."""
-        while self.running:
+        while self._active(generation):
+            self._read_until_closed(generation)
+            # Mất kết nối ngoài ý muốn: thử kết nối lại bằng token, không được thì báo UI
+            if not self._active(generation) or not self.token or not self._reconnect(generation):
+                break
+        if self._active(generation):
+            self.running = False
+            if self.callback:
+                self.callback({"type": "DISCONNECTED", "message": "Mất kết nối tới Server."})
+
+    def _reconnect(self, generation):
+        """Mở kết nối mới và gửi RESUME trong thời gian Server còn giữ chỗ"""
+        deadline = time.monotonic() + self.resume_grace
+        attempt = 0
+        while self._active(generation) and time.monotonic() < deadline:
+            time.sleep(RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)])
+            attempt += 1
             try:
-                data = self.client_socket.recv(4096).decode('utf-8')
-                if not data:
+                sock = socket.create_connection((self.host, self.port), timeout=5)
+                sock.settimeout(None)
+            except OSError:
+                continue
+            self.client_socket = sock
+            # Kết nối mới: lại gửi JSON cho tới khi Server trả lời RESUME_OK; câu nhận trước đã mất khóa
+            self.codec = JSON
+            self.prefetched.clear()
+            self.send({"type": "RESUME", "token": self.token, "room": self.room})
+            return True
+        return False
+
+    def _read_until_closed(self, generation):
+        """Đọc và xử lý các gói tin tới khi kết nối hiện tại bị đóng"""
+        sock = self.client_socket
+        recv_buf = bytearray(RECV_SIZE)
+        recv_view = memoryview(recv_buf)
+        decoder = FrameDecoder()
+        probing = False # Đã gửi PING vì server im lặng quá lâu
+        while self._active(generation):
+            try:
+                n = sock.recv_into(recv_buf)
+                if not n:
                     break
+                probing = False
                 
-                # Parse JSON string thành Python dict
-                message = json.loads(data)
-                
-                # Gửi dữ liệu về UI thông qua hàm callback
-                if self.callback:
-                    self.callback(message)
+                # 1 lần recv có thể chứa nhiều gói (hoặc nửa gói) -> tách theo độ dài
+                for message in decoder.feed(recv_view[:n]):
+                    msg_type = message.get("type")
+                    if msg_type == "PING":
+                        self.send({"type": "PONG"}) # Heartbeat, không báo UI
+                        continue
+                    if msg_type == "PONG":
+                        continue
+                    if msg_type in ("LOGIN_OK", "RESUME_OK"):
+                        # Server đã chọn codec -> các gói gửi sau dùng codec này
+                        self.codec = get_codec(message.get("codec"))
+                        self.token = message.get("token")
+                        self.room = message.get("room")
+                        # Server PING khi mình im lặng, nên im lặng 2 chu kỳ là bất thường
+                        heartbeat = message.get("heartbeat")
+                        sock.settimeout(2 * heartbeat if heartbeat else None)
+                    elif msg_type == "RESUME_FAILED":
+                        self.token = None
+                    elif msg_type == "PREFETCH":
+                        self.prefetched.add(message) # Chưa đọc được, không báo UI
+                        continue
+                    elif msg_type == "REVEAL":
+                        # Giải mã câu đã nhận trước -> UI nhận gói QUESTION như bình thường
+                        body = self.prefetched.reveal(message)
+                        if body is None:
+                            print(f"Không mở được câu hỏi {message.get('question_number')}")
+                            continue
+                        message = decode_body(body)
+                    elif msg_type == "GAME_OVER":
+                        self.prefetched.clear()
+                    # Gửi dữ liệu về UI thông qua hàm callback
+                    if self.callback:
+                        self.callback(message)
                     
+            except socket.timeout:
+                # Server im lặng quá lâu: hỏi thử 1 lần, vẫn im thì coi như kết nối đã chết
+                # (half-open) -> đóng để kết nối lại bằng RESUME
+                if probing or not self._active(generation):
+                    break
+                probing = True
+                self.send({"type": "PING"})
             except Exception as e:
-                print(f"Lỗi nhận dữ liệu: {e}")
-                self.running = False
+                if self._active(generation):
+                    print(f"Lỗi nhận dữ liệu: {e}")
                 break
+        try:
+            sock.close()
+        except OSError:
+            pass
 
     def send(self, data_dict):
-        """Gửi dữ liệu từ Client lên Server (dưới dạng JSON)."""
+        """Gửi dữ liệu từ Client lên Server (JSON hoặc codec đã thỏa thuận)."""
         if self.client_socket:
             try:
-                json_data = json.dumps(data_dict)
-                self.client_socket.sendall(json_data.encode('utf-8'))
+                if data_dict.get("type") in ("LOGIN", "RESUME"):
+                    data_dict = dict(data_dict, codecs=self.codecs, compress=self.compress, prefetch=self.prefetch)
+                self.client_socket.sendall(encode(data_dict, self.codec))
             except Exception as e:
                 print(f"Lỗi gửi dữ liệu: {e}")
 
@@ -39,9 +39,11 @@ class MockNetworkClient:
     def simulate_result(self, is_correct):
         import time
         time.sleep(0.5)
+        self.callback({"type": "ROUND_RESULT", "correct_answer": "B", "top": [], "total_players": 1})
         self.callback({
             "type": "RESULT",
-            "correct_answer": "B",
+            "correct": is_correct,
+            "points": 10 if is_correct else 0,
             "score": 10 if is_correct else 0
         })
         
@@ -53,6 +55,12 @@ class MockNetworkClient:
 
 
 #QUIZ UI
+# Mỗi màn hình (đăng nhập, chờ, câu hỏi, kết quả, kết thúc) là 1 Frame được tạo
+# 1 lần ở lần hiện đầu tiên. Khi có gói tin mới chỉ đổi text/màu của widget có sẵn
+# và ẩn/hiện frame (pack_forget), không hủy rồi tạo lại cả cây widget mỗi câu hỏi.
+HEADER_BG = "#4A90E2"
+QUIZ_BG = "#f0f0f0"
+
 class QuizUI:
     def __init__(self, demo_mode=True):
         self.root = tk.Tk()
@@ -72,12 +80,20 @@ class QuizUI:
             self.client = NetworkClient(self.handle_server_message)
 
         self.username = ""
+        self.room = ""
+        self.live_top = []        # Top 10 trực tiếp nhận từ gói ROUND_RESULT
+        self.round_result = {}    # Phần kết quả chung của câu vừa rồi (đáp án đúng, phân bố)
+        self.total_players = 0
         self.current_question = None
         self.selected_answer = tk.StringVar()
         self.score = 0
         self.total_questions = 0
         self.answered = False 
 
+        # Các màn hình đã tạo: {tên: Frame}, chỉ 1 màn hình được pack tại 1 thời điểm
+        self.screens = {}
+        self.current_screen = None
+
         self.build_login_screen()
 
     def center_window(self):
@@ -88,34 +104,59 @@ class QuizUI:
         y = (self.root.winfo_screenheight() // 2) - (height // 2)
         self.root.geometry(f'{width}x{height}+{x}+{y}')
 
-    #LOGIN SCREEN
-    def build_login_screen(self):
-        self.clear_screen()
-
-        header_frame = tk.Frame(self.root, bg="#4A90E2", height=100)
+    def show_screen(self, name):
+        """Hiện màn hình name (tạo ở lần đầu bằng _create_<name>_screen), ẩn màn hình cũ"""
+        screen = self.screens.get(name)
+        if screen is None:
+            screen = self.screens[name] = tk.Frame(self.root)
+            getattr(self, f"_create_{name}_screen")(screen)
+        if self.current_screen is not screen:
+            if self.current_screen is not None:
+                self.current_screen.pack_forget()
+                if self.current_screen is self.screens.get("waiting"):
+                    self.waiting_progress.stop() # Không chạy animation cho màn hình đã ẩn
+            screen.pack(fill="both", expand=True)
+            self.current_screen = screen
+        return screen
+
+    def make_header(self, parent, height, bg=HEADER_BG):
+        header_frame = tk.Frame(parent, bg=bg, height=height)
         header_frame.pack(fill="x")
         header_frame.pack_propagate(False)
-        
+        return header_frame
+
+    #LOGIN SCREEN
+    def _create_login_screen(self, screen):
+        header_frame = self.make_header(screen, 100)
         tk.Label(header_frame, text=" NETWORK QUIZ BATTLE",
                  font=("Arial", 20, "bold"),
-                 bg="#4A90E2", fg="white").pack(expand=True)
+                 bg=HEADER_BG, fg="white").pack(expand=True)
 
-        form_frame = tk.Frame(self.root)
+        form_frame = tk.Frame(screen)
         form_frame.pack(expand=True)
 
         tk.Label(form_frame, text="Nhập tên người chơi:", font=("Arial", 14)).pack(pady=20)
 
         self.name_entry = tk.Entry(form_frame, font=("Arial", 14), width=20)
         self.name_entry.pack(pady=10)
-        self.name_entry.focus()
         self.name_entry.bind('<Return>', lambda e: self.login())
 
+        tk.Label(form_frame, text="Phòng (để trống = phòng chung):", font=("Arial", 12)).pack(pady=(10, 0))
+
+        self.room_entry = tk.Entry(form_frame, font=("Arial", 14), width=20)
+        self.room_entry.pack(pady=10)
+        self.room_entry.bind('<Return>', lambda e: self.login())
+
         tk.Button(form_frame, text=" Bắt đầu",
                   font=("Arial", 14, "bold"),
                   bg="#4CAF50", fg="white",
                   padx=30, pady=10,
                   command=self.login).pack(pady=30)
 
+    def build_login_screen(self):
+        self.show_screen("login")
+        self.name_entry.focus()
+
     def login(self):
         name = self.name_entry.get().strip()
         if not name:
@@ -123,87 +164,150 @@ class QuizUI:
             return
 
         self.username = name
+        self.room = self.room_entry.get().strip()
         try:
             self.client.connect()
             self.client.send({
                 "type": "LOGIN",
-                "name": self.username
+                "name": self.username,
+                "room": self.room
             })
             self.build_waiting_screen()
         except Exception as e:
             messagebox.showerror(" Lỗi kết nối", f"Không thể kết nối Server:\n{e}")
 
     #WAITING SCREEN
-    def build_waiting_screen(self):
-        self.clear_screen()
-        
-        header_frame = tk.Frame(self.root, bg="#4A90E2", height=80)
-        header_frame.pack(fill="x")
-        
-        tk.Label(header_frame, text=f" Xin chào, {self.username}!",
-                 font=("Arial", 16, "bold"), bg="#4A90E2", fg="white").pack(expand=True, fill="both")
+    def _create_waiting_screen(self, screen):
+        header_frame = self.make_header(screen, 80)
+        self.welcome_label = tk.Label(header_frame, font=("Arial", 16, "bold"), bg=HEADER_BG, fg="white")
+        self.welcome_label.pack(expand=True, fill="both")
 
-        content_frame = tk.Frame(self.root)
+        content_frame = tk.Frame(screen)
         content_frame.pack(expand=True)
 
-        tk.Label(content_frame, text=" Đang chờ người chơi khác...", font=("Arial", 14)).pack(pady=30)
+        tk.Label(content_frame, text=" Đang chờ người chơi khác...", font=("Arial", 14)).grid(row=0, pady=30)
         
-        progress = ttk.Progressbar(content_frame, mode='indeterminate', length=300)
-        progress.pack(pady=20)
-        progress.start(10)
+        self.waiting_progress = ttk.Progressbar(content_frame, mode='indeterminate', length=300)
+        self.waiting_progress.grid(row=1, pady=20)
+
+        # Phần dành cho chủ phòng: chỉ hiện khi LOGIN_OK báo mình là host
+        self.host_label = tk.Label(content_frame, font=("Arial", 12), fg="#666")
+        self.host_label.grid(row=2, pady=5)
+        self.start_btn = tk.Button(content_frame, text="▶ Bắt đầu ván",
+                                   font=("Arial", 13, "bold"), bg="#4CAF50", fg="white",
+                                   padx=30, pady=8,
+                                   command=lambda: self.client.send({"type": "START"}))
+        self.start_btn.grid(row=3, pady=10)
 
-    #QUIZ SCREEN
-    def build_quiz_screen(self, question_data):
-        self.clear_screen()
-        self.current_question = question_data
-        self.selected_answer.set("")
-        self.answered = False
+    def build_waiting_screen(self):
+        self.show_screen("waiting")
+        self.welcome_label.config(text=f" Xin chào, {self.username}!")
+        self.host_label.grid_remove()
+        self.start_btn.grid_remove()
+        self.waiting_progress.start(10)
+
+    def on_login_ok(self, message):
+        """Chủ phòng (người tạo phòng) có nút bắt đầu ván"""
+        if message.get("room"):
+            self.room = message["room"]
+        if message.get("host") and self.current_screen is self.screens.get("waiting"):
+            self.host_label.config(text=f"Bạn là chủ phòng '{self.room}'")
+            self.host_label.grid()
+            self.start_btn.grid()
+
+    def on_resume(self, message):
+        """Đã kết nối lại giữa ván: vẽ lại trạng thái hiện tại từ gói RESUME_OK"""
+        self.room = message.get("room", self.room)
+        self.score = message.get("score", self.score)
+        question = message.get("question")
+        if question:
+            self.build_quiz_screen(question)
+            if message.get("answered"):
+                # Câu này đã trả lời trước khi rớt mạng
+                self.answered = True
+                self.submit_btn.config(state="disabled", bg="gray")
+        elif message.get("phase") == "WAITING":
+            self.build_waiting_screen()
+            self.on_login_ok(message)
+        # Đang nghỉ giữa 2 câu: giữ màn hình hiện tại, câu tiếp theo sẽ tới ngay
+
+    def on_connection_lost(self, message):
+        try: self.client.close()
+        except: pass
+        messagebox.showwarning(" Mất kết nối", message.get("message") or "Không kết nối lại được.")
+        self.restart_game()
 
+    #QUIZ SCREEN
+    def _create_quiz_screen(self, screen):
         # Info Header
-        header_frame = tk.Frame(self.root, bg="#4A90E2", height=80)
-        header_frame.pack(fill="x")
+        header_frame = self.make_header(screen, 80)
         
-        info_frame = tk.Frame(header_frame, bg="#4A90E2")
+        info_frame = tk.Frame(header_frame, bg=HEADER_BG)
         info_frame.pack(expand=True, fill="both", padx=20)
         
-        tk.Label(info_frame, 
-                text=f"Câu {question_data.get('question_number', '?')}/{question_data.get('total_questions', '?')}",
-                font=("Arial", 12, "bold"), bg="#4A90E2", fg="white").pack(side="left")
+        self.question_no_label = tk.Label(info_frame, font=("Arial", 12, "bold"), bg=HEADER_BG, fg="white")
+        self.question_no_label.pack(side="left")
         
-        tk.Label(info_frame, text=f"Điểm: {self.score}",
-                font=("Arial", 12, "bold"), bg="#4A90E2", fg="white").pack(side="right")
+        self.quiz_score_label = tk.Label(info_frame, font=("Arial", 12, "bold"), bg=HEADER_BG, fg="white")
+        self.quiz_score_label.pack(side="right")
+
+        # Nút gửi pack trước (side bottom) để luôn còn chỗ dù câu hỏi dài
+        self.submit_btn = tk.Button(screen, text="✓ Gửi đáp án",
+                  font=("Arial", 13, "bold"), bg="#4CAF50", fg="white",
+                  padx=40, pady=12, command=self.submit_answer)
+        self.submit_btn.pack(side="bottom", pady=20)
 
         # Question Body
-        question_frame = tk.Frame(self.root, bg="#f0f0f0")
+        question_frame = tk.Frame(screen, bg=QUIZ_BG)
         question_frame.pack(fill="both", expand=True, padx=20, pady=20)
 
-        tk.Label(question_frame, text=" Câu hỏi:", font=("Arial", 12, "bold"), bg="#f0f0f0").pack(anchor="w", pady=(10, 5))
+        tk.Label(question_frame, text=" Câu hỏi:", font=("Arial", 12, "bold"), bg=QUIZ_BG).pack(anchor="w", pady=(10, 5))
         
-        tk.Label(question_frame, text=question_data["question"],
-                 wraplength=500, font=("Arial", 13), bg="#f0f0f0", justify="left").pack(anchor="w", pady=10, padx=10)
+        self.question_label = tk.Label(question_frame, wraplength=500, font=("Arial", 13),
+                                       bg=QUIZ_BG, justify="left")
+        self.question_label.pack(anchor="w", pady=10, padx=10)
 
-        options_frame = tk.Frame(question_frame, bg="#f0f0f0")
-        options_frame.pack(fill="both", expand=True, pady=10)
+        self.options_frame = tk.Frame(question_frame, bg=QUIZ_BG)
+        self.options_frame.pack(fill="both", expand=True, pady=10)
+        self.option_buttons = [] # Tạo thêm khi gặp câu có nhiều đáp án hơn
 
-        for i, option_text in enumerate(question_data["options"]):
-            option_key = chr(65 + i) # 0->A, 1->B...
-            
+    def _option_button(self, i):
+        """Radiobutton của đáp án thứ i (tạo lần đầu cần tới)"""
+        while len(self.option_buttons) <= i:
             rb = tk.Radiobutton(
-                options_frame,
-                text=f"{option_key}. {option_text}",
+                self.options_frame,
                 variable=self.selected_answer,
-                value=option_key,  
+                value=chr(65 + len(self.option_buttons)), # 0->A, 1->B...
                 font=("Arial", 12),
-                bg="#f0f0f0",
+                bg=QUIZ_BG,
                 activebackground="#e0e0e0",
-                selectcolor="#4CAF50"
+                selectcolor="#4CAF50",
+                anchor="w"
             )
-            rb.pack(anchor="w", padx=30, pady=5)
+            rb.grid(row=len(self.option_buttons), sticky="w", padx=30, pady=5)
+            self.option_buttons.append(rb)
+        return self.option_buttons[i]
 
-        self.submit_btn = tk.Button(self.root, text="✓ Gửi đáp án",
-                  font=("Arial", 13, "bold"), bg="#4CAF50", fg="white",
-                  padx=40, pady=12, command=self.submit_answer)
-        self.submit_btn.pack(pady=20)
+    def build_quiz_screen(self, question_data):
+        self.show_screen("quiz")
+        self.current_question = question_data
+        self.selected_answer.set("")
+        self.answered = False
+
+        self.question_no_label.config(
+            text=f"Câu {question_data.get('question_number', '?')}/{question_data.get('total_questions', '?')}")
+        self.quiz_score_label.config(text=f"Điểm: {self.score}")
+        self.question_label.config(text=question_data["question"])
+
+        options = question_data["options"]
+        for i, option_text in enumerate(options):
+            rb = self._option_button(i)
+            rb.config(text=f"{chr(65 + i)}. {option_text}")
+            rb.grid()
+        for rb in self.option_buttons[len(options):]:
+            rb.grid_remove() # Câu này ít đáp án hơn câu trước
+
+        self.submit_btn.config(state="normal", bg="#4CAF50")
 
     def submit_answer(self):
         answer = self.selected_answer.get()
@@ -225,73 +329,109 @@ class QuizUI:
             self.answered = False
 
     #RESULT SCREEN
+    def _create_result_screen(self, screen):
+        header_frame = self.make_header(screen, 80)
+        self.result_score_label = tk.Label(header_frame, font=("Arial", 16, "bold"), bg=HEADER_BG, fg="white")
+        self.result_score_label.pack(expand=True)
+
+        content_frame = tk.Frame(screen)
+        content_frame.pack(expand=True)
+
+        self.verdict_label = tk.Label(content_frame, font=("Arial", 28, "bold"))
+        self.verdict_label.grid(row=0, pady=40)
+        self.correct_label = tk.Label(content_frame, font=("Arial", 13), fg="#666")
+        self.correct_label.grid(row=1, pady=10)
+        self.live_top_label = tk.Label(content_frame, font=("Arial", 10), justify="left")
+        self.live_top_label.grid(row=2, pady=5)
+        tk.Label(content_frame, text=" Chờ câu hỏi tiếp theo...", font=("Arial", 12), fg="#666").grid(row=3, pady=20)
+
     def show_result(self, result_data):
-        self.clear_screen()
+        self.show_screen("result")
         self.score = result_data.get('score', self.score)
         
-        #Logic kiểm tra đúng sai tại Client để hiển thị màu
-        server_correct_ans = result_data.get("correct_answer", "")
-        my_ans = self.selected_answer.get()
-        
-        # Nếu đáp án mình chọn (my_ans) trùng với Server (correct_ans) thì là Đúng
-        is_correct = (my_ans == server_correct_ans) and (my_ans != "")
+        # Server báo đúng/sai; đáp án đúng nằm trong gói ROUND_RESULT chung đến ngay trước
+        server_correct_ans = self.round_result.get("correct_answer", "")
+        is_correct = bool(result_data.get("correct"))
 
         # Header
-        header_frame = tk.Frame(self.root, bg="#4A90E2", height=80)
-        header_frame.pack(fill="x")
-        tk.Label(header_frame, text=f"Điểm hiện tại: {self.score}",
-                 font=("Arial", 16, "bold"), bg="#4A90E2", fg="white").pack(expand=True)
-
-        content_frame = tk.Frame(self.root)
-        content_frame.pack(expand=True)
+        rank = result_data.get("rank")
+        rank_text = f"   |   Hạng: {rank}/{self.total_players}" if rank else ""
+        self.result_score_label.config(text=f"Điểm hiện tại: {self.score}{rank_text}")
 
         if is_correct:
-            tk.Label(content_frame, text=" CHÍNH XÁC!", font=("Arial", 28, "bold"), fg="#4CAF50").pack(pady=40)
+            self.verdict_label.config(text=f" CHÍNH XÁC! +{result_data.get('points', 0)}", fg="#4CAF50")
+            self.correct_label.grid_remove()
+        else:
+            self.verdict_label.config(text=" SAI RỒI!", fg="#F44336")
+            self.correct_label.config(text=f"Đáp án đúng: {server_correct_ans}")
+            self.correct_label.grid()
+
+        if self.live_top:
+            top_text = "\n".join(f"{i}. {p['name']}: {p['score']}" for i, p in enumerate(self.live_top, 1))
+            self.live_top_label.config(text=top_text)
+            self.live_top_label.grid()
         else:
-            tk.Label(content_frame, text=" SAI RỒI!", font=("Arial", 28, "bold"), fg="#F44336").pack(pady=40)
-            tk.Label(content_frame, text=f"Đáp án đúng: {server_correct_ans}", 
-                    font=("Arial", 13), fg="#666").pack(pady=10)
+            self.live_top_label.grid_remove()
 
-        tk.Label(content_frame, text=" Chờ câu hỏi tiếp theo...", font=("Arial", 12), fg="#666").pack(pady=20)
+    def on_round_result(self, message):
+        """Kết quả chung (đáp án đúng + top 10) đến ngay trước RESULT, lưu lại để hiện cùng kết quả"""
+        self.round_result = message
+        self.live_top = message.get("top", [])
+        self.total_players = message.get("total_players", 0)
 
     #GAME OVER
-    def show_game_over(self, message):
-        self.clear_screen()
-        header_frame = tk.Frame(self.root, bg="#F44336", height=100)
-        header_frame.pack(fill="x")
+    def _create_game_over_screen(self, screen):
+        header_frame = self.make_header(screen, 100, bg="#F44336")
         tk.Label(header_frame, text=" GAME OVER", font=("Arial", 24, "bold"), bg="#F44336", fg="white").pack(expand=True)
 
-        content_frame = tk.Frame(self.root)
+        content_frame = tk.Frame(screen)
         content_frame.pack(expand=True)
 
-        tk.Label(content_frame, text=f"Điểm cuối cùng: {message.get('score', self.score)}",
-                 font=("Arial", 18, "bold")).pack(pady=30)
+        self.final_score_label = tk.Label(content_frame, font=("Arial", 18, "bold"))
+        self.final_score_label.grid(row=0, pady=30)
 
-        if "leaderboard" in message:
-            tk.Label(content_frame, text=" Bảng xếp hạng:", font=("Arial", 14, "bold")).pack(pady=10)
-            for i, player in enumerate(message["leaderboard"], 1):
-                medal = "" if i==1 else "🥈" if i==2 else "🥉" if i==3 else "  "
-                tk.Label(content_frame, text=f"{medal} {i}. {player['name']}: {player['score']}").pack()
+        self.board_title = tk.Label(content_frame, text=" Bảng xếp hạng:", font=("Arial", 14, "bold"))
+        self.board_title.grid(row=1, pady=10)
+        # Cả bảng xếp hạng trong 1 Label nhiều dòng (không tạo 1 Label cho mỗi người)
+        self.board_label = tk.Label(content_frame, justify="left")
+        self.board_label.grid(row=2)
 
         btn_frame = tk.Frame(content_frame)
-        btn_frame.pack(pady=30)
+        btn_frame.grid(row=3, pady=30)
         tk.Button(btn_frame, text="🔄 Chơi lại", font=("Arial", 12), bg="#4CAF50", fg="white", padx=20, command=self.restart_game).pack(side="left", padx=10)
         tk.Button(btn_frame, text="🚪 Thoát", font=("Arial", 12), bg="#F44336", fg="white", padx=20, command=self.quit_game).pack(side="left", padx=10)
 
+    def show_game_over(self, message):
+        self.show_screen("game_over")
+        self.final_score_label.config(text=f"Điểm cuối cùng: {message.get('score', self.score)}")
+
+        if "leaderboard" in message:
+            lines = []
+            for i, player in enumerate(message["leaderboard"], 1):
+                medal = "" if i==1 else "🥈" if i==2 else "🥉" if i==3 else "  "
+                lines.append(f"{medal} {i}. {player['name']}: {player['score']}")
+            self.board_label.config(text="\n".join(lines))
+            self.board_title.grid()
+            self.board_label.grid()
+        else:
+            self.board_title.grid_remove()
+            self.board_label.grid_remove()
+
     #HANDLERS & UTILS
     def handle_server_message(self, message):
         self.root.after(0, self.process_message, message)
 
     def process_message(self, message):
         msg_type = message.get("type")
-        if msg_type == "QUESTION": self.build_quiz_screen(message)
+        if msg_type == "LOGIN_OK": self.on_login_ok(message)
+        elif msg_type == "QUESTION": self.build_quiz_screen(message)
+        elif msg_type == "ROUND_RESULT": self.on_round_result(message)
         elif msg_type == "RESULT": self.show_result(message)
         elif msg_type == "GAME_OVER": self.show_game_over(message)
+        elif msg_type == "RESUME_OK": self.on_resume(message)
+        elif msg_type in ("RESUME_FAILED", "DISCONNECTED"): self.on_connection_lost(message)
         elif msg_type == "ERROR": messagebox.showerror(" Lỗi", message.get("message"))
 
-    def clear_screen(self):
-        for widget in self.root.winfo_children(): widget.destroy()
-
     def restart_game(self):
         self.score = 0
         self.build_login_screen()
@@ -0,0 +1,407 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import socket
+import sys
+import os
+import threading
+
+# Chạy nhiều tiến trình worker trên cùng 1 cổng để dùng hết các core CPU.
+#
+# Tiến trình cha giữ socket listen, đọc gói đầu tiên (LOGIN hoặc RESUME, đều có
+# "room") của mỗi kết nối để biết người chơi vào phòng nào, rồi chuyển file descriptor của kết nối sang
+# worker đang giữ phòng đó (socket.send_fds). Nhờ vậy mọi thành viên của 1 ván
+# luôn nằm chung 1 tiến trình. (SO_REUSEPORT không làm được điều này vì kernel
+# tự chia kết nối theo hash địa chỉ, không biết phòng.)
+#
+# Kênh IPC cha <-> worker là socketpair AF_UNIX/SOCK_SEQPACKET (giữ ranh giới
+# gói tin), mỗi gói = 1 frame JSON của protocol.py + (tùy chọn) bytes thô đi kèm.
+#   cha -> worker : CONN (kèm fd), ADMIN (lệnh console), RECOVER (ván dở trong journal),
+#                   ROOM_REJECT (phòng worker vừa tạo đang do worker khác giữ)
+#   worker -> cha : ROOM_OPEN, ROOM_CLOSED, SAVE_SCORES (chia thành nhiều gói "more": true
+#                   khi phòng đông, cha gộp lại rồi ghi 1 lần cho cả ván)
+# Cha là nơi duy nhất ghi highscore nên các worker không ghi đè file của nhau.
+#
+# Bảng phòng -> worker của cha (RoomDirectory) là nguồn sự thật duy nhất. Mỗi CONN
+# mang "room" và số thứ tự "seq"; worker chỉ báo ROOM_CLOSED khi phòng trống và
+# không còn kết nối nào được chuyển tới cho phòng đó mà chưa vào phòng, kèm seq của
+# CONN cuối nó nhận. Cha chỉ nhả phòng nếu seq đó là CONN cuối cha đã gửi (không có
+# kết nối nào của phòng đang trên đường tới worker), nên 1 phòng không bị tạo lại ở
+# worker khác trong khi worker cũ vẫn còn người. Worker tạo phòng mà cha đang giao cho
+# worker khác (VD: gói đầu tiên không phải LOGIN của phòng đó) -> ROOM_REJECT: worker
+# mời mọi người trong phòng kết nối lại, lần này cha chuyển họ tới đúng worker.
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from protocol import FrameDecoder, FrameTooLarge, HEADER, RECV_SIZE, encode
+from room import normalize_room_id
+from data_manager import DataManager
+from journal import active_journals, journal_room
+from metrics import serve_metrics
+from logs import LOGGER_NAME, get_logger, setup_logging
+import server as server_module
+
+log = get_logger("cluster")
+
+LOGIN_TIMEOUT = 10.0  # Kết nối phải gửi LOGIN trong thời gian này
+IPC_MAX = 256 * 1024  # Kích thước tối đa 1 gói IPC
+IPC_CHUNK = 64 * 1024 # Kích thước mục tiêu 1 gói SAVE_SCORES (1 datagram phải nhỏ hơn bộ đệm gửi của socket)
+SCORES_PER_IPC = 1000 # Số điểm mỗi gói SAVE_SCORES (tên dài thì chia nhỏ hơn)
+
+
+def pack_ipc(message_dict, extra=b""):
+    return encode(message_dict) + extra
+
+
+def unpack_ipc(data):
+    """Tách gói IPC thành (dict, bytes thô đi kèm)"""
+    (length,) = HEADER.unpack_from(data, 0)
+    end = HEADER.size + length
+    return json.loads(data[HEADER.size:end]), data[end:]
+
+
+class RoomDirectory:
+    """Bảng phòng -> worker của tiến trình cha"""
+
+    def __init__(self, workers):
+        self.owner = {}          # {room_id: worker index}
+        self.counts = [0] * workers
+        self.last_seq = {}       # {room_id: seq của CONN cuối đã chuyển cho worker giữ phòng}
+        self._seq = 0
+
+    def pick(self, room_id):
+        """Phòng đã có -> worker đang giữ; phòng mới -> worker ít phòng nhất"""
+        index = self.owner.get(room_id)
+        if index is None:
+            index = min(range(len(self.counts)), key=self.counts.__getitem__)
+            self._claim(room_id, index)
+        return index
+
+    def route(self, room_id):
+        """1 kết nối mới vào phòng: (worker, seq gắn vào CONN)"""
+        index = self.pick(room_id)
+        self._seq += 1
+        self.last_seq[room_id] = self._seq
+        return index, self._seq
+
+    def opened(self, index, room_id):
+        """Worker vừa tạo phòng. Trả về worker khác đang giữ phòng đó (xung đột), ngược lại None"""
+        owner = self.owner.get(room_id)
+        if owner is None:
+            self._claim(room_id, index) # Phòng được tạo lại sau khi đã nhả
+        elif owner != index:
+            return owner
+        return None
+
+    def closed(self, index, room_id, seq):
+        """Worker báo phòng đã trống. True nếu phòng được nhả"""
+        if self.owner.get(room_id) != index or seq != self.last_seq.get(room_id, 0):
+            # Còn CONN của phòng đang trên đường tới worker (nó sẽ báo lại), hoặc phòng đã bị từ chối
+            return False
+        del self.owner[room_id]
+        self.last_seq.pop(room_id, None)
+        self.counts[index] -= 1
+        return True
+
+    def _claim(self, room_id, index):
+        self.owner[room_id] = index
+        self.counts[index] += 1
+
+
+class WorkerServer(server_module.AsyncQuizServer):
+    """AsyncQuizServer không tự listen, nhận kết nối và lệnh qua kênh IPC"""
+
+    def __init__(self, index, channel, metrics_port=None, **kwargs):
+        super().__init__(listen=False, **kwargs)
+        self.index = index
+        self.channel = channel
+        self.routing = {}      # {room_id: [seq CONN cuối, số kết nối được chuyển tới chưa vào phòng]}
+        self.routed_conns = {} # {writer: room_id} của các kết nối đó
+        if metrics_port is not None:
+            # Mỗi worker có số liệu riêng -> 1 cổng riêng
+            serve_metrics(self.metrics, metrics_port + index)
+
+    def _notify(self, message_dict):
+        try:
+            self.channel.send(pack_ipc(message_dict))
+        except OSError as e:
+            log.warning(" Không gửi được %s cho tiến trình cha: %s", message_dict.get("op"), e)
+
+    def _room_opened(self, room):
+        self._notify({"op": "ROOM_OPEN", "room": room.room_id})
+
+    def _room_closed(self, room):
+        entry = self.routing.get(room.room_id)
+        if entry is None or entry[1] == 0:
+            self._release(room.room_id)
+        # Còn kết nối vào phòng này chưa LOGIN: báo khi chúng xong (_route_done)
+
+    def _release(self, room_id):
+        seq = self.routing.pop(room_id, (0, 0))[0]
+        self._notify({"op": "ROOM_CLOSED", "room": room_id, "seq": seq})
+
+    def _routed(self, room_id, seq):
+        """Nhận CONN của phòng room_id: giữ phòng cho tới khi kết nối vào phòng hoặc đóng"""
+        entry = self.routing.setdefault(room_id, [0, 0])
+        entry[0] = seq
+        entry[1] += 1
+
+    def _route_done(self, room_id):
+        entry = self.routing[room_id]
+        entry[1] -= 1
+        if entry[1] == 0 and room_id not in self.rooms:
+            self._release(room_id)
+
+    def join_room(self, player, room_id):
+        room = super().join_room(player, room_id)
+        routed = self.routed_conns.pop(player.conn, None)
+        if routed is not None:
+            self._route_done(routed)
+        return room
+
+    def reject_room(self, room_id, owner):
+        """Cha báo phòng này do worker khác giữ: mọi người trong phòng phải kết nối lại"""
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+        log.warning(" Phòng %s đang ở worker %d, mời %d người kết nối lại", room_id, owner,
+                    len(room.audience_list()))
+        room.is_game_running = False # Không giữ chỗ RESUME ở worker này
+        for player in room.audience_list():
+            self.send_to_client(player, {"type": "ERROR", "message": "Phòng đã chuyển máy chủ, hãy kết nối lại."})
+            self.remove_client(player.conn)
+        self._close_room(room)
+
+    def save_scores(self, entries):
+        # Ghi highscore qua tiến trình cha (1 người ghi duy nhất), chia gói theo IPC_CHUNK
+        chunks = [entries[i:i + SCORES_PER_IPC] for i in range(0, len(entries), SCORES_PER_IPC)] or [[]]
+        packets = []
+        while chunks:
+            chunk = chunks.pop(0)
+            data = pack_ipc({"op": "SAVE_SCORES", "scores": chunk, "more": True})
+            if len(data) > IPC_CHUNK and len(chunk) > 1:
+                half = len(chunk) // 2
+                chunks[:0] = [chunk[:half], chunk[half:]]
+            elif len(data) > IPC_CHUNK:
+                log.warning(" Bỏ điểm của %r: tên quá dài để gửi qua IPC", chunk[0].get("name", "")[:32])
+            else:
+                packets.append(chunk)
+        for i, chunk in enumerate(packets):
+            self._notify({"op": "SAVE_SCORES", "scores": chunk, "more": i < len(packets) - 1})
+
+    def _on_channel(self):
+        try:
+            data, fds, _flags, _addr = socket.recv_fds(self.channel, IPC_MAX, 1)
+        except OSError:
+            data, fds = b"", []
+        if not data:
+            # Tiến trình cha đã thoát -> worker dừng theo
+            self.loop.remove_reader(self.channel)
+            self.stopped.set_result(None)
+            return
+
+        message, extra = unpack_ipc(data)
+        op = message.get("op")
+        if op == "CONN" and fds:
+            sock = socket.socket(fileno=fds[0])
+            room_id = message.get("room")
+            self._routed(room_id, message.get("seq", 0))
+            self.loop.create_task(self._adopt(sock, extra, room_id))
+        elif op == "ADMIN":
+            print(f" [worker {self.index}]")
+            self.admin_command(message.get("cmd", ""))
+        elif op == "RECOVER" and self.journal is not None:
+            self.recover_journal(message["path"])
+        elif op == "ROOM_REJECT":
+            self.reject_room(message["room"], message["owner"])
+
+    async def _adopt(self, sock, initial_data, room_id):
+        """Nhận kết nối do cha chuyển sang, kèm các bytes cha đã đọc trước"""
+        sock.setblocking(False)
+        try:
+            reader, writer = await asyncio.open_connection(sock=sock)
+        except OSError:
+            sock.close()
+            self._route_done(room_id)
+            return
+        self.routed_conns[writer] = room_id
+        try:
+            await self.handle_client_async(reader, writer, initial_data)
+        finally:
+            # Đóng mà chưa vào phòng nào (LOGIN lỗi, RESUME...)
+            if self.routed_conns.pop(writer, None) is not None:
+                self._route_done(room_id)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.scheduler.attach(self.loop)
+        self.stopped = self.loop.create_future()
+        self.loop.add_reader(self.channel, self._on_channel)
+        await self.stopped
+
+    def start(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+
+def worker_main(index, channel, inherited, options):
+    # Đóng đầu kênh của các worker khác mà tiến trình con thừa hưởng khi fork,
+    # để worker nhận được EOF khi tiến trình cha thoát
+    for sock in inherited:
+        sock.close()
+    # Luồng ghi log của cha không tồn tại sau fork -> tạo lại cho worker (cùng mức log)
+    logger = logging.getLogger(LOGGER_NAME)
+    if logger.handlers:
+        setup_logging(logger.level)
+    WorkerServer(index, channel, **options).start()
+
+
+class ClusterServer:
+    """Tiến trình cha: accept, định tuyến theo phòng, điều phối N worker"""
+
+    def __init__(self, workers, host=server_module.HOST, port=server_module.PORT, **options):
+        self.db = DataManager()
+        self.directory = RoomDirectory(workers)
+        self.pending_scores = [[] for _ in range(workers)] # Các gói SAVE_SCORES đang gộp của từng worker
+        self.channels = []
+        self.processes = []
+
+        # Fork worker trước khi mở socket listen để worker không giữ cổng
+        ctx = multiprocessing.get_context("fork")
+        for i in range(workers):
+            parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            proc = ctx.Process(target=worker_main, args=(i, child_end, list(self.channels) + [parent_end], options),
+                               daemon=True)
+            proc.start()
+            child_end.close()
+            self.channels.append(parent_end)
+            self.processes.append(proc)
+
+        self.server_socket = server_module.create_listener(host, port)
+        self.server_socket.setblocking(False)
+        self.host, self.port = self.server_socket.getsockname()[:2]
+
+        # Ván dở trong journal: giao cho worker sẽ giữ phòng đó (như kết nối đầu tiên vào phòng)
+        if options.get("journal_dir"):
+            for path in active_journals(options["journal_dir"]):
+                room_id = journal_room(path)
+                index = self.directory.pick(room_id) if room_id is not None else 0 # File hỏng: worker 0 cất đi
+                self.channels[index].send(pack_ipc({"op": "RECOVER", "path": path}))
+
+        print(f" Cluster đang chạy tại {self.host}:{self.port} với {workers} worker")
+        print(" Lệnh console: start/stop <phòng>, rooms, stats, metrics (chuyển tới worker giữ phòng)")
+        if options.get("metrics_port") is not None:
+            port = options["metrics_port"]
+            print(f" Số liệu đo: http://127.0.0.1:{port}/metrics ... :{port + workers - 1}/metrics (mỗi worker 1 cổng)")
+
+    # --- ĐỊNH TUYẾN KẾT NỐI ---
+    async def route(self, conn, addr):
+        """Đọc gói đầu tiên (LOGIN) rồi chuyển kết nối cho worker"""
+        loop = asyncio.get_running_loop()
+        decoder = FrameDecoder()
+        received = bytearray()
+        messages = []
+        try:
+            while not messages:
+                data = await asyncio.wait_for(loop.sock_recv(conn, RECV_SIZE), LOGIN_TIMEOUT)
+                if not data:
+                    conn.close()
+                    return
+                received += data
+                messages = decoder.feed(data)
+                if len(received) > IPC_MAX // 2:
+                    raise FrameTooLarge("LOGIN quá lớn")
+        except (asyncio.TimeoutError, OSError, FrameTooLarge):
+            conn.close()
+            return
+
+        first = messages[0] if isinstance(messages[0], dict) else {}
+        room_id = normalize_room_id(first.get("room"))
+        index, seq = self.directory.route(room_id)
+        meta = {"op": "CONN", "addr": list(addr), "room": room_id, "seq": seq}
+        try:
+            socket.send_fds(self.channels[index], [pack_ipc(meta, bytes(received))], [conn.fileno()])
+        except OSError as e:
+            log.warning(" Không chuyển được kết nối cho worker %d: %s", index, e)
+        finally:
+            # Worker đã có bản sao fd, cha đóng bản của mình
+            conn.close()
+
+    # --- KÊNH IPC TỪ WORKER ---
+    def on_worker_message(self, index):
+        try:
+            data = self.channels[index].recv(IPC_MAX)
+        except OSError:
+            data = b""
+        if not data:
+            log.error(" Worker %d đã dừng!", index)
+            asyncio.get_running_loop().remove_reader(self.channels[index])
+            return
+
+        message, _ = unpack_ipc(data)
+        op = message.get("op")
+        if op == "ROOM_OPEN":
+            owner = self.directory.opened(index, message["room"])
+            if owner is not None:
+                log.warning(" Worker %d tạo phòng %s đang do worker %d giữ, từ chối", index, message["room"], owner)
+                self.channels[index].send(pack_ipc({"op": "ROOM_REJECT", "room": message["room"], "owner": owner}))
+        elif op == "ROOM_CLOSED":
+            self.directory.closed(index, message["room"], message.get("seq", 0))
+        elif op == "SAVE_SCORES":
+            pending = self.pending_scores[index]
+            pending.extend(message["scores"])
+            if not message.get("more"):
+                self.pending_scores[index] = []
+                self.db.save_scores(pending)
+
+    # --- CONSOLE ADMIN ---
+    def send_admin(self, index, cmd):
+        self.channels[index].send(pack_ipc({"op": "ADMIN", "cmd": cmd}))
+
+    def admin_command(self, cmd):
+        parts = cmd.strip().split(maxsplit=1)
+        if not parts:
+            return
+        action = parts[0].lower()
+        if action in ("start", "stop"):
+            room_id = normalize_room_id(parts[1] if len(parts) > 1 else None)
+            index = self.directory.owner.get(room_id)
+            if index is None:
+                print(f" Không có phòng '{room_id}'!")
+            else:
+                self.send_admin(index, f"{action} {room_id}")
+        elif action in ("rooms", "stats", "metrics"):
+            for room_id, index in sorted(self.directory.owner.items()):
+                print(f"   {room_id} -> worker {index}")
+            for index in range(len(self.channels)):
+                self.send_admin(index, action)
+
+    def admin_input_loop(self, loop):
+        while True:
+            try:
+                cmd = input()
+            except EOFError:
+                return
+            loop.call_soon_threadsafe(self.admin_command, cmd)
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        for index, channel in enumerate(self.channels):
+            loop.add_reader(channel, self.on_worker_message, index)
+        threading.Thread(target=self.admin_input_loop, args=(loop,), daemon=True).start()
+        while True:
+            conn, addr = await loop.sock_accept(self.server_socket)
+            loop.create_task(self.route(conn, addr))
+
+    def start(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("\nServer shutting down...")
+        finally:
+            self.server_socket.close()
+            for proc in self.processes:
+                proc.terminate()
@@ -0,0 +1,309 @@
+import json
+import struct
+import zlib
+
+# Mã hóa thân gói tin, dùng chung cho Server và NetworkClient.
+#
+# Thân gói tự mô tả định dạng qua byte đầu tiên, nên bên nhận không cần biết
+# trước bên gửi dùng codec nào:
+#   '{' (0x7B)        : JSON utf-8 như cũ (mặc định, client cũ vẫn chạy)
+#   0x80 | cờ         : cờ 0x01 = thân MessagePack, 0x02 = đã nén zlib
+# MessagePack ở đây là bản tự cài (không cần thư viện ngoài), chỉ gồm các kiểu
+# JSON dùng tới. Tên trường hay gặp ("question_number", ...) được thay bằng số
+# nhỏ theo KEYS. Client đề nghị codec trong LOGIN ("codecs", "compress"),
+# Server chọn và báo lại trong LOGIN_OK ("codec").
+
+BINARY_FLAG = 0x80
+FLAG_MSGPACK = 0x01
+FLAG_ZLIB = 0x02
+COMPRESS_MIN = 512 # Chỉ nén thân gói từ kích thước này (VD: bảng xếp hạng)
+MAX_BODY_SIZE = 1024 * 1024 # Giới hạn sau giải nén, chống "bom nén"
+
+# Bảng tên trường -> số. CHỈ ĐƯỢC THÊM VÀO CUỐI để client/server cũ vẫn hiểu nhau.
+KEYS = [
+    "type", "name", "room", "message", "host",
+    "question", "options", "question_number", "total_questions", "time_limit",
+    "answer", "choice", "question_id", "correct_answer", "correct",
+    "score", "rank", "top", "total_players", "leaderboard",
+    "codec", "codecs", "compress", "id", "text",
+    "category", "difficulty", "count", "prefetch", "data",
+    "key", "token", "phase", "answered", "points",
+    "distribution", "heartbeat", "role",
+]
+KEY_CODES = {key: code for code, key in enumerate(KEYS)}
+
+
+class CodecError(ValueError):
+    """Thân gói tin không giải mã được"""
+
+
+# --- MESSAGEPACK (tự cài) ---
+_pack_f64 = struct.Struct(">Bd").pack
+
+
+def _pack(obj, out):
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xFF)
+        elif 0 <= obj <= 0xFFFF:
+            out += struct.pack(">BH", 0xCD, obj) if obj > 0xFF else bytes((0xCC, obj))
+        elif 0 <= obj <= 0xFFFFFFFF:
+            out += struct.pack(">BI", 0xCE, obj)
+        elif 0 <= obj < 1 << 64:
+            out += struct.pack(">BQ", 0xCF, obj)
+        elif -0x80000000 <= obj < 0:
+            out += struct.pack(">Bi", 0xD2, obj)
+        elif -(1 << 63) <= obj < 0:
+            out += struct.pack(">Bq", 0xD3, obj)
+        else:
+            raise CodecError(f"Số nguyên quá lớn: {obj}")
+    elif isinstance(obj, float):
+        out += _pack_f64(0xCB, obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        n = len(data)
+        if n < 32:
+            out.append(0xA0 | n)
+        elif n <= 0xFF:
+            out += bytes((0xD9, n))
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDA, n)
+        else:
+            out += struct.pack(">BI", 0xDB, n)
+        out += data
+    elif isinstance(obj, (list, tuple)):
+        _pack_len(out, len(obj), 0x90, 0xDC)
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        _pack_len(out, len(obj), 0x80, 0xDE)
+        for key, value in obj.items():
+            _pack(KEY_CODES.get(key, key), out)
+            _pack(value, out)
+    elif isinstance(obj, (bytes, bytearray)):
+        n = len(obj)
+        if n <= 0xFF:
+            out += bytes((0xC4, n))
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xC5, n)
+        else:
+            out += struct.pack(">BI", 0xC6, n)
+        out += obj
+    else:
+        raise CodecError(f"Không mã hóa được kiểu {type(obj).__name__}")
+
+
+def _pack_len(out, n, fix, base):
+    """Header của array/map: fix (n < 16) hoặc base (16 bit) / base+1 (32 bit)"""
+    if n < 16:
+        out.append(fix | n)
+    elif n <= 0xFFFF:
+        out += struct.pack(">BH", base, n)
+    else:
+        out += struct.pack(">BI", base + 1, n)
+
+
+def pack_map_header(n):
+    out = bytearray()
+    _pack_len(out, n, 0x80, 0xDE)
+    return bytes(out)
+
+
+def pack_pairs(mapping):
+    """Các cặp key/value của map (không có header), để ghép với phần khác"""
+    out = bytearray()
+    for key, value in mapping.items():
+        _pack(KEY_CODES.get(key, key), out)
+        _pack(value, out)
+    return bytes(out)
+
+
+def packb(obj):
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+# (định dạng struct, số byte) của các kiểu có độ dài cố định
+_FIXED = {
+    0xCA: struct.Struct(">f"), 0xCB: struct.Struct(">d"),
+    0xCC: struct.Struct(">B"), 0xCD: struct.Struct(">H"), 0xCE: struct.Struct(">I"), 0xCF: struct.Struct(">Q"),
+    0xD0: struct.Struct(">b"), 0xD1: struct.Struct(">h"), 0xD2: struct.Struct(">i"), 0xD3: struct.Struct(">q"),
+}
+_LEN8, _LEN16, _LEN32 = struct.Struct(">B"), struct.Struct(">H"), struct.Struct(">I")
+_STR_LEN = {0xD9: _LEN8, 0xDA: _LEN16, 0xDB: _LEN32}
+_BIN_LEN = {0xC4: _LEN8, 0xC5: _LEN16, 0xC6: _LEN32}
+
+
+def _unpack(data, pos):
+    b = data[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    if b >= 0xE0:
+        return b - 0x100, pos
+    if 0xA0 <= b <= 0xBF:
+        end = pos + (b & 0x1F)
+        return data[pos:end].decode("utf-8"), end
+    if 0x90 <= b <= 0x9F:
+        return _unpack_array(data, pos, b & 0x0F)
+    if 0x80 <= b <= 0x8F:
+        return _unpack_map(data, pos, b & 0x0F)
+    if b == 0xC0:
+        return None, pos
+    if b == 0xC2:
+        return False, pos
+    if b == 0xC3:
+        return True, pos
+    fmt = _FIXED.get(b)
+    if fmt is not None:
+        return fmt.unpack_from(data, pos)[0], pos + fmt.size
+    fmt = _STR_LEN.get(b)
+    if fmt is not None:
+        (n,) = fmt.unpack_from(data, pos)
+        start = pos + fmt.size
+        return data[start:start + n].decode("utf-8"), start + n
+    fmt = _BIN_LEN.get(b)
+    if fmt is not None:
+        (n,) = fmt.unpack_from(data, pos)
+        start = pos + fmt.size
+        return bytes(data[start:start + n]), start + n
+    if b in (0xDC, 0xDD):
+        fmt = _LEN16 if b == 0xDC else _LEN32
+        return _unpack_array(data, pos + fmt.size, fmt.unpack_from(data, pos)[0])
+    if b in (0xDE, 0xDF):
+        fmt = _LEN16 if b == 0xDE else _LEN32
+        return _unpack_map(data, pos + fmt.size, fmt.unpack_from(data, pos)[0])
+    raise CodecError(f"Byte MessagePack không hỗ trợ: 0x{b:02X}")
+
+
+def _unpack_array(data, pos, n):
+    items = []
+    for _ in range(n):
+        item, pos = _unpack(data, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(data, pos, n):
+    result = {}
+    for _ in range(n):
+        key, pos = _unpack(data, pos)
+        if isinstance(key, int) and 0 <= key < len(KEYS):
+            key = KEYS[key]
+        result[key], pos = _unpack(data, pos)
+    return result, pos
+
+
+def unpackb(data):
+    try:
+        obj, end = _unpack(data, 0)
+    except (IndexError, TypeError, struct.error, UnicodeDecodeError, RecursionError) as e:
+        # TypeError: khóa map không hash được (VD: array/map làm khóa)
+        raise CodecError(f"MessagePack hỏng: {e}") from e
+    if end != len(data):
+        raise CodecError("Thừa dữ liệu sau MessagePack")
+    return obj
+
+
+# --- CODEC ---
+class Codec:
+    """1 cách mã hóa thân gói: JSON hoặc MessagePack, có/không nén zlib"""
+
+    def __init__(self, binary=False, compress=False):
+        self.binary = binary
+        self.compress = compress
+        self.flags = BINARY_FLAG | (FLAG_MSGPACK if binary else 0)
+        self.name = ("msgpack" if binary else "json") + ("+zlib" if compress else "")
+
+    def encode(self, message_dict):
+        """dict -> thân gói (chưa có header độ dài)"""
+        if self.binary:
+            return self.finish(packb(message_dict))
+        return self.finish(json.dumps(message_dict).encode("utf-8"))
+
+    def encode_spliced(self, head, packed_pairs, pair_count):
+        """Thân gói = map gồm các trường trong head + các cặp đã mã hóa sẵn
+        (packed_pairs, pair_count cặp). Chỉ dùng cho codec nhị phân."""
+        payload = pack_map_header(len(head) + pair_count) + pack_pairs(head) + packed_pairs
+        return self.finish(payload)
+
+    def finish(self, payload):
+        """Thêm byte cờ và nén (nếu cần) cho payload đã mã hóa theo codec này"""
+        if self.compress and len(payload) >= COMPRESS_MIN:
+            packed = zlib.compress(payload, 1)
+            if len(packed) < len(payload):
+                return bytes((self.flags | FLAG_ZLIB,)) + packed
+        if self.binary:
+            return bytes((self.flags,)) + payload
+        return payload # JSON không nén: giữ nguyên như cũ, bắt đầu bằng '{'
+
+    def __repr__(self):
+        return f"<Codec {self.name}>"
+
+
+JSON = Codec()
+CODECS = {codec.name: codec for codec in (
+    JSON, Codec(compress=True), Codec(binary=True), Codec(binary=True, compress=True))}
+SUPPORTED = ["msgpack", "json"]  # Theo thứ tự ưu tiên của phía client
+COMPRESSIONS = ["zlib"]
+
+
+def negotiate(codecs, compress=None):
+    """Server chọn codec theo đề nghị của client (list theo thứ tự ưu tiên)"""
+    if not isinstance(codecs, list):
+        return JSON
+    use_zlib = isinstance(compress, list) and "zlib" in compress
+    for name in codecs:
+        if name in ("msgpack", "json"):
+            return CODECS[name + ("+zlib" if use_zlib else "")]
+    return JSON
+
+
+def get_codec(name):
+    return CODECS.get(name, JSON)
+
+
+def decode_body(body, max_size=MAX_BODY_SIZE):
+    """Thân gói (bytes) -> dict, tự nhận ra định dạng qua byte đầu.
+    Gói giải mã ra không phải object/map (list, số, chuỗi...) cũng là CodecError"""
+    message = _decode_body(body, max_size)
+    if not isinstance(message, dict):
+        raise CodecError(f"Gói tin phải là object, nhận được {type(message).__name__}")
+    return message
+
+
+def _loads(data):
+    try:
+        return json.loads(data)
+    except (RecursionError, UnicodeDecodeError) as e:
+        # RecursionError: lồng quá sâu (VD: b"[" * 100000), không phải ValueError
+        raise CodecError(f"JSON hỏng: {e}") from e
+
+
+def _decode_body(body, max_size):
+    if not body:
+        raise CodecError("Gói rỗng")
+    first = body[0]
+    if first < BINARY_FLAG:
+        return _loads(body)
+    payload = body[1:]
+    if first & FLAG_ZLIB:
+        inflater = zlib.decompressobj()
+        try:
+            payload = inflater.decompress(payload, max_size)
+        except zlib.error as e:
+            raise CodecError(f"Dữ liệu nén hỏng: {e}") from e
+        if inflater.unconsumed_tail:
+            raise CodecError("Gói giải nén vượt giới hạn")
+    if first & FLAG_MSGPACK:
+        return unpackb(payload)
+    return _loads(payload)
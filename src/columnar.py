@@ -0,0 +1,375 @@
+import heapq
+import string
+import sys
+import os
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from game_logic import GameLogic
+from logs import get_logger
+
+log = get_logger("logic")
+
+# Engine chấm điểm dạng cột cho phòng rất đông (hàng chục nghìn người).
+#
+# Thay cho dict {player_id: Player} + Leaderboard cập nhật theo từng
+# câu trả lời, mỗi người chơi có 1 "slot" (số nguyên) trong các mảng liền:
+#   scores  array('q') : tổng điểm (-1 = slot trống)
+#   choices bytearray  : đáp án câu hiện tại (0 = chưa trả lời, 1..26 = A..Z, 255 = không hợp lệ)
+#   points  array('q') : điểm được cộng ở câu hiện tại
+#   seq     array('q') : thứ tự đạt mức điểm hiện tại (người đạt trước đứng trước khi bằng điểm)
+# - Chấm cả lượt câu trả lời đang chờ trong 1 vòng lặp, không cập nhật bảng xếp hạng
+#   cho từng câu; bảng hạng được dựng lại 1 lần khi có người hỏi (Counter trên mảng điểm).
+# - Phân bố đáp án: bytearray.count, reset điểm/đáp án: tạo lại mảng (chạy trong C).
+# - Top 10: tìm mức điểm ngưỡng từ bảng hạng, quét mảng điểm 1 lần.
+# - Điểm thưởng theo thời gian (time_bonus > 0): trả lời càng sớm càng được cộng thêm.
+# API (players, get_top, get_rank, round_results, ...) giống hệt GameLogic.
+# Chỉ dùng thư viện chuẩn (array) như phần còn lại của Server, không cần NumPy.
+
+# Đáp án là chữ cái A..Z như GameLogic (round_summary đếm theo chr(65 + i)), không chỉ A..D
+CHOICE_CODES = {letter: i + 1 for i, letter in enumerate(string.ascii_uppercase)}
+CHOICE_LETTERS = {code: letter for letter, code in CHOICE_CODES.items()}
+INVALID_CHOICE = 255
+BASE_POINTS = 10
+
+
+class PlayerRow:
+    """1 người chơi nhìn như Player của GameLogic (.name, .score đọc/ghi thẳng vào mảng)"""
+    __slots__ = ("_game", "_slot")
+
+    def __init__(self, game, slot):
+        self._game = game
+        self._slot = slot
+
+    @property
+    def score(self):
+        return self._game.scores[self._slot]
+
+    @score.setter
+    def score(self, value):
+        self._game._set_score(self._slot, value)
+
+    @property
+    def name(self):
+        return self._game.names[self._slot]
+
+    @name.setter
+    def name(self, value):
+        self._game.names[self._slot] = value
+
+
+class PlayerTable(Mapping):
+    """game.players: {player_id: PlayerRow}, không tạo dict cho từng người"""
+
+    def __init__(self, game):
+        self._game = game
+
+    def __getitem__(self, player_id):
+        return PlayerRow(self._game, self._game.slots[player_id])
+
+    def __contains__(self, player_id):
+        return player_id in self._game.slots
+
+    def __iter__(self):
+        return iter(self._game.slots)
+
+    def __len__(self):
+        return len(self._game.slots)
+
+
+class ColumnarGameLogic(GameLogic):
+    def __init__(self, *args, time_bonus=0, **kwargs):
+        """
+        :param time_bonus: Điểm thưởng tối đa cho câu trả lời đúng gửi ngay khi mở câu
+                           (giảm dần về 0 lúc hết giờ). 0 = chấm như GameLogic.
+        """
+        super().__init__(*args, **kwargs)
+        self.time_bonus = time_bonus
+        self.round_duration = 0
+
+        self.slots = {}           # {player_id: slot}
+        self.ids = []             # slot -> player_id (None = trống)
+        self.names = []
+        self.free_slots = []
+        self.scores = array("q")
+        self.choices = bytearray()
+        self.points = array("q")
+        self.seq = array("q")
+        self._next_seq = 0
+        self.answered_count = 0   # Số người đã trả lời câu hiện tại
+        self._ranks = None        # Cache {điểm: hạng}, None = cần dựng lại
+        self._levels = None       # [(điểm, số người)] giảm dần, dựng cùng _ranks
+
+        self.players = PlayerTable(self)
+        self.leaderboard = None   # Hạng tính từ mảng điểm, không dùng Leaderboard
+        self.answered = None
+
+    # --- NGƯỜI CHƠI ---
+    def _bump_seq(self, slot):
+        self.seq[slot] = self._next_seq
+        self._next_seq += 1
+
+    def _set_score(self, slot, score):
+        if self.scores[slot] != score:
+            self.scores[slot] = score
+            self._bump_seq(slot)
+            self._ranks = None
+
+    def add_player(self, player_id, name, record=None):
+        """record (Player của server) không dùng: điểm nằm trong mảng"""
+        with self.lock:
+            if player_id in self.slots:
+                # Như GameLogic: vào lại với cùng player_id thì như người mới (điểm 0, chưa trả lời)
+                slot = self.slots[player_id]
+                self.names[slot] = name
+                self._set_score(slot, 0)
+                if self.choices[slot]:
+                    self.choices[slot] = 0
+                    self.points[slot] = 0
+                    self.answered_count -= 1
+                return
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.ids[slot] = player_id
+                self.names[slot] = name
+                self.scores[slot] = 0
+                self.choices[slot] = 0
+                self.points[slot] = 0
+            else:
+                slot = len(self.ids)
+                self.ids.append(player_id)
+                self.names.append(name)
+                self.scores.append(0)
+                self.choices.append(0)
+                self.points.append(0)
+                self.seq.append(0)
+            self.slots[player_id] = slot
+            self._bump_seq(slot)
+            self._ranks = None
+        log.debug("[LOGIC] Player connected: %s", name)
+
+    def remove_player(self, player_id):
+        with self.lock:
+            slot = self.slots.pop(player_id, None)
+            self.away.discard(player_id)
+            if slot is None:
+                return
+            name = self.names[slot]
+            if self.choices[slot]:
+                self.answered_count -= 1
+            self.ids[slot] = self.names[slot] = None
+            self.scores[slot] = -1 # Slot trống không có trong bảng hạng
+            self.choices[slot] = 0
+            self.points[slot] = 0
+            self.free_slots.append(slot)
+            self._ranks = None
+        log.debug("[LOGIC] Player disconnected: %s", name)
+
+    def reattach_player(self, player_id):
+        with self.lock:
+            if player_id not in self.slots:
+                return False
+            self.away.discard(player_id)
+            return True
+
+    def has_answered(self, player_id):
+        with self.lock:
+            slot = self.slots.get(player_id)
+            return slot is not None and self.choices[slot] != 0
+
+    # --- VÒNG CHƠI ---
+    def _reset_scores(self):
+        # Giữ nguyên seq: bằng điểm 0 thì thứ tự như trước (giống Leaderboard.reset)
+        self.scores = array("q", (-1 if pid is None else 0 for pid in self.ids))
+        self._ranks = None
+
+    def _new_round(self):
+        n = len(self.ids)
+        self.choices = bytearray(n)
+        self.points = array("q", bytes(8 * n))
+        self.answered_count = 0
+
+    def start_timer(self, duration, timeout_callback):
+        self.round_duration = duration
+        super().start_timer(duration, timeout_callback)
+
+    # --- CHẤM ĐIỂM ---
+    def submit_answer(self, player_id, choice):
+        """Như GameLogic, kèm thời điểm nhận để tính điểm thưởng"""
+        now = self.scheduler.time() if self.scheduler is not None and self.time_bonus else 0.0
+        self.answer_queue.append((player_id, choice, now))
+
+    def _bonus(self, received_at):
+        if not self.time_bonus or not self.round_duration:
+            return 0
+        remaining = min(self.round_duration, max(0.0, self.deadline - received_at))
+        return int(self.time_bonus * remaining / self.round_duration)
+
+    def _check_answer(self, player_id, choice, received_at=None):
+        if self.state != "PLAYING" or not self.current_question_data or not self.question_open:
+            return 0, False, ""
+        slot = self.slots.get(player_id)
+        if slot is None:
+            return 0, False, "" # Người chơi đã rời phòng
+        if self.choices[slot]:
+            return 0, False, "ALREADY_ANSWERED"
+
+        correct_key = self.current_question_data["answer"]
+        code = CHOICE_CODES.get(str(choice).strip().upper(), INVALID_CHOICE)
+        self.choices[slot] = code
+        self.answered_count += 1
+        if code != CHOICE_CODES.get(correct_key):
+            return 0, False, correct_key
+        if received_at is None:
+            received_at = self.scheduler.time() if self.scheduler is not None and self.time_bonus else 0.0
+        score = BASE_POINTS + self._bonus(received_at)
+        self.points[slot] = score
+        self.scores[slot] += score
+        self._bump_seq(slot)
+        self._ranks = None
+        return score, True, correct_key
+
+    def process_answers(self):
+        """Chấm cả lượt câu trả lời đang chờ trong 1 vòng lặp trên các mảng"""
+        results = []
+        queue = self.answer_queue
+        with self.lock:
+            if not queue:
+                return results
+            if self.state != "PLAYING" or not self.current_question_data or not self.question_open:
+                while queue:
+                    results.append((queue.popleft()[0], 0, False, ""))
+                return results
+
+            correct_key = self.current_question_data["answer"]
+            correct_code = CHOICE_CODES.get(correct_key)
+            slots, choices, scores, points, seq = self.slots, self.choices, self.scores, self.points, self.seq
+            codes = CHOICE_CODES
+            correct = 0
+            while queue:
+                player_id, choice, received_at = queue.popleft()
+                slot = slots.get(player_id)
+                if slot is None:
+                    results.append((player_id, 0, False, ""))
+                    continue
+                if choices[slot]:
+                    results.append((player_id, 0, False, "ALREADY_ANSWERED"))
+                    continue
+                code = codes.get(str(choice).strip().upper(), INVALID_CHOICE)
+                choices[slot] = code
+                self.answered_count += 1
+                if code != correct_code:
+                    results.append((player_id, 0, False, correct_key))
+                    continue
+                score = BASE_POINTS + self._bonus(received_at)
+                points[slot] = score
+                scores[slot] += score
+                seq[slot] = self._next_seq
+                self._next_seq += 1
+                correct += 1
+                results.append((player_id, score, True, correct_key))
+            if correct:
+                self._ranks = None
+        log.debug("[SCORE] %d câu trả lời, %d đúng", len(results), correct)
+        return results
+
+    # --- JOURNAL ---
+    def answers_of(self, player_ids):
+        with self.lock:
+            slots, choices, points = self.slots, self.choices, self.points
+            return [[pid, CHOICE_LETTERS.get(choices[slot], "?"), points[slot]] for pid in player_ids
+                    for slot in (slots.get(pid),) if slot is not None and choices[slot]]
+
+    def apply_answer(self, player_id, choice, points):
+        with self.lock:
+            slot = self.slots.get(player_id)
+            if slot is None or self.choices[slot]:
+                return
+            self.choices[slot] = CHOICE_CODES.get(choice, INVALID_CHOICE)
+            self.answered_count += 1
+            if points:
+                self.points[slot] = points
+                self.scores[slot] += points
+                self._bump_seq(slot)
+                self._ranks = None
+
+    def set_score(self, player_id, score):
+        with self.lock:
+            slot = self.slots.get(player_id)
+            if slot is not None:
+                self._set_score(slot, score)
+
+    def check_all_answered(self):
+        with self.lock:
+            answered_away = sum(1 for pid in self.away if self.choices[self.slots[pid]]) if self.away else 0
+            return self.answered_count - answered_away >= len(self.slots) - len(self.away)
+
+    def round_summary(self):
+        with self.lock:
+            n_options = len(self.current_question_data["options"])
+            return {chr(65 + i): self.choices.count(i + 1) for i in range(n_options)}
+
+    # --- XẾP HẠNG ---
+    def _rank_table(self):
+        """{điểm: hạng}, dựng lại (Counter trên cả mảng điểm) chỉ khi điểm đã đổi"""
+        if self._ranks is None:
+            counts = Counter(self.scores)
+            counts.pop(-1, None) # Slot trống
+            levels = sorted(counts.items(), reverse=True)
+            ranks = {}
+            higher = 0
+            for score, count in levels:
+                ranks[score] = higher + 1
+                higher += count
+            self._ranks, self._levels = ranks, levels
+        return self._ranks
+
+    def round_results(self, player_ids):
+        results = []
+        with self.lock:
+            ranks = self._rank_table()
+            slots, scores, points = self.slots, self.scores, self.points
+            for pid in player_ids:
+                slot = slots.get(pid)
+                if slot is None:
+                    continue
+                earned = points[slot]
+                results.append((pid, earned > 0, earned, scores[slot], ranks[scores[slot]]))
+        return results
+
+    def get_rank(self, player_id):
+        with self.lock:
+            slot = self.slots.get(player_id)
+            if slot is None:
+                return None
+            return self._rank_table()[self.scores[slot]]
+
+    def _top_slots(self, k):
+        """Slot của k người cao nhất, bằng điểm thì ai đạt trước đứng trước"""
+        self._rank_table()
+        if k <= 0 or not self._levels:
+            return []
+        # Mức điểm thấp nhất còn lọt vào top k
+        covered = 0
+        for threshold, count in self._levels:
+            covered += count
+            if covered >= k:
+                break
+        scores, seq = self.scores, self.seq
+        # 1 lượt quét mảng điểm, chỉ sắp xếp những người lọt ngưỡng
+        candidates = [slot for slot, score in enumerate(scores) if score >= threshold]
+        above = [slot for slot in candidates if scores[slot] > threshold]
+        tied = [slot for slot in candidates if scores[slot] == threshold]
+        above.sort(key=lambda s: (-scores[s], seq[s]))
+        return above + heapq.nsmallest(k - len(above), tied, key=seq.__getitem__)
+
+    def get_top(self, k=10):
+        with self.lock:
+            return [(self.ids[s], PlayerRow(self, s)) for s in self._top_slots(k)]
+
+    def get_leaderboard(self):
+        with self.lock:
+            return [(self.ids[s], PlayerRow(self, s)) for s in self._top_slots(len(self.slots))]
@@ -1,43 +1,207 @@
-import json
-import os
-
-class DataManager:
-    def __init__(self):
-        # Thiết lập đường dẫn đến thư mục chứa dữ liệu
-        self.data_dir = "data"
-        self.q_file = os.path.join(self.data_dir, "questions.json")
-        self.h_file = os.path.join(self.data_dir, "highscore.json")
-
-    def load_questions(self):
-        """Hàm đọc câu hỏi từ file JSON"""
-        try:
-            if os.path.exists(self.q_file):
-                with open(self.q_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return [] # Trả về danh sách rỗng nếu chưa có file
-        except Exception:
-            return []
-
-    def save_score(self, name, score):
-        """Hàm lưu điểm của người chơi vào file JSON"""
-        try:
-            # Đọc dữ liệu cũ lên trước
-            results = []
-            if os.path.exists(self.h_file):
-                with open(self.h_file, 'r', encoding='utf-8') as f:
-                    results = json.load(f)
-            
-            # Thêm kết quả mới vào danh sách
-            results.append({"name": name, "score": score})
-            
-            # Ghi toàn bộ danh sách mới vào file
-            with open(self.h_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=4)
-            return True
-        except Exception:
-            return False
-
-if __name__ == "__main__":
-    # Test nhanh logic
-    db = DataManager()
-    print("Class DataManager đã sẵn sàng hoạt động!")
+import atexit
+import json
+import os
+import threading
+import time
+
+from question_bank import QuestionBank
+from metrics import default_registry
+from logs import get_logger
+
+log = get_logger("data")
+
+# Lưu điểm cao kiểu "chỉ ghi thêm":
+#   highscore.log  : mỗi dòng 1 bản ghi JSON {"seq", "name", "score"}, cả ván ghi 1 lần + fsync
+#   highscore.json : ảnh chụp đã gộp {"seq": seq lớn nhất đã gộp, "scores": [...]}
+# Việc ghi chạy trên 1 luồng nền, luồng game chỉ xếp hàng rồi đi tiếp.
+# Khi log đủ dài thì gộp (compaction) vào highscore.json: ghi file tạm, fsync rồi
+# os.replace. Nếu chết giữa chừng, các dòng log có seq <= seq của ảnh chụp bị bỏ
+# qua khi đọc nên không bao giờ bị tính 2 lần; dòng cuối ghi dở cũng bị bỏ qua.
+# Mỗi thư mục dữ liệu chỉ nên có 1 tiến trình ghi (chế độ cluster: tiến trình cha).
+
+COMPACT_EVERY = 10000  # Số bản ghi trong log thì gộp 1 lần
+
+
+class DataManager:
+    def __init__(self, data_dir="data"):
+        # Thiết lập đường dẫn đến thư mục chứa dữ liệu
+        self.data_dir = data_dir
+        self.q_file = os.path.join(self.data_dir, "questions.json")
+        self.h_file = os.path.join(self.data_dir, "highscore.json")
+        self.log_file = os.path.join(self.data_dir, "highscore.log")
+
+        # Hàng đợi ghi cho luồng nền
+        self._cond = threading.Condition()
+        self._pending = []      # Các ván đang chờ ghi: list các list entries
+        self._submitted = 0     # Số ván đã xếp hàng
+        self._written = 0       # Số ván đã ghi xong (đã fsync)
+        self._writer = None
+        self._seq = 0           # seq của bản ghi gần nhất
+        self._log_records = 0   # Số bản ghi đang nằm trong log
+        self.m_write = default_registry().histogram(
+            "quiz_highscore_write_seconds", "Thời gian luồng nền ghi 1 lượt điểm xuống đĩa (kể cả fsync, gộp log)")
+
+    def load_questions(self):
+        """Hàm đọc câu hỏi từ file JSON"""
+        try:
+            if os.path.exists(self.q_file):
+                with open(self.q_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            return [] # Trả về danh sách rỗng nếu chưa có file
+        except Exception:
+            return []
+
+    def question_bank(self):
+        """Ngân hàng câu hỏi có chỉ mục (không tải toàn bộ nội dung vào RAM)"""
+        return QuestionBank(self.q_file)
+
+    # --- GHI ĐIỂM (gọi từ luồng game) ---
+    def save_score(self, name, score):
+        """Lưu điểm của 1 người chơi (xếp hàng, không chờ ghi đĩa)"""
+        return self.save_scores([{"name": name, "score": score}])
+
+    def save_scores(self, entries):
+        """Lưu điểm của cả ván trong 1 lần ghi: entries = [{"name":..., "score":...}]"""
+        entries = [{"name": e["name"], "score": e["score"]} for e in entries]
+        if not entries:
+            return True
+        with self._cond:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+            self._pending.append(entries)
+            self._submitted += 1
+            self._cond.notify_all()
+        return True
+
+    def flush(self, timeout=None):
+        """Chờ tới khi mọi ván đã xếp hàng được ghi xuống đĩa"""
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    def load_highscores(self):
+        """Toàn bộ lịch sử điểm: ảnh chụp + các bản ghi mới hơn trong log"""
+        self.flush()
+        seq, results = self._read_snapshot()
+        for record in self._read_log():
+            if record["seq"] > seq:
+                results.append({"name": record["name"], "score": record["score"]})
+        return results
+
+    # --- LUỒNG GHI NỀN ---
+    def _write_loop(self):
+        self._recover()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                batches, self._pending = self._pending, []
+            started = time.perf_counter()
+            try:
+                self._append(batches)
+                if self._log_records >= COMPACT_EVERY:
+                    self.compact()
+            except Exception as e:
+                log.error(" Lỗi ghi highscore: %s", e)
+            self.m_write.observe(time.perf_counter() - started)
+            with self._cond:
+                self._written += len(batches)
+                self._cond.notify_all()
+
+    def _recover(self):
+        """Khởi động luồng ghi: lấy lại seq hiện tại và số bản ghi trong log"""
+        self._truncate_torn_tail()
+        seq, _ = self._read_snapshot()
+        records = self._read_log()
+        self._seq = max([seq] + [r["seq"] for r in records])
+        self._log_records = sum(1 for r in records if r["seq"] > seq)
+
+    def _truncate_torn_tail(self):
+        """Cắt dòng cuối ghi dở (thiếu ký tự xuống dòng) để lần ghi sau không dính vào nó"""
+        try:
+            with open(self.log_file, 'rb+') as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        except OSError:
+            pass
+
+    def _append(self, batches):
+        lines = []
+        for entries in batches:
+            for entry in entries:
+                self._seq += 1
+                record = {"seq": self._seq, "name": entry["name"], "score": entry["score"]}
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_records += len(lines)
+
+    def compact(self):
+        """Gộp log vào highscore.json (ghi file tạm rồi thay thế nguyên tử)"""
+        seq, results = self._read_snapshot()
+        for record in self._read_log():
+            if record["seq"] > seq:
+                results.append({"name": record["name"], "score": record["score"]})
+                seq = record["seq"]
+
+        # Mỗi bản ghi 1 dòng cho dễ đọc mà vẫn gọn với file lớn
+        rows = ",\n".join(json.dumps(r, ensure_ascii=False) for r in results)
+        tmp_file = self.h_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(f'{{"seq": {seq}, "scores": [\n{rows}\n]}}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.h_file)
+        self._fsync_dir()
+
+        # Ảnh chụp đã chứa mọi bản ghi của log -> làm rỗng log
+        with open(self.log_file, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_records = 0
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(self.data_dir, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    # --- ĐỌC FILE ---
+    def _read_snapshot(self):
+        """(seq, list điểm) của highscore.json; hỗ trợ cả định dạng list cũ"""
+        try:
+            with open(self.h_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0, []
+        if isinstance(data, list):
+            return 0, data
+        return data.get("seq", 0), data.get("scores", [])
+
+    def _read_log(self):
+        records = []
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        pass # Dòng ghi dở khi tiến trình bị dừng đột ngột
+        except OSError:
+            pass
+        return records
+
+if __name__ == "__main__":
+    # Test nhanh logic
+    db = DataManager()
+    print("Class DataManager đã sẵn sàng hoạt động!")
@@ -1,20 +1,43 @@
+import math
+import sys
+import os
 import threading
-import time
+from collections import deque
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scheduler import default_scheduler
+from leaderboard import Leaderboard
+from player import Player
+from question_cache import default_question_cache
+from logs import get_logger
+
+log = get_logger("logic")
 
 class GameLogic:
-    def __init__(self, data_manager=None):
+    def __init__(self, data_manager=None, questions=None, scheduler=None, bank=None):
         """
         Khởi tạo logic game.
         :param data_manager: Object DataManager.
+        :param questions: List câu hỏi đã tải sẵn (dùng chung giữa nhiều phòng).
+        :param scheduler: Bộ hẹn giờ dùng chung (mặc định: scheduler của tiến trình).
+        :param bank: QuestionBank dùng chung; mỗi ván bốc ngẫu nhiên bộ câu hỏi riêng.
         """
         self.data_manager = data_manager
+        self.scheduler = scheduler
+        self.bank = bank
         
         # Quản lý người chơi
-        self.players = {}  # {player_id: {"name": "ABC", "score": 0}}
+        self.players = {}  # {player_id: Player} (bản ghi dùng chung với server/phòng)
+        # Bảng xếp hạng cập nhật ngay mỗi lần đổi điểm (không sort lại cả danh sách)
+        self.leaderboard = Leaderboard()
         
         # Quản lý câu hỏi
         self.questions = [] 
-        if self.data_manager:
+        if questions is not None:
+            # Dùng chung list câu hỏi, không tải/copy lại cho từng phòng
+            self.questions = questions
+        elif self.data_manager:
             # Tải toàn bộ câu hỏi vào RAM ngay khi khởi động
             self.questions = self.data_manager.load_questions()
             
@@ -24,28 +47,72 @@ class GameLogic:
         # Quản lý trạng thái game
         self.state = "WAITING"
         self.current_question_data = None
-        self.answered_players = set()
+        self.answered = {} # Người đã trả lời câu hiện tại: {player_id: Player} (đáp án nằm ở Player.answer)
+        self.away = set() # Người chơi rớt mạng đang chờ kết nối lại (vẫn giữ điểm)
+        self.question_open = False
+
+        # Đồng bộ giữa các luồng: handler chỉ xếp câu trả lời vào answer_queue,
+        # 1 luồng duy nhất (người ghi của phòng) gọi process_answers để chấm điểm.
+        # lock bảo vệ players/answered khi người chơi vào/ra cùng lúc.
+        self.lock = threading.RLock()
+        self.answer_queue = deque()
         
-        # Timer
-        self.time_left = 0
+        # Timer (1 deadline trong scheduler dùng chung, không tạo thread riêng)
         self.timer_active = False
-        self.timer_thread = None
+        self.timer_handle = None
+        self.deadline = 0
 
     # --- 1. PLAYER MANAGEMENT ---
-    def add_player(self, player_id, name):
-        self.players[player_id] = {"name": name, "score": 0}
-        print(f"[LOGIC] Player connected: {name}")
+    def add_player(self, player_id, name, record=None):
+        """record: bản ghi Player có sẵn của server (mặc định tạo mới)"""
+        with self.lock:
+            player = record if record is not None else Player(player_id, name)
+            player.score = 0
+            player.answer = None
+            self.players[player_id] = player
+            self.answered.pop(player_id, None)
+            self.leaderboard.add(player_id, 0)
+        log.debug("[LOGIC] Player connected: %s", name)
 
     def remove_player(self, player_id):
-        if player_id in self.players:
-            print(f"[LOGIC] Player disconnected: {self.players[player_id]['name']}")
-            del self.players[player_id]
+        with self.lock:
+            info = self.players.pop(player_id, None)
+            self.leaderboard.remove(player_id)
+            # Người đã rời phòng không còn được tính vào "đã trả lời"
+            self.answered.pop(player_id, None)
+            self.away.discard(player_id)
+        if info:
+            log.debug("[LOGIC] Player disconnected: %s", info.name)
+
+    def detach_player(self, player_id):
+        """Rớt mạng: giữ điểm/hạng, nhưng không chờ người này trả lời nữa"""
+        with self.lock:
+            if player_id in self.players:
+                self.away.add(player_id)
+
+    def reattach_player(self, player_id):
+        """Kết nối lại: id không đổi nên chỉ cần chờ người này trả lời tiếp.
+        False nếu người chơi đã bị xóa"""
+        with self.lock:
+            if player_id not in self.players:
+                return False
+            self.away.discard(player_id)
+            return True
+
+    def has_answered(self, player_id):
+        with self.lock:
+            return player_id in self.answered
 
     # --- 2. GAME FLOW CONTROL ---
-    def start_game(self):
+    def start_game(self, category=None, difficulty=None, count=None):
+        """Bắt đầu ván; nếu có QuestionBank thì bốc count câu (lọc theo chủ đề/độ khó)"""
         if len(self.players) < 1:
-            print("⚠️ Cần ít nhất 1 người chơi để bắt đầu!")
+            log.warning("⚠️ Cần ít nhất 1 người chơi để bắt đầu!")
             # return False, "Cần ít nhất 1 người chơi!" # Bỏ comment nếu muốn chặn
+
+        if self.bank is not None:
+            self.questions = self.bank.sample(count, category, difficulty)
+            self.total_questions = len(self.questions)
         
         if self.total_questions == 0:
             return False, "Chưa có dữ liệu câu hỏi!"
@@ -54,107 +121,202 @@ class GameLogic:
         self.current_q_index = 0
         
         # Reset điểm
-        for pid in self.players:
-            self.players[pid]["score"] = 0
+        with self.lock:
+            self._reset_scores()
             
         return True, "Bắt đầu game!"
 
+    def _reset_scores(self):
+        for player in self.players.values():
+            player.score = 0
+        self.leaderboard.reset(0)
+
+    def _new_round(self):
+        """Câu mới: quên các câu trả lời của câu trước"""
+        for player in self.answered.values():
+            player.answer = None
+        self.answered.clear()
+
     def next_question(self):
         """Lấy câu hỏi tiếp theo và format dữ liệu cho Client"""
         if self.current_q_index >= self.total_questions:
             self.state = "END"
             return True, None # Game Over
 
-        self.answered_players.clear()
+        with self.lock:
+            self._new_round()
+            self.question_open = True
         
         # Lấy câu hỏi từ danh sách
         q_data = self.questions[self.current_q_index]
         self.current_question_data = q_data
         self.current_q_index += 1
         
-        # XỬ LÝ OPTIONS: Chuyển từ Dict {"A": "Đồng",...} sang List ["Đồng",...]
-        # Để Client hiển thị đúng nội dung
-        raw_options = q_data["options"]
-        formatted_options = []
+        # Options đã được đổi từ Dict {"A": "Đồng",...} sang List ["Đồng",...] 1 lần
+        # trong cache dùng chung (không sort lại mỗi lượt, mỗi phòng)
+        payload = default_question_cache().get(q_data).payload
         
-        if isinstance(raw_options, dict):
-            # Sắp xếp theo key A, B, C, D để thứ tự không bị đảo lộn
-            for key in sorted(raw_options.keys()):
-                formatted_options.append(raw_options[key])
-        elif isinstance(raw_options, list):
-            formatted_options = raw_options
-
-        payload = {
-            "id": q_data["id"],
-            "text": q_data["question"], # Key trong JSON là "question"
-            "options": formatted_options,
-            "time_limit": 15
-        }
-        
-        print(f"[LOGIC] Preparing Question {self.current_q_index}: {q_data['question']}")
+        log.debug("[LOGIC] Preparing Question %d: %s", self.current_q_index, q_data["question"])
         return False, payload
 
     # --- 3. TIMER SYSTEM ---
     def start_timer(self, duration, timeout_callback):
-        self.time_left = duration
-        self.timer_active = True
-        
-        if self.timer_thread and self.timer_thread.is_alive():
-            self.timer_active = False
-            self.timer_thread.join()
+        if self.scheduler is None:
+            self.scheduler = default_scheduler()
+        self.stop_timer()
 
         self.timer_active = True
-        self.timer_thread = threading.Thread(target=self._timer_run, args=(timeout_callback,))
-        self.timer_thread.daemon = True 
-        self.timer_thread.start()
-
-    def _timer_run(self, callback):
-        while self.time_left > 0 and self.timer_active:
-            time.sleep(1)
-            self.time_left -= 1
-        
+        self.deadline = self.scheduler.time() + duration
+        self.timer_handle = self.scheduler.call_at(self.deadline, self._on_timeout, timeout_callback)
+
+    def _on_timeout(self, callback):
         if self.timer_active: 
             self.timer_active = False
+            self.timer_handle = None
             if callback:
                 callback()
 
     def stop_timer(self):
         self.timer_active = False
+        if self.timer_handle is not None:
+            self.timer_handle.cancel()
+            self.timer_handle = None
+
+    @property
+    def time_left(self):
+        """Số giây còn lại (làm tròn lên) của timer đang chạy"""
+        if not self.timer_active:
+            return 0
+        return max(0, math.ceil(self.deadline - self.scheduler.time()))
 
     # --- 4. ANSWER CHECKING (QUAN TRỌNG: FIX LỖI SO SÁNH) ---
     # [LOGIC ĐƠN GIẢN HÓA] Chỉ so sánh Key A, B, C, D
     def check_answer(self, player_id, choice):
-        if self.state != "PLAYING" or not self.current_question_data:
+        with self.lock:
+            return self._check_answer(player_id, choice)
+
+    def _check_answer(self, player_id, choice):
+        if self.state != "PLAYING" or not self.current_question_data or not self.question_open:
             return 0, False, ""
+
+        player = self.players.get(player_id)
+        if player is None:
+            return 0, False, "" # Người chơi đã rời phòng
             
-        if player_id in self.answered_players:
+        if player.answer is not None:
             return 0, False, "ALREADY_ANSWERED"
 
-        self.answered_players.add(player_id)
-        
         # Lấy Key đáp án đúng (Ví dụ: "C")
         correct_key = self.current_question_data["answer"] 
         
         # Lấy Key người chơi gửi lên (Ví dụ: "C")
         player_choice = str(choice).strip().upper()
         
-        print(f"[CHECK] User: '{player_choice}' vs Correct: '{correct_key}'")
-        
         # SO SÁNH TRỰC TIẾP
         is_correct = (player_choice == correct_key)
 
         score = 0
         if is_correct:
             score = 10 
-            self.players[player_id]["score"] += score
-            print(f"[SCORE] {self.players[player_id]['name']} (+10 điểm)")
-        else:
-            print(f"[SCORE] {self.players[player_id]['name']} Sai!")
+            player.score += score
+            self.leaderboard.update(player_id, player.score)
+        player.answer = (player_choice, score)
+        self.answered[player_id] = player
+
+        # Đường nóng (mỗi câu trả lời): chỉ format khi bật mức DEBUG
+        log.debug("[SCORE] %s: '%s' vs '%s' -> %s", player.name,
+                  player_choice, correct_key, "+10 điểm" if is_correct else "Sai!")
 
         return score, is_correct, correct_key
 
+    # --- 5. ANSWER INGESTION (1 luồng ghi duy nhất) ---
+    def submit_answer(self, player_id, choice):
+        """Gọi từ luồng nhận dữ liệu: chỉ xếp hàng, không đụng tới điểm số"""
+        self.answer_queue.append((player_id, choice))
+
+    def process_answers(self):
+        """Chấm toàn bộ câu trả lời đang chờ. Chỉ người ghi của phòng được gọi"""
+        results = []
+        queue = self.answer_queue
+        with self.lock:
+            while queue:
+                player_id, choice = queue.popleft()
+                results.append((player_id,) + self._check_answer(player_id, choice))
+        return results
+
+    def close_question(self):
+        """Hết giờ: chấm nốt các câu trả lời đã tới, sau đó không nhận thêm.
+        Trả về kết quả chấm như process_answers"""
+        results = self.process_answers()
+        with self.lock:
+            self.question_open = False
+        return results
+
     def check_all_answered(self):
-        return len(self.answered_players) >= len(self.players)
+        """Mọi người chơi đang kết nối đã trả lời (không chờ người đang rớt mạng)"""
+        with self.lock:
+            answered_away = len(self.away & self.answered.keys()) if self.away else 0
+            return len(self.answered) - answered_away >= len(self.players) - len(self.away)
+
+    def round_summary(self):
+        """Phần kết quả chung cho cả phòng: số người chọn mỗi đáp án của câu vừa rồi"""
+        with self.lock:
+            n_options = len(self.current_question_data["options"])
+            distribution = {chr(65 + i): 0 for i in range(n_options)} # {"A": 0, "B": 0, ...}
+            for player in self.answered.values():
+                choice = player.answer[0]
+                if choice in distribution:
+                    distribution[choice] += 1
+            return distribution
+
+    def round_results(self, player_ids):
+        """Phần riêng của từng người: [(player_id, đúng?, điểm được cộng, tổng điểm, hạng)], 1 lần khóa"""
+        results = []
+        with self.lock:
+            for pid in player_ids:
+                info = self.players.get(pid)
+                if info is None:
+                    continue
+                points = info.answer[1] if info.answer is not None else 0
+                results.append((pid, points > 0, points, info.score, self.leaderboard.rank(pid)))
+        return results
 
     def get_leaderboard(self):
-        return sorted(self.players.items(), key=lambda x: x[1]['score'], reverse=True)
\ No newline at end of file
+        with self.lock:
+            return [(pid, self.players[pid]) for pid, _ in self.leaderboard.top()]
+
+    def get_top(self, k=10):
+        """k người điểm cao nhất: [(player_id, Player)]"""
+        with self.lock:
+            return [(pid, self.players[pid]) for pid, _ in self.leaderboard.top(k)]
+
+    def get_rank(self, player_id):
+        """Hạng hiện tại của 1 người chơi (1 = cao nhất)"""
+        with self.lock:
+            return self.leaderboard.rank(player_id)
+
+    # --- 6. JOURNAL (ghi lại / khôi phục ván, xem journal.py) ---
+    def answers_of(self, player_ids):
+        """[(player_id, đáp án, điểm được cộng)] ở câu hiện tại của những người đã trả lời"""
+        with self.lock:
+            return [[pid, player.answer[0], player.answer[1]] for pid in player_ids
+                    for player in (self.players.get(pid),) if player is not None and player.answer is not None]
+
+    def apply_answer(self, player_id, choice, points):
+        """Ghi lại câu trả lời đã chấm từ trước (khôi phục từ journal), không chấm lại"""
+        with self.lock:
+            player = self.players.get(player_id)
+            if player is None or player.answer is not None:
+                return
+            if points:
+                player.score += points
+                self.leaderboard.update(player_id, player.score)
+            player.answer = (choice, points)
+            self.answered[player_id] = player
+
+    def set_score(self, player_id, score):
+        with self.lock:
+            player = self.players.get(player_id)
+            if player is not None:
+                player.score = score
+                self.leaderboard.update(player_id, score)
\ No newline at end of file
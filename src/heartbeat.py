@@ -0,0 +1,121 @@
+import math
+import threading
+
+# Heartbeat tầng ứng dụng và dọn kết nối im lặng (half-open, VD: điện thoại mất sóng
+# nhưng không gửi FIN nên recv không bao giờ trả về rỗng).
+#
+#   server -> client : PING   (client im lặng quá HEARTBEAT_INTERVAL giây)
+#   client -> server : PONG
+#   client -> server : PING -> server trả PONG (client tự kiểm tra khi server im lặng)
+# Mọi gói client gửi lên đều tính là còn sống, PONG chỉ dùng khi không có gì khác để gửi.
+# Đã PING mà sau HEARTBEAT_TIMEOUT giây vẫn không nhận được gì -> server đóng kết nối
+# như khi recv trả về rỗng: người có token được giữ chỗ để RESUME và không còn bị
+# chờ trả lời câu đang mở.
+#
+# Không có thread/sleep cho từng kết nối: mọi kết nối nằm trong 1 bánh xe hẹn giờ
+# (timer wheel) quay 1 nấc mỗi TICK giây trên scheduler chung của server. Nhận gói
+# tin chỉ ghi lại thời điểm (Player.last_seen), không đụng tới bánh xe; tới nấc của
+# mình kết nối mới được xét lại rồi xếp vào nấc mới ("lười", như TimerHandle.cancel).
+
+HEARTBEAT_INTERVAL = 5.0 # Im lặng bao lâu thì server gửi PING (0 = tắt heartbeat)
+HEARTBEAT_TIMEOUT = 5.0  # Chờ trả lời PING bao lâu trước khi đóng kết nối
+TICK = 0.5               # Độ phân giải của bánh xe (giây)
+
+PING = {"type": "PING"}
+PONG = {"type": "PONG"}
+
+
+class TimerWheel:
+    """Bánh xe hẹn giờ: mỗi ngăn = 1 nấc. Thêm O(1), mỗi nấc chỉ lấy ra 1 ngăn.
+    Hẹn xa hơn 1 vòng thì bị kéo về ngăn cuối (người dùng tự kiểm tra lại khi tới hạn)"""
+
+    def __init__(self, tick, span):
+        self.tick = tick
+        self.slots = [[] for _ in range(int(math.ceil(span / tick)) + 2)]
+        self.position = 0
+        self.now = 0.0 # Thời điểm của nấc hiện tại
+        self.count = 0
+
+    def schedule(self, item, when):
+        ticks = int(math.ceil((when - self.now) / self.tick))
+        ticks = min(max(ticks, 1), len(self.slots) - 1)
+        self.slots[(self.position + ticks) % len(self.slots)].append(item)
+        self.count += 1
+
+    def advance(self, now):
+        """Quay 1 nấc, trả về các phần tử tới hạn"""
+        self.position = (self.position + 1) % len(self.slots)
+        self.now = now
+        due, self.slots[self.position] = self.slots[self.position], []
+        self.count -= len(due)
+        return due
+
+    def __len__(self):
+        return self.count
+
+
+class HeartbeatMonitor:
+    """Theo dõi mọi kết nối của 1 server bằng 1 TimerWheel, chạy trên scheduler của server"""
+
+    def __init__(self, scheduler, lookup, ping, reap, interval=HEARTBEAT_INTERVAL, timeout=HEARTBEAT_TIMEOUT,
+                 tick=TICK):
+        """
+        :param lookup: kết nối -> Player đang dùng kết nối đó (None nếu đã đóng)
+        :param ping: gửi PING cho 1 Player
+        :param reap: đóng 1 kết nối im lặng quá lâu
+        """
+        self.scheduler = scheduler
+        self.lookup = lookup
+        self.ping = ping
+        self.reap = reap
+        self.interval = interval
+        self.timeout = timeout
+        self.wheel = TimerWheel(tick, interval + timeout)
+        self.lock = threading.Lock() # watch() chạy trên luồng handler, _tick trên scheduler
+        self.running = False
+
+    def watch(self, conn, player):
+        """Kết nối mới (hoặc vừa RESUME): bắt đầu đếm giờ im lặng"""
+        now = self.scheduler.time()
+        player.last_seen = now
+        player.pinged = 0.0
+        with self.lock:
+            if not self.running:
+                # Bánh xe dừng khi không còn kết nối nào -> chỉnh lại mốc thời gian
+                self.running = True
+                self.wheel.now = now
+                self.scheduler.call_later(self.wheel.tick, self._tick)
+            self.wheel.schedule(conn, now + self.interval)
+
+    def _tick(self):
+        now = self.scheduler.time()
+        with self.lock:
+            due = self.wheel.advance(now)
+        later = []
+        for conn in due:
+            player = self.lookup(conn)
+            if player is None or player.conn is not conn:
+                continue # Đã đóng (hoặc bản ghi đã chuyển sang kết nối khác khi RESUME)
+            if player.pinged > player.last_seen:
+                # Đã PING mà chưa nhận được gì
+                if now - player.pinged >= self.timeout:
+                    self.reap(conn)
+                    continue
+                later.append((conn, player.pinged + self.timeout))
+            elif now - player.last_seen >= self.interval:
+                player.pinged = now
+                self.ping(player)
+                later.append((conn, now + self.timeout))
+            else:
+                later.append((conn, player.last_seen + self.interval))
+        with self.lock:
+            for conn, when in later:
+                self.wheel.schedule(conn, when)
+            if len(self.wheel):
+                self.scheduler.call_later(self.wheel.tick, self._tick)
+            else:
+                self.running = False
+
+    def __len__(self):
+        with self.lock:
+            return len(self.wheel)
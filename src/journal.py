@@ -0,0 +1,481 @@
+import argparse
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+# Nhật ký sự kiện của từng ván (journal) để khôi phục sau khi server chết giữa ván
+# và để xem lại (replay) 1 ván đã chơi.
+#
+# Mỗi ván 1 file chỉ ghi thêm, mỗi bản ghi = header RECORD (độ dài, crc32, loại,
+# thời điểm) + thân MessagePack (codec.packb):
+#   GAME_START {room, settings, questions, players: [[id, tên, token]]}
+#   JOIN [id, tên, token] / LEAVE id      (vào/rời phòng giữa ván)
+#   QUESTION [số câu, thời gian]           (mở câu hỏi)
+#   ANSWERS [ids, đáp án, điểm]            (1 bản ghi cho 1 lượt chấm, không phải mỗi câu trả lời)
+#   RESULT số câu / GAME_OVER
+# Các bảng lớn (ANSWERS, danh sách người chơi trong ảnh chụp) ghi theo cột: mỗi cột
+# số là 1 chuỗi bytes int64 little-endian, đọc lại bằng array.frombytes thay vì
+# giải mã MessagePack từng số (codec viết bằng Python, chậm với hàng chục nghìn dòng).
+# Việc ghi chạy trên 1 luồng nền (như DataManager): luồng game chỉ mã hóa rồi xếp
+# hàng; luồng nền ghi cả lượt rồi fsync 1 lần (group commit).
+#
+# MatchState gộp các sự kiện thành trạng thái ván (điểm, câu hiện tại, ai đã trả
+# lời). Cùng 1 hàm apply dùng cho: ghi trực tiếp (để chụp ảnh), khôi phục, replay.
+# Cứ SNAPSHOT_EVERY câu trả lời thì ghi ảnh chụp MatchState + vị trí trong journal
+# ra file .snap (ghi file tạm rồi os.replace): khôi phục = đọc ảnh chụp + phần đuôi
+# journal sau vị trí đó, không phải đọc lại cả ván. Bản ghi cuối ghi dở (thiếu byte
+# hoặc sai crc) bị bỏ qua và cắt đi trước khi ghi tiếp.
+#
+#   data/journal/active/<phòng>.qj (+ .snap) : ván đang chơi, khôi phục khi khởi động
+#   data/journal/<phòng>-<thời điểm>.qj      : ván đã xong, để replay:
+#       python src/journal.py data/journal/lop-10a-20260101-200000.qj --speed 10
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from codec import packb, unpackb, CodecError
+from logs import get_logger
+
+log = get_logger("journal")
+
+JOURNAL_DIR = os.path.join("data", "journal")
+SNAPSHOT_EVERY = 20000 # Số câu trả lời giữa 2 lần chụp ảnh trạng thái
+RECOVERY_PAUSE = 5.0   # Sau khi khôi phục: chờ người chơi kết nối lại (RESUME) rồi mới chơi tiếp
+
+RECORD = struct.Struct("!IIBd") # độ dài thân, crc32(loại + thời điểm + thân), loại, time.time()
+GAME_START, JOIN, LEAVE, QUESTION, ANSWERS, RESULT, GAME_OVER, SNAPSHOT = range(1, 9)
+
+
+def encode_record(kind, payload, when=None):
+    body = packb(payload)
+    when = time.time() if when is None else when
+    head = RECORD.pack(len(body), 0, kind, when)
+    crc = zlib.crc32(body, zlib.crc32(head[8:]))
+    return RECORD.pack(len(body), crc, kind, when) + body
+
+
+def read_records(path, offset=0):
+    """Đọc các bản ghi từ offset: ([(loại, thời điểm, payload)], vị trí sau bản ghi hợp lệ cuối)"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    records = []
+    pos = 0
+    while len(data) - pos >= RECORD.size:
+        length, crc, kind, when = RECORD.unpack_from(data, pos)
+        start = pos + RECORD.size
+        body = data[start:start + length]
+        if len(body) < length or zlib.crc32(body, zlib.crc32(data[pos + 8:start])) != crc:
+            break # Bản ghi cuối ghi dở
+        try:
+            payload = unpackb(body)
+        except CodecError:
+            break
+        records.append((kind, when, payload))
+        pos = start + length
+    return records, offset + pos
+
+
+def pack_ints(values):
+    column = array("q", values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def unpack_ints(data):
+    column = array("q")
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def pack_answers(rows):
+    """[[id, đáp án, điểm]] -> payload ANSWERS theo cột; đáp án lưu 1 byte (A=1.., không hợp lệ = 0)"""
+    choices = bytes(ord(c) - 64 if len(c) == 1 and "A" <= c <= "Z" else 0 for c in (row[1] for row in rows))
+    return [pack_ints(row[0] for row in rows), choices, pack_ints(row[2] for row in rows)]
+
+
+def unpack_answers(payload):
+    """Payload ANSWERS -> [(id, đáp án, điểm)]"""
+    ids, choices, points = payload
+    return list(zip(unpack_ints(ids), (chr(64 + c) if c else "?" for c in choices), unpack_ints(points)))
+
+
+def journal_room(path):
+    """Tên phòng của 1 journal (đọc bản ghi GAME_START đầu file), None nếu hỏng"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return None
+            length, crc, kind, _ = RECORD.unpack(head)
+            body = f.read(length)
+    except OSError:
+        return None
+    if kind != GAME_START or len(body) < length or zlib.crc32(body, zlib.crc32(head[8:])) != crc:
+        return None
+    try:
+        return unpackb(body).get("room")
+    except (CodecError, AttributeError):
+        return None
+
+
+def file_stem(room_id):
+    """Tên file an toàn cho tên phòng bất kỳ (kèm crc để 2 phòng khác nhau không trùng file)"""
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", room_id)[:32]
+    return f"{safe}-{zlib.crc32(room_id.encode('utf-8')):08x}"
+
+
+class MatchState:
+    """Trạng thái 1 ván dựng lại từ các sự kiện (không phụ thuộc engine chấm điểm)"""
+
+    def __init__(self):
+        self.room = None
+        self.settings = {}
+        self.questions = []
+        self.q_index = 0           # Số thứ tự câu đang/vừa mở (1..), 0 = chưa mở câu nào
+        self.time_limit = 0
+        self.question_open = False
+        self.players = {}          # {id: [tên, token, điểm, thứ tự đạt điểm]}
+        self.answers = {}          # {id: [đáp án, điểm]} của câu hiện tại
+        self.finished = False
+        self.answer_count = 0      # Tổng số câu trả lời đã ghi (chọn lúc chụp ảnh)
+        self._seq = 0
+
+    def _touch(self, entry):
+        self._seq += 1
+        entry[3] = self._seq
+
+    def apply(self, kind, payload):
+        if kind == GAME_START:
+            self.room = payload["room"]
+            self.settings = payload.get("settings") or {}
+            self.questions = payload["questions"]
+            for pid, name, token in payload["players"]:
+                self.players[pid] = [name, token, 0, 0]
+                self._touch(self.players[pid])
+        elif kind == JOIN:
+            pid, name, token = payload
+            self.players[pid] = [name, token, 0, 0]
+            self._touch(self.players[pid])
+            self.answers.pop(pid, None)
+        elif kind == LEAVE:
+            self.players.pop(payload, None)
+            self.answers.pop(payload, None)
+        elif kind == QUESTION:
+            q_no, self.time_limit = payload
+            if q_no != self.q_index:
+                # Câu mới (mở lại cùng câu sau khi khôi phục thì giữ các câu trả lời cũ)
+                self.answers = {}
+                self.q_index = q_no
+            self.question_open = True
+        elif kind == ANSWERS:
+            rows = unpack_answers(payload)
+            for pid, choice, points in rows:
+                entry = self.players.get(pid)
+                if entry is None or pid in self.answers:
+                    continue
+                self.answers[pid] = [choice, points]
+                if points:
+                    entry[2] += points
+                    self._touch(entry)
+            self.answer_count += len(rows)
+        elif kind == RESULT:
+            self.question_open = False
+        elif kind == GAME_OVER:
+            self.finished = True
+            self.question_open = False
+
+    def ranking(self):
+        """[(id, tên, điểm)] như bảng xếp hạng: điểm giảm dần, bằng điểm thì ai đạt trước đứng trước"""
+        order = sorted(self.players.items(), key=lambda item: (-item[1][2], item[1][3]))
+        return [(pid, entry[0], entry[2]) for pid, entry in order]
+
+    def distribution(self):
+        counts = {}
+        for choice, _ in self.answers.values():
+            counts[choice] = counts.get(choice, 0) + 1
+        return counts
+
+    def to_dict(self):
+        return {"room": self.room, "settings": self.settings, "questions": self.questions, "q_index": self.q_index,
+                "time_limit": self.time_limit, "question_open": self.question_open,
+                "players": [pack_ints(self.players), [entry[0] for entry in self.players.values()],
+                            [entry[1] for entry in self.players.values()],
+                            pack_ints(entry[2] for entry in self.players.values()),
+                            pack_ints(entry[3] for entry in self.players.values())],
+                "answers": pack_answers([[pid] + entry for pid, entry in self.answers.items()]),
+                "answer_count": self.answer_count, "seq": self._seq}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.room, state.settings, state.questions = data["room"], data["settings"], data["questions"]
+        state.q_index, state.time_limit = data["q_index"], data["time_limit"]
+        state.question_open = data["question_open"]
+        ids, names, tokens, scores, seqs = data["players"]
+        state.players = {pid: [name, token, score, seq] for pid, name, token, score, seq
+                         in zip(unpack_ints(ids), names, tokens, unpack_ints(scores), unpack_ints(seqs))}
+        state.answers = {pid: [choice, points] for pid, choice, points in unpack_answers(data["answers"])}
+        state.answer_count, state._seq = data["answer_count"], data["seq"]
+        return state
+
+
+def load_state(path):
+    """Dựng lại trạng thái ván: ảnh chụp (nếu có) + phần đuôi journal.
+    Trả về (MatchState, vị trí sau bản ghi hợp lệ cuối, số bản ghi đã đọc lại)"""
+    state, offset = MatchState(), 0
+    try:
+        snapshots, _ = read_records(path + ".snap")
+    except OSError:
+        snapshots = []
+    if snapshots and snapshots[0][0] == SNAPSHOT:
+        payload = snapshots[0][2]
+        state, offset = MatchState.from_dict(payload["state"]), payload["offset"]
+    records, end = read_records(path, offset)
+    for kind, _, payload in records:
+        state.apply(kind, payload)
+    return state, end, len(records)
+
+
+def restore_game(state, game):
+    """Nạp MatchState vào engine chấm điểm (GameLogic hoặc ColumnarGameLogic) đã có đủ người chơi.
+    Người chơi phải được add_player theo players_in_order; đặt điểm cũng theo thứ tự đó nên
+    người bằng điểm đứng đúng thứ tự như trước khi server chết"""
+    game.questions = state.questions
+    game.total_questions = len(state.questions)
+    game.state = "PLAYING"
+    game.current_q_index = state.q_index
+    game.current_question_data = state.questions[state.q_index - 1] if state.q_index else None
+    for pid, entry in players_in_order(state):
+        answer = state.answers.get(pid)
+        if answer is None:
+            game.set_score(pid, entry[2])
+        else:
+            # Đáp án câu hiện tại: lần đổi điểm cuối cùng là lúc trả lời
+            game.set_score(pid, entry[2] - answer[1])
+            game.apply_answer(pid, answer[0], answer[1])
+    game.question_open = False # Server mở lại câu (nếu cần) sau RECOVERY_PAUSE
+
+
+def players_in_order(state):
+    """[(id, [tên, token, điểm, thứ tự])] theo thứ tự đạt điểm hiện tại"""
+    return sorted(state.players.items(), key=lambda item: item[1][3])
+
+
+def active_journals(journal_dir):
+    active_dir = os.path.join(journal_dir, "active")
+    try:
+        names = sorted(os.listdir(active_dir))
+    except OSError:
+        return []
+    return [os.path.join(active_dir, name) for name in names if name.endswith(".qj")]
+
+
+# --- GHI ---
+class GameJournal:
+    """Journal của 1 ván đang chơi. Chỉ luồng game (scheduler) gọi; ghi đĩa ở JournalStore"""
+
+    def __init__(self, store, path, state=None, offset=0):
+        self.store = store
+        self.path = path
+        self.state = state or MatchState()
+        self.offset = offset        # Số byte của journal (kể cả phần còn trong hàng đợi)
+        self.snapshot_at = self.state.answer_count
+
+    def record(self, kind, payload):
+        self.state.apply(kind, payload)
+        data = encode_record(kind, payload)
+        self.offset += len(data)
+        self.store.submit(self, "append", data)
+
+    def maybe_snapshot(self):
+        """Gọi giữa 2 câu: chụp ảnh nếu đã ghi đủ nhiều câu trả lời từ lần trước"""
+        if self.state.answer_count - self.snapshot_at < SNAPSHOT_EVERY:
+            return
+        self.snapshot_at = self.state.answer_count
+        data = encode_record(SNAPSHOT, {"offset": self.offset, "state": self.state.to_dict()})
+        self.store.submit(self, "snapshot", data)
+
+    def close(self):
+        """Hết ván: chuyển file sang thư mục lưu trữ để replay"""
+        self.store.submit(self, "close", b"")
+
+
+class JournalStore:
+    """Thư mục journal + 1 luồng nền ghi cho mọi ván của server"""
+
+    def __init__(self, journal_dir=JOURNAL_DIR):
+        self.journal_dir = journal_dir
+        self.active_dir = os.path.join(journal_dir, "active")
+        os.makedirs(self.active_dir, exist_ok=True)
+        self._cond = threading.Condition()
+        self._pending = []  # [(GameJournal, thao tác, bytes)]
+        self._submitted = 0
+        self._written = 0
+        self._writer = None
+        self._files = {}    # {GameJournal: file đang mở} (chỉ luồng nền dùng)
+
+    def open_game(self, room_id, settings, questions, players):
+        path = os.path.join(self.active_dir, file_stem(room_id) + ".qj")
+        journal = GameJournal(self, path)
+        self.submit(journal, "create", b"")
+        journal.record(GAME_START, {"room": room_id, "settings": settings, "questions": questions,
+                                    "players": players})
+        return journal
+
+    def resume(self, path, state, end):
+        """Ghi tiếp journal của ván vừa khôi phục (cắt phần đuôi ghi dở trước)"""
+        journal = GameJournal(self, path, state, end)
+        self.submit(journal, "truncate", b"")
+        return journal
+
+    def active(self):
+        """Các journal của ván chưa xong (cần khôi phục)"""
+        return active_journals(self.journal_dir)
+
+    def archive(self, path):
+        """Ván không khôi phục được/đã xong: cất vào thư mục lưu trữ"""
+        self.submit(GameJournal(self, path), "close", b"")
+
+    def submit(self, journal, op, data):
+        with self._cond:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+            self._pending.append((journal, op, data))
+            self._submitted += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Chờ mọi thao tác đã xếp hàng được ghi xong (đã fsync)"""
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    # --- LUỒNG GHI NỀN ---
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                batch, self._pending = self._pending, []
+            dirty = set()
+            for journal, op, data in batch:
+                try:
+                    self._apply(journal, op, data, dirty)
+                except OSError as e:
+                    log.error(" Lỗi ghi journal %s: %s", journal.path, e)
+            for f in dirty:
+                try:
+                    f.flush()
+                    os.fsync(f.fileno())
+                except (OSError, ValueError):
+                    pass
+            with self._cond:
+                self._written += len(batch)
+                self._cond.notify_all()
+
+    def _apply(self, journal, op, data, dirty):
+        if op == "create":
+            self._files[journal] = open(journal.path, "wb")
+            self._remove(journal.path + ".snap")
+        elif op == "truncate":
+            f = self._files[journal] = open(journal.path, "r+b")
+            f.truncate(journal.offset)
+            f.seek(journal.offset)
+        elif op == "append":
+            f = self._files.get(journal)
+            if f is not None:
+                f.write(data)
+                dirty.add(f)
+        elif op == "snapshot":
+            f = self._files.get(journal)
+            if f is not None:
+                # Ảnh chụp trỏ tới vị trí trong journal -> journal phải xuống đĩa trước
+                f.flush()
+                os.fsync(f.fileno())
+            tmp = journal.path + ".snap.tmp"
+            with open(tmp, "wb") as snap:
+                snap.write(data)
+                snap.flush()
+                os.fsync(snap.fileno())
+            os.replace(tmp, journal.path + ".snap")
+        elif op == "close":
+            f = self._files.pop(journal, None)
+            if f is not None:
+                dirty.discard(f)
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+            stem = os.path.basename(journal.path)[:-len(".qj")]
+            archived = os.path.join(self.journal_dir, f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}.qj")
+            if os.path.exists(journal.path):
+                os.replace(journal.path, archived)
+            self._remove(journal.path + ".snap")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# --- REPLAY ---
+def replay(path, speed=0.0, top=10, out=print):
+    """In lại diễn biến 1 ván. speed > 0: chờ giữa các sự kiện (tua nhanh speed lần), 0 = in ngay"""
+    records, _ = read_records(path)
+    state = MatchState()
+    started = previous = records[0][1] if records else 0.0
+    for kind, when, payload in records:
+        if speed > 0 and when > previous:
+            time.sleep((when - previous) / speed)
+        previous = max(previous, when)
+        stamp = f"[+{when - started:7.2f}s]"
+        left = state.players.get(payload, ["?"])[0] if kind == LEAVE else None
+        reopened = kind == QUESTION and payload[0] == state.q_index
+        state.apply(kind, payload)
+        if kind == GAME_START:
+            out(f"{stamp} Phòng {state.room}: bắt đầu ván {len(state.questions)} câu, "
+                f"{len(state.players)} người chơi {state.settings or ''}")
+        elif kind == JOIN:
+            out(f"{stamp} {payload[1]} vào phòng")
+        elif kind == LEAVE:
+            out(f"{stamp} {left} rời phòng")
+        elif kind == QUESTION:
+            q_data = state.questions[state.q_index - 1]
+            out(f"{stamp} Câu {state.q_index}/{len(state.questions)} ({state.time_limit}s)"
+                f"{' mở lại sau khi khôi phục' if reopened else ''}: {q_data.get('question')}")
+        elif kind == ANSWERS:
+            rows = unpack_answers(payload)
+            correct = sum(1 for _, _, points in rows if points)
+            out(f"{stamp}   {len(rows)} câu trả lời ({correct} đúng), tổng {len(state.answers)}")
+        elif kind == RESULT:
+            q_data = state.questions[state.q_index - 1]
+            counts = " ".join(f"{k}:{v}" for k, v in sorted(state.distribution().items()))
+            out(f"{stamp} Kết quả câu {state.q_index}: đáp án {q_data.get('answer')}, {counts}")
+        elif kind == GAME_OVER:
+            out(f"{stamp} Hết ván")
+    out(f"Bảng xếp hạng{'' if state.finished else ' (ván chưa xong)'}:")
+    for rank, (pid, name, score) in enumerate(state.ranking()[:top], 1):
+        out(f"  {rank:>3}. {name:<20} {score}")
+    return state
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Xem lại 1 ván từ journal")
+    parser.add_argument("path", help="File .qj trong data/journal (hoặc data/journal/active)")
+    parser.add_argument("--speed", type=float, default=0.0, help="Tua nhanh bao nhiêu lần (0 = in ngay)")
+    parser.add_argument("--top", type=int, default=10, help="Số người trong bảng xếp hạng cuối")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    replay(args.path, args.speed, args.top)
@@ -0,0 +1,119 @@
+class Leaderboard:
+    """
+    Bảng xếp hạng cập nhật tăng dần.
+
+    Đếm số người theo từng mức điểm bằng cây Fenwick (Binary Indexed Tree):
+      - đổi điểm 1 người: O(log S)  (S = điểm cao nhất có thể, tự nới rộng)
+      - hạng của 1 người: O(log S)  = 1 + số người có điểm cao hơn
+      - top K:            O(K + số mức điểm khác nhau trong top * log S)
+    Người cùng điểm thì cùng hạng; trong top K xếp theo thứ tự đạt điểm đó.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.tree = [0] * (capacity + 1) # Fenwick, chỉ số 1..capacity ứng với điểm 0..capacity-1
+        self.buckets = {}                # {điểm: {player_id: None}} (dict giữ thứ tự thêm vào)
+        self.scores = {}                 # {player_id: điểm}
+
+    # --- FENWICK ---
+    def _add_count(self, score, delta):
+        i = score + 1
+        while i <= self.capacity:
+            self.tree[i] += delta
+            i += i & -i
+
+    def _count_upto(self, score):
+        """Số người có điểm <= score"""
+        i = min(score + 1, self.capacity)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _kth_smallest(self, k):
+        """Điểm của người thứ k khi xếp tăng dần (k bắt đầu từ 1)"""
+        pos = 0
+        step = 1 << self.capacity.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.capacity and self.tree[nxt] < k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos # chỉ số Fenwick pos+1 <=> điểm pos
+
+    def _grow(self, score):
+        while self.capacity <= score:
+            self.capacity *= 2
+        self.tree = [0] * (self.capacity + 1)
+        for s, bucket in self.buckets.items():
+            self._add_count(s, len(bucket))
+
+    # --- CẬP NHẬT ---
+    def add(self, player_id, score=0):
+        if player_id in self.scores:
+            self.update(player_id, score)
+            return
+        if score >= self.capacity:
+            self._grow(score)
+        self.scores[player_id] = score
+        self.buckets.setdefault(score, {})[player_id] = None
+        self._add_count(score, 1)
+
+    def remove(self, player_id):
+        score = self.scores.pop(player_id, None)
+        if score is None:
+            return
+        bucket = self.buckets[score]
+        del bucket[player_id]
+        if not bucket:
+            del self.buckets[score]
+        self._add_count(score, -1)
+
+    def update(self, player_id, score):
+        old = self.scores.get(player_id)
+        if old == score:
+            return
+        self.remove(player_id)
+        self.add(player_id, score)
+
+    def reset(self, score=0):
+        """Đưa mọi người về cùng 1 mức điểm (đầu ván), O(n)"""
+        players = list(self.scores)
+        self.tree = [0] * (self.capacity + 1)
+        self.scores = dict.fromkeys(players, score)
+        self.buckets = {score: dict.fromkeys(players)} if players else {}
+        if players:
+            self._add_count(score, len(players))
+
+    # --- TRUY VẤN ---
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, player_id):
+        return player_id in self.scores
+
+    def score_of(self, player_id):
+        return self.scores.get(player_id)
+
+    def rank(self, player_id):
+        """Hạng của người chơi (1 = cao nhất), None nếu không có"""
+        score = self.scores.get(player_id)
+        if score is None:
+            return None
+        return len(self.scores) - self._count_upto(score) + 1
+
+    def top(self, k=None):
+        """List [(player_id, điểm)] của k người cao nhất (k=None: tất cả)"""
+        total = len(self.scores)
+        k = total if k is None else min(k, total)
+        result = []
+        while len(result) < k:
+            # Mức điểm của người đứng thứ len(result)+1 từ trên xuống
+            score = self._kth_smallest(total - len(result))
+            for player_id in self.buckets[score]:
+                result.append((player_id, score))
+                if len(result) == k:
+                    break
+        return result
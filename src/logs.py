@@ -0,0 +1,44 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+# Log của Server thay cho print():
+#   - Theo mức (DEBUG/INFO/...): log.debug("...", args) bị bỏ qua gần như miễn phí
+#     khi mức log cao hơn, chuỗi cũng không được format.
+#   - Không chặn: luồng game chỉ đẩy bản ghi vào hàng đợi, 1 luồng nền ghi ra màn hình.
+# Chưa gọi setup_logging (VD: khi import từ benchmark) thì chỉ WARNING trở lên được in.
+
+LOGGER_NAME = "quiz"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+
+_listener = None
+
+
+def get_logger(name):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def setup_logging(level="INFO", stream=None):
+    """Cấu hình log của tiến trình (gọi lại được, VD: trong worker sau khi fork)"""
+    global _listener
+    if _listener is None:
+        atexit.register(_flush_on_exit)
+    else:
+        _listener.stop() # Sau fork luồng nền cũ không còn, stop() trả về ngay
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, "%H:%M:%S"))
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [logging.handlers.QueueHandler(records)]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def _flush_on_exit():
+    # stop() chờ luồng nền ghi hết các bản ghi còn trong hàng đợi
+    _listener.stop()
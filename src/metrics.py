@@ -0,0 +1,216 @@
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Số liệu đo trong tiến trình: counter, gauge và histogram kiểu HDR.
+# Mọi thao tác ghi chỉ tốn 1 lần khóa + vài phép tính số (không cấp phát, không I/O)
+# nên gọi được trên đường nóng. Xuất ra dạng text của Prometheus qua lệnh admin
+# "metrics" hoặc endpoint HTTP cục bộ (serve_metrics, cờ --metrics-port).
+#
+# Histogram lưu số đếm theo bucket log-tuyến tính: mỗi khoảng [2^(e-1), 2^e) chia
+# thành 2^SUB_BITS bucket đều nhau, sai số tương đối ~ 1/2^SUB_BITS (giống HDR
+# Histogram nhưng cho số thực, đơn vị giây). Khi xuất Prometheus chỉ gộp lại theo
+# các mốc lũy thừa của 2 (EXPORT_BUCKETS) để tập "le" cố định giữa các lần đọc.
+
+SUB_BITS = 3 # 8 bucket / lũy thừa 2 -> sai số ~ 12%
+SUB_COUNT = 1 << SUB_BITS
+MIN_VALUE = 1e-7 # Giá trị nhỏ hơn (kể cả 0) được tính vào bucket nhỏ nhất
+EXPORT_BUCKETS = [math.ldexp(1, e) for e in range(-17, 6)] # ~7.6µs ... 32s
+
+
+class Counter:
+    """Giá trị chỉ tăng (số kết nối, số gói tin, số byte...)"""
+    kind = "counter"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [f"{self.name} {self.value}"]
+
+
+class Gauge:
+    """Giá trị tức thời; fn (nếu có) được gọi lúc xuất số liệu"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text="", fn=None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.fn() if self.fn else self.value
+
+    def render(self):
+        return [f"{self.name} {self.get()}"]
+
+
+def _bucket_index(value):
+    """Vị trí bucket của 1 giá trị: (số mũ << SUB_BITS) + bucket con"""
+    mantissa, exponent = math.frexp(max(value, MIN_VALUE)) # mantissa trong [0.5, 1)
+    return (exponent << SUB_BITS) + int((mantissa - 0.5) * 2 * SUB_COUNT)
+
+
+def _bucket_upper(index):
+    """Cận trên của bucket"""
+    exponent, sub = index >> SUB_BITS, index & (SUB_COUNT - 1)
+    return math.ldexp(0.5 + (sub + 1) / (2 * SUB_COUNT), exponent)
+
+
+class Histogram:
+    """Phân bố thời gian (giây): observe() trên đường nóng, quantile() khi cần xem"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.counts = {} # {bucket index: số lần}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = _bucket_index(value)
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Giá trị (cận trên của bucket) mà q phần số lần đo không vượt quá"""
+        with self._lock:
+            items = sorted(self.counts.items())
+            total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, n in items:
+            seen += n
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+    def render(self):
+        with self._lock:
+            items = sorted(self.counts.items())
+            count, total = self.count, self.sum
+        lines = []
+        seen = 0
+        pos = 0
+        for bound in EXPORT_BUCKETS:
+            # Bucket có cận trên <= bound nằm trọn trong [0, bound] vì mốc là lũy thừa của 2
+            while pos < len(items) and _bucket_upper(items[pos][0]) <= bound:
+                seen += items[pos][1]
+                pos += 1
+            lines.append(f'{self.name}_bucket{{le="{bound:.9g}"}} {seen}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total:.9g}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+    def summary(self):
+        """Tóm tắt dễ đọc cho console: số lần, p50/p99/max (ms)"""
+        return (f"n={self.count} p50={self.quantile(0.5) * 1000:.3f}ms "
+                f"p99={self.quantile(0.99) * 1000:.3f}ms max={self.max * 1000:.3f}ms")
+
+
+class MetricsRegistry:
+    """Tập hợp số liệu của 1 tiến trình. Đăng ký lại cùng tên trả về số liệu cũ"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Số liệu '{name}' đã được đăng ký với kiểu {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._register(Counter, name, help_text)
+
+    def gauge(self, name, help_text="", fn=None):
+        gauge = self._register(Gauge, name, help_text)
+        if fn is not None:
+            gauge.fn = fn # Server tạo sau (VD: benchmark) thay hàm đọc của server trước
+        return gauge
+
+    def histogram(self, name, help_text=""):
+        return self._register(Histogram, name, help_text)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(sorted(self._metrics.values(), key=lambda m: m.name))
+
+    def render(self):
+        """Toàn bộ số liệu dạng text của Prometheus"""
+        lines = []
+        for metric in self:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def default_registry():
+    """Registry dùng chung của tiến trình (tạo khi cần lần đầu)"""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = MetricsRegistry()
+        return _default_registry
+
+
+# --- ENDPOINT HTTP ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Không in mỗi lần bị đọc số liệu
+
+
+def serve_metrics(registry, port, host="127.0.0.1"):
+    """Mở http://host:port/metrics trên 1 luồng nền. Trả về HTTP server đang chạy"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
@@ -0,0 +1,258 @@
+import asyncio
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+
+# Giới hạn mặc định cho hàng đợi gửi của mỗi client
+MAX_QUEUE_BYTES = 256 * 1024 # Vượt mức này -> client quá chậm, bị ngắt
+WRITE_TIMEOUT = 10.0         # Số giây tối đa 1 client được phép "không nhận thêm dữ liệu"
+STALL_CHECK = 1.0            # Chu kỳ luồng ghi chung kiểm tra client không nhận dữ liệu
+
+
+class SocketWriter:
+    """
+    1 luồng ghi dùng chung cho mọi ThreadOutbox: selector chờ các socket còn dữ liệu
+    tồn ghi được rồi gửi tiếp (không còn 1 luồng gửi riêng cho mỗi kết nối).
+    Selector chỉ được sửa trong luồng này; outbox báo thay đổi qua self.pending.
+    Cứ check_interval giây (khi còn socket tồn dữ liệu) ngắt các client không nhận
+    quá write_timeout, kể cả khi server không còn gì để gửi thêm cho họ.
+    """
+
+    def __init__(self, check_interval=STALL_CHECK):
+        self.check_interval = check_interval
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.pending = [] # Outbox vừa có dữ liệu tồn hoặc vừa đóng, chờ luồng ghi xem lại
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ)
+        self.thread = None
+
+    def watch(self, outbox):
+        with self.lock:
+            self.pending.append(outbox)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass # Đã có byte đánh thức chưa đọc
+
+    def _run(self):
+        next_check = time.monotonic() + self.check_interval
+        while True:
+            # Chỉ có socket đánh thức -> không cần thức dậy theo chu kỳ
+            timeout = self.check_interval if len(self.selector.get_map()) > 1 else None
+            for key, _ in self.selector.select(timeout):
+                if key.fileobj is self._wake_r:
+                    try:
+                        self._wake_r.recv(4096)
+                    except OSError:
+                        pass
+                elif key.data._flush():
+                    self._forget(key.data)
+            with self.lock:
+                pending, self.pending = self.pending, []
+            for outbox in pending:
+                if outbox._flush():
+                    self._forget(outbox)
+                elif not outbox.registered:
+                    self._register(outbox)
+            now = time.monotonic()
+            if now >= next_check:
+                next_check = now + self.check_interval
+                self._evict_stalled()
+
+    def _evict_stalled(self):
+        stalled = [key.data for key in self.selector.get_map().values()
+                   if key.data is not None and key.data.stalled()]
+        for outbox in stalled:
+            self._forget(outbox)
+            outbox.evict("timeout")
+
+    def _register(self, outbox):
+        try:
+            self.selector.register(outbox.sock, selectors.EVENT_WRITE, outbox)
+        except KeyError:
+            # Số fd được dùng lại: socket cũ bị đóng khi outbox của nó còn nằm trong selector
+            self._forget(self.selector.get_key(outbox.sock).data)
+            self._register(outbox)
+            return
+        except (ValueError, OSError):
+            outbox.close() # Socket đã đóng
+            return
+        outbox.registered = True
+
+    def _forget(self, outbox):
+        if outbox.registered:
+            outbox.registered = False
+            try:
+                self.selector.unregister(outbox.sock)
+            except (ValueError, KeyError):
+                pass
+
+
+_default_writer = None
+
+
+def default_writer():
+    """Luồng ghi dùng chung của tiến trình (tạo khi cần)"""
+    global _default_writer
+    if _default_writer is None:
+        _default_writer = SocketWriter()
+    return _default_writer
+
+
+class ThreadOutbox:
+    """
+    Hàng đợi gửi của 1 kết nối ở chế độ đa luồng.
+    put() gửi ngay không chặn (MSG_DONTWAIT) được bao nhiêu thì gửi, phần còn lại
+    xếp hàng cho luồng ghi chung (SocketWriter) nên 1 client mạng yếu không chặn
+    những người khác. Socket vẫn ở chế độ chặn cho luồng nhận của kết nối.
+    """
+
+    def __init__(self, sock, max_bytes=MAX_QUEUE_BYTES, write_timeout=WRITE_TIMEOUT, writer=None, on_evict=None):
+        self.sock = sock
+        self.on_evict = on_evict # on_evict(sock, lý do): luồng ghi chung ngắt client không nhận dữ liệu
+        self.max_bytes = max_bytes
+        self.write_timeout = write_timeout
+        self.writer = writer or default_writer()
+        self.queue = deque()
+        self.queued_bytes = 0
+        self.closed = False
+        self.sending_since = None # Thời điểm client nhận được dữ liệu lần cuối khi còn dữ liệu tồn
+        self.registered = False   # Đang nằm trong selector của luồng ghi (chỉ luồng ghi đụng tới)
+        self.lock = threading.Lock()
+
+    def put(self, data):
+        """Gửi/xếp bytes vào hàng đợi. Trả về lý do nếu client cần bị ngắt, ngược lại None"""
+        with self.lock:
+            if self.closed:
+                return None
+            if self.stalled():
+                return "timeout"
+            if self.queued_bytes + len(data) > self.max_bytes:
+                return "high_water"
+            if not self.queue:
+                try:
+                    sent = self.sock.send(data, socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    sent = 0
+                except OSError:
+                    self._close()
+                    return None
+                if sent == len(data):
+                    return None
+                data = memoryview(data)[sent:]
+                self.sending_since = time.monotonic()
+                self.queue.append(data)
+                self.queued_bytes += len(data)
+            else:
+                self.queue.append(data)
+                self.queued_bytes += len(data)
+                return None
+        self.writer.watch(self) # Hàng đợi vừa có dữ liệu tồn
+        return None
+
+    def stalled(self):
+        since = self.sending_since
+        return since is not None and time.monotonic() - since > self.write_timeout
+
+    def depth(self):
+        return self.queued_bytes
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            queued = bool(self.queue)
+            self._close()
+        if queued:
+            self.writer.watch(self) # Luồng ghi bỏ socket khỏi selector
+
+    def evict(self, reason):
+        """(Luồng ghi) client không nhận dữ liệu quá lâu: báo server ngắt, đóng hàng đợi"""
+        if self.on_evict is not None:
+            self.on_evict(self.sock, reason)
+        self.close()
+
+    def _close(self):
+        self.closed = True
+        self.queue.clear()
+        self.queued_bytes = 0
+        self.sending_since = None
+
+    def _flush(self):
+        """(Luồng ghi) gửi tiếp dữ liệu tồn; True nếu không cần chờ socket nữa (hết dữ liệu/đã đóng)"""
+        with self.lock:
+            while self.queue and not self.closed:
+                data = self.queue[0]
+                try:
+                    sent = self.sock.send(data, socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    return False
+                except OSError:
+                    self._close()
+                    break
+                self.queued_bytes -= sent
+                self.sending_since = time.monotonic()
+                if sent < len(data):
+                    self.queue[0] = data[sent:]
+                    return False
+                self.queue.popleft()
+            self.sending_since = None
+            return True
+
+
+class AsyncOutbox:
+    """
+    Hàng đợi gửi của 1 kết nối ở chế độ event loop.
+    Dữ liệu nằm trong buffer của transport (asyncio tự ghi khi socket sẵn sàng);
+    lớp này chỉ giới hạn kích thước buffer và canh thời gian client không nhận.
+    """
+
+    def __init__(self, writer, on_evict, max_bytes=MAX_QUEUE_BYTES, write_timeout=WRITE_TIMEOUT):
+        self.writer = writer
+        self.transport = writer.transport
+        self.on_evict = on_evict
+        self.max_bytes = max_bytes
+        self.write_timeout = write_timeout
+        self.closed = False
+        self.watcher = None # Task chờ buffer rỗng, chỉ tồn tại khi còn dữ liệu tồn
+        # high=0: drain() chỉ xong khi buffer đã ghi hết ra socket
+        self.transport.set_write_buffer_limits(high=0)
+
+    def put(self, data):
+        """Ghi vào buffer của transport. Trả về lý do nếu client cần bị ngắt, ngược lại None"""
+        if self.closed or self.transport.is_closing():
+            return None
+        if self.depth() + len(data) > self.max_bytes:
+            return "high_water"
+        self.writer.write(data)
+        if self.depth() and self.watcher is None:
+            self.watcher = asyncio.ensure_future(self._watch())
+        return None
+
+    def depth(self):
+        return self.transport.get_write_buffer_size()
+
+    def close(self):
+        self.closed = True
+        if self.watcher is not None:
+            self.watcher.cancel()
+            self.watcher = None
+
+    async def _watch(self):
+        try:
+            await asyncio.wait_for(self.writer.drain(), self.write_timeout)
+        except asyncio.TimeoutError:
+            self.watcher = None
+            self.on_evict(self.writer, "timeout")
+            return
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        self.watcher = None
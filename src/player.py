@@ -0,0 +1,40 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from codec import JSON
+
+# 1 người chơi = 1 bản ghi dùng chung cho mọi nơi cần tới:
+#   QuizServer.clients  : {kết nối: Player}   (nhận gói tin -> tìm người gửi)
+#   Room.members        : {player.id: Player} (danh sách nhận tin của phòng)
+#   Room.spectators     : {player.id: Player} (khán giả: chỉ nhận tin, không có trong GameLogic)
+#   GameLogic.players   : {player.id: Player} (điểm, đáp án câu hiện tại)
+# thay cho 2 dict riêng (thông tin kết nối + điểm) cùng khóa bằng socket.
+# id là số nguyên nhỏ cấp lúc LOGIN; kết nối lại (RESUME) giữ nguyên bản ghi và
+# id, chỉ đổi conn/outbox.
+
+
+class Player:
+    __slots__ = ("id", "conn", "addr", "name", "room", "outbox", "codec", "prefetch", "token", "score", "answer",
+                 "last_seen", "pinged", "spectator", "limit")
+
+    def __init__(self, player_id=None, name="Unknown", conn=None, addr=None, outbox=None):
+        self.id = player_id   # None cho tới khi LOGIN
+        self.conn = conn      # socket (thread) hoặc StreamWriter (async)
+        self.addr = addr
+        self.name = name
+        self.room = None      # room_id
+        self.outbox = outbox
+        self.codec = JSON
+        self.prefetch = False
+        self.token = None     # Token phiên (RESUME)
+        self.score = 0
+        self.answer = None    # (đáp án, điểm được cộng) của câu hiện tại, None nếu chưa trả lời
+        self.last_seen = 0.0  # Lúc nhận gói tin gần nhất (giờ của scheduler, xem heartbeat.py)
+        self.pinged = 0.0     # Lúc gửi PING gần nhất
+        self.spectator = False # Khán giả (LOGIN "role": "spectator"): không trả lời, không tính điểm
+        self.limit = None     # Xô token của kết nối (ratelimit.ConnectionLimit), None nếu tắt giới hạn
+
+    def __repr__(self):
+        return f"<Player {self.id} {self.name!r}: {self.score}>"
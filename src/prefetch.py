@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import hmac
+import os
+
+# Gửi trước câu hỏi đã mã hóa (PREFETCH) trong lúc nghỉ giữa 2 câu, tới giờ mở
+# câu chỉ gửi khóa (REVEAL, vài chục byte) thay cho cả gói QUESTION.
+#
+#   server -> client : PREFETCH {"question_number": n, "data": blob}
+#   server -> client : REVEAL   {"question_number": n, "key": khóa}
+# blob = nonce (16) | bản mã | tag (16). Bản rõ là thân gói QUESTION theo codec
+# của client (giải mã bằng codec.decode_body), giống hệt gói gửi cho client không
+# dùng prefetch. Với codec JSON, blob và khóa được mã hóa base64; codec nhị phân
+# gửi bytes thô.
+#
+# Thư viện chuẩn không có AES nên dùng các hàm băm có khóa của hashlib:
+# dòng khóa = SHAKE-256(nhãn | khóa | nonce) (XOF, ra đủ độ dài bản rõ trong 1 lần gọi),
+# tag = BLAKE2b có khóa trên nonce | bản mã (mã hóa rồi mới ký). Mỗi câu của mỗi
+# phòng có khóa ngẫu nhiên riêng, dùng 1 lần.
+# Client chỉ đề nghị nhận prefetch bằng "prefetch": true trong LOGIN.
+
+KEY_SIZE = 32
+NONCE_SIZE = 16
+TAG_SIZE = 16
+MAX_PREFETCHED = 4 # Số câu đã mã hóa tối đa client giữ chờ REVEAL
+
+
+class SealError(ValueError):
+    """Khóa sai hoặc dữ liệu đã bị sửa"""
+
+
+def _xor_keystream(key, nonce, data):
+    n = len(data)
+    stream = hashlib.shake_256(b"quiz-prefetch-enc" + key + nonce).digest(n)
+    return (int.from_bytes(data, "big") ^ int.from_bytes(stream, "big")).to_bytes(n, "big")
+
+
+def _tag(key, nonce, ciphertext):
+    return hashlib.blake2b(nonce + ciphertext, key=key, digest_size=TAG_SIZE, person=b"quiz-prefetch").digest()
+
+
+def seal(plaintext, key=None):
+    """Mã hóa plaintext (bytes) -> (khóa, blob). Khóa mới sinh ngẫu nhiên nếu không truyền"""
+    key = key or os.urandom(KEY_SIZE)
+    nonce = os.urandom(NONCE_SIZE)
+    ciphertext = _xor_keystream(key, nonce, plaintext)
+    return key, nonce + ciphertext + _tag(key, nonce, ciphertext)
+
+
+def unseal(key, blob):
+    """Giải mã blob của seal(); SealError nếu khóa sai hoặc blob bị sửa"""
+    if len(key) != KEY_SIZE or len(blob) < NONCE_SIZE + TAG_SIZE:
+        raise SealError("Khóa hoặc dữ liệu không hợp lệ")
+    nonce, ciphertext, tag = blob[:NONCE_SIZE], blob[NONCE_SIZE:-TAG_SIZE], blob[-TAG_SIZE:]
+    if not hmac.compare_digest(tag, _tag(key, nonce, ciphertext)):
+        raise SealError("Sai tag: khóa sai hoặc dữ liệu bị sửa")
+    return _xor_keystream(key, nonce, ciphertext)
+
+
+def pack_bytes(data, codec):
+    """bytes -> giá trị đặt trong gói tin (JSON không chứa được bytes -> base64)"""
+    return data if codec.binary else base64.b64encode(data).decode("ascii")
+
+
+def unpack_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return base64.b64decode(value, validate=True)
+
+
+class PrefetchStore:
+    """Phía client: giữ các câu đã nhận trước, mở khi có REVEAL"""
+
+    def __init__(self, limit=MAX_PREFETCHED):
+        self.limit = limit
+        self._blobs = {} # {question_number: blob}
+
+    def add(self, message):
+        """Gói PREFETCH"""
+        try:
+            self._blobs[message["question_number"]] = unpack_bytes(message["data"])
+        except (KeyError, TypeError, ValueError):
+            return
+        while len(self._blobs) > self.limit:
+            del self._blobs[next(iter(self._blobs))] # Bỏ câu cũ nhất
+
+    def reveal(self, message):
+        """Gói REVEAL -> thân gói QUESTION (bytes) đã giải mã, hoặc None nếu không có/không mở được"""
+        blob = self._blobs.pop(message.get("question_number"), None)
+        if blob is None:
+            return None
+        try:
+            return unseal(unpack_bytes(message.get("key")), blob)
+        except (SealError, TypeError, ValueError):
+            return None
+
+    def clear(self):
+        self._blobs.clear()
@@ -0,0 +1,81 @@
+import struct
+
+from codec import JSON, decode_body
+
+# Mỗi gói tin trên TCP = 4 byte độ dài (big-endian) + thân gói (JSON utf-8,
+# hoặc nhị phân nếu đã thỏa thuận lúc LOGIN - xem codec.py).
+# TCP là luồng byte: 1 lần recv có thể chứa nửa gói hoặc nhiều gói dính nhau,
+# nên bên nhận phải gom byte và tách theo độ dài chứ không json.loads trực tiếp.
+HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 1024 * 1024 # 1 MB, đủ cho bảng xếp hạng lớn
+RECV_SIZE = 4096
+
+
+class FrameTooLarge(ValueError):
+    """Gói tin khai báo độ dài vượt quá giới hạn cho phép"""
+
+
+def encode(message_dict, codec=JSON):
+    """Đóng gói 1 dict thành bytes sẵn sàng gửi qua socket"""
+    return frame(codec.encode(message_dict))
+
+
+def frame(body):
+    """Thêm header độ dài vào thân gói đã mã hóa"""
+    return HEADER.pack(len(body)) + body
+
+
+class FrameDecoder:
+    """
+    Bộ tách gói tin tăng dần: nhận từng mảnh bytes từ recv,
+    giữ lại phần gói chưa đủ và trả về mọi gói hoàn chỉnh.
+    """
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buf = bytearray() # Buffer dùng lại giữa các lần recv
+        self._pos = 0           # Vị trí bắt đầu của gói chưa đọc trong buffer
+
+    def feed(self, data):
+        """Thêm bytes vừa nhận, trả về list các message (dict) hoàn chỉnh"""
+        return self._feed(data, False)
+
+    def feed_frames(self, data):
+        """Như feed nhưng trả về [(message, gói nguyên vẹn gồm cả header)] để chuyển
+        tiếp nguyên bytes, không mã hóa lại (relay)"""
+        return self._feed(data, True)
+
+    def _feed(self, data, keep_frames):
+        self._buf += data
+        messages = []
+        buf = self._buf
+        view = memoryview(buf)
+        try:
+            end = len(buf)
+            while end - self._pos >= HEADER.size:
+                (length,) = HEADER.unpack_from(buf, self._pos)
+                if length > self.max_frame_size:
+                    raise FrameTooLarge(f"Gói tin {length} bytes vượt giới hạn {self.max_frame_size}")
+                frame_start = self._pos
+                start = frame_start + HEADER.size
+                if end - start < length:
+                    break # Chưa nhận đủ thân gói
+                body = view[start:start + length].tobytes()
+                self._pos = start + length
+                try:
+                    message = decode_body(body)
+                except ValueError:
+                    continue # Bỏ qua gói hỏng, các gói sau vẫn đọc được
+                messages.append((message, view[frame_start:self._pos].tobytes()) if keep_frames else message)
+        finally:
+            view.release()
+
+        # Dồn phần còn lại về đầu buffer 1 lần (không cắt sau mỗi gói)
+        if self._pos:
+            del buf[:self._pos]
+            self._pos = 0
+        return messages
+
+    def pending(self):
+        """Số byte đang chờ đủ gói"""
+        return len(self._buf) - self._pos
@@ -0,0 +1,211 @@
+import array
+import json
+import mmap
+import os
+import random
+import re
+import sys
+
+# Ngân hàng câu hỏi lớn (hàng trăm nghìn câu) mà không giữ mọi câu trong RAM:
+#   - Chỉ mục: vị trí byte + độ dài của từng câu trong file, id, mã chủ đề, mã độ khó
+#     (các mảng array gọn, không phải list dict).
+#   - Nội dung câu hỏi đọc khi cần từ file đã mmap.
+#   - Chỉ mục lưu sẵn ở "<file>.idx", chỉ dựng lại khi mtime/kích thước file đổi.
+# Hỗ trợ file JSON dạng mảng [ {...}, {...} ] (như data/questions.json)
+# hoặc JSON Lines (mỗi dòng 1 câu hỏi).
+
+INDEX_VERSION = 1
+_SEPARATORS = re.compile(r"[\s,]*")
+# (tên mảng, kiểu phần tử) theo đúng thứ tự ghi trong file .idx
+_ARRAYS = (("offsets", "q"), ("lengths", "q"), ("ids", "q"),
+           ("category_codes", "H"), ("difficulty_codes", "H"))
+
+
+class QuestionBank:
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + ".idx"
+        self._mm = None
+        self._id_pos = None
+        self._filters = {} # {(category, difficulty): các vị trí phù hợp}
+        self._reset_index()
+
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return # Chưa có file -> ngân hàng rỗng
+        if not self._load_index(st):
+            self._build_index()
+            self._save_index(st)
+        if len(self.offsets):
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _reset_index(self):
+        for name, typecode in _ARRAYS:
+            setattr(self, name, array.array(typecode))
+        self.categories = [None] # Mã 0 = không có chủ đề / độ khó
+        self.difficulties = [None]
+
+    # --- DỰNG CHỈ MỤC ---
+    def _build_index(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        codes = ({None: 0}, {None: 0})
+        if data.lstrip()[:1] == b"[":
+            self._scan_array(data, codes)
+        else:
+            self._scan_lines(data, codes)
+
+    def _scan_lines(self, data, codes):
+        pos = 0
+        for line in data.splitlines(keepends=True):
+            body = line.strip()
+            if body:
+                try:
+                    self._add(json.loads(body), pos + line.index(body), len(body), codes)
+                except ValueError:
+                    pass # Bỏ qua dòng hỏng
+            pos += len(line)
+
+    def _scan_array(self, data, codes):
+        text = data.decode("utf-8")
+        decoder = json.JSONDecoder()
+        pos = text.index("[") + 1
+        # Đổi vị trí ký tự sang vị trí byte (UTF-8 có ký tự nhiều byte), cộng dồn từng đoạn
+        char_pos = byte_pos = 0
+        while True:
+            pos = _SEPARATORS.match(text, pos).end()
+            if pos >= len(text) or text[pos] == "]":
+                break
+            obj, end = decoder.raw_decode(text, pos)
+            byte_pos += len(text[char_pos:pos].encode("utf-8"))
+            length = len(text[pos:end].encode("utf-8"))
+            self._add(obj, byte_pos, length, codes)
+            byte_pos += length
+            char_pos = pos = end
+
+    def _add(self, obj, offset, length, codes):
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        qid = obj.get("id")
+        self.ids.append(qid if isinstance(qid, int) else len(self.ids) + 1)
+        self.category_codes.append(self._code(self.categories, codes[0], obj.get("category")))
+        self.difficulty_codes.append(self._code(self.difficulties, codes[1], obj.get("difficulty")))
+
+    @staticmethod
+    def _code(table, lookup, value):
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(table)
+            table.append(value)
+        return code
+
+    # --- FILE CHỈ MỤC (.idx) ---
+    # Dòng đầu: header JSON; sau đó là bytes thô của các mảng theo thứ tự _ARRAYS
+    def _header(self, st):
+        return {"version": INDEX_VERSION, "byteorder": sys.byteorder,
+                "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    def _load_index(self, st):
+        try:
+            with open(self.index_path, "rb") as f:
+                header = json.loads(f.readline())
+                expected = self._header(st)
+                if any(header.get(k) != v for k, v in expected.items()):
+                    return False # File câu hỏi đã đổi -> dựng lại
+                count = header["count"]
+                for name, typecode in _ARRAYS:
+                    arr = array.array(typecode)
+                    arr.frombytes(f.read(count * arr.itemsize))
+                    if len(arr) != count:
+                        raise ValueError("File chỉ mục bị cụt")
+                    setattr(self, name, arr)
+                self.categories = header["categories"]
+                self.difficulties = header["difficulties"]
+            return True
+        except (OSError, ValueError, KeyError):
+            self._reset_index()
+            return False
+
+    def _save_index(self, st):
+        header = self._header(st)
+        header.update(count=len(self.offsets), categories=self.categories, difficulties=self.difficulties)
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n")
+                for name, _ in _ARRAYS:
+                    f.write(getattr(self, name).tobytes())
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass # Không ghi được (thư mục chỉ đọc) -> lần sau dựng lại, vẫn chạy bình thường
+
+    # --- TRUY VẤN ---
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, pos):
+        """Câu hỏi thứ pos (theo thứ tự trong file), đọc từ mmap"""
+        start = self.offsets[pos]
+        return json.loads(self._mm[start:start + self.lengths[pos]])
+
+    def by_id(self, qid):
+        """Câu hỏi theo id, None nếu không có"""
+        if self._id_pos is None:
+            self._id_pos = {qid: pos for pos, qid in enumerate(self.ids)}
+        pos = self._id_pos.get(qid)
+        return None if pos is None else self.get(pos)
+
+    def count_by(self, field):
+        """Số câu theo từng chủ đề / độ khó: field = "category" | "difficulty" """
+        table, codes = self._field(field)
+        counts = [0] * len(table)
+        for code in codes:
+            counts[code] += 1
+        return {table[code]: n for code, n in enumerate(counts) if n}
+
+    def _field(self, field):
+        if field == "category":
+            return self.categories, self.category_codes
+        if field == "difficulty":
+            return self.difficulties, self.difficulty_codes
+        raise ValueError(f"Không có chỉ mục '{field}'")
+
+    def select(self, category=None, difficulty=None):
+        """Vị trí các câu thỏa điều kiện (None = không lọc), có cache"""
+        key = (category, difficulty)
+        positions = self._filters.get(key)
+        if positions is None:
+            if category is None and difficulty is None:
+                positions = range(len(self))
+            else:
+                # So sánh mã số nhỏ thay vì giá trị; giá trị không tồn tại -> -1, không khớp câu nào
+                cat = None if category is None else self._lookup(self.categories, category)
+                diff = None if difficulty is None else self._lookup(self.difficulties, difficulty)
+                cat_codes, diff_codes = self.category_codes, self.difficulty_codes
+                positions = array.array("I", (
+                    pos for pos in range(len(self))
+                    if (cat is None or cat_codes[pos] == cat) and (diff is None or diff_codes[pos] == diff)))
+            if positions:
+                self._filters[key] = positions # Không cache bộ lọc rỗng (giá trị lạ từ client)
+        return positions
+
+    @staticmethod
+    def _lookup(table, value):
+        try:
+            return table.index(value, 1)
+        except ValueError:
+            return -1
+
+    def sample(self, count=None, category=None, difficulty=None):
+        """Bốc ngẫu nhiên count câu không trùng (None = tất cả câu phù hợp, xáo trộn).
+        Chỉ đọc nội dung của các câu được bốc."""
+        positions = self.select(category, difficulty)
+        count = len(positions) if count is None else max(0, min(count, len(positions)))
+        return [self.get(pos) for pos in random.sample(positions, count)]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
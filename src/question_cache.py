@@ -0,0 +1,105 @@
+import json
+import threading
+from collections import OrderedDict
+
+from codec import JSON, pack_pairs
+from protocol import frame
+
+# Cache các câu hỏi đã chuẩn bị sẵn để gửi, dùng chung cho mọi phòng trong tiến trình.
+# Mỗi câu chỉ làm 1 lần (lần đầu được dùng):
+#   - payload: options đã đổi từ dict {"A":..., "B":...} sang list theo thứ tự A-D
+#   - body: phần JSON cố định của gói QUESTION ("question", "options") đã mã hóa sẵn
+# Khi gửi chỉ cần ghép vài số nguyên riêng của phòng (câu thứ mấy, tổng số câu,
+# thời gian) vào trước body, không json.dumps lại nội dung câu hỏi.
+# Với codec nhị phân, phần cố định là các cặp MessagePack đã mã hóa sẵn (packed).
+
+QUESTION_CACHE_SIZE = 4096 # Số câu tối đa giữ trong cache (bỏ câu lâu không dùng nhất)
+DEFAULT_TIME_LIMIT = 15
+
+
+def format_options(raw_options):
+    """Options dạng dict -> list theo thứ tự key A, B, C, D (để Client hiển thị đúng)"""
+    if isinstance(raw_options, dict):
+        return [raw_options[key] for key in sorted(raw_options)]
+    return list(raw_options)
+
+
+class CachedQuestion:
+    __slots__ = ("payload", "body", "_packed")
+
+    def __init__(self, q_data):
+        options = format_options(q_data["options"])
+        self.payload = {
+            "id": q_data["id"],
+            "text": q_data["question"], # Key trong JSON là "question"
+            "options": options,
+            "time_limit": DEFAULT_TIME_LIMIT
+        }
+        # Bỏ dấu { } ngoài cùng để ghép vào gói QUESTION
+        self.body = json.dumps({"question": q_data["question"], "options": options}).encode("utf-8")[1:-1]
+        self._packed = None
+
+    @property
+    def packed(self):
+        """Các cặp "question"/"options" dạng MessagePack (tạo khi có client dùng codec nhị phân)"""
+        if self._packed is None:
+            self._packed = pack_pairs({"question": self.payload["text"], "options": self.payload["options"]})
+        return self._packed
+
+
+class QuestionCache:
+    def __init__(self, maxsize=QUESTION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, q_data):
+        """CachedQuestion của 1 câu hỏi (tạo ở lần dùng đầu tiên)"""
+        # Khóa gồm cả nội dung câu để file câu hỏi đổi thì không dùng nhầm bản cũ
+        key = (q_data["id"], q_data["question"])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = CachedQuestion(q_data)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def frame(self, q_data, question_number, total_questions, time_limit=DEFAULT_TIME_LIMIT, codec=JSON):
+        """Gói QUESTION hoàn chỉnh (header + thân gói) sẵn sàng gửi cho cả phòng"""
+        return frame(self.body(q_data, question_number, total_questions, time_limit, codec))
+
+    def body(self, q_data, question_number, total_questions, time_limit=DEFAULT_TIME_LIMIT, codec=JSON):
+        """Thân gói QUESTION theo codec (chưa có header độ dài)"""
+        entry = self.get(q_data)
+        if codec.binary:
+            head = {"type": "QUESTION", "question_number": question_number,
+                    "total_questions": total_questions, "time_limit": time_limit}
+            return codec.encode_spliced(head, entry.packed, 2)
+        head = b'{"type": "QUESTION", "question_number": %d, "total_questions": %d, "time_limit": %d, ' % (
+            question_number, total_questions, time_limit)
+        return codec.finish(head + entry.body + b"}")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_question_cache():
+    """Cache câu hỏi dùng chung của tiến trình (tạo khi cần lần đầu)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = QuestionCache()
+        return _default_cache
@@ -0,0 +1,174 @@
+import threading
+
+# Giới hạn tốc độ gói tin từ client (chống spam/flood) bằng token bucket.
+#
+# Mỗi loại gói (LOGIN, ANSWER, ...) có 1 "xô" cho từng kết nối và 1 xô cho cả địa
+# chỉ IP (nhiều kết nối từ 1 máy dùng chung): xô đầy SỨC CHỨA token, mỗi gói lấy 1
+# token, token được nạp lại TỐC ĐỘ cái/giây. Không có timer: lúc lấy token mới tính
+# phần nạp thêm từ lần trước (như Player.last_seen của heartbeat), nên mỗi gói chỉ
+# tốn vài phép tính trên 2 list số thực.
+#
+# Gói vượt giới hạn bị bỏ qua (không xử lý) và tính 1 lần vi phạm; vi phạm cũng đi
+# qua 1 xô riêng (STRIKES): thỉnh thoảng gửi dồn vài gói thì không sao, spam liên
+# tục thì hết xô -> server ngắt kết nối (và không giữ chỗ để RESUME).
+# Kết nối mới cũng lấy 1 token từ xô CONNECT của IP (chặn mở kết nối liên tục);
+# mỗi lần bị ngắt vì spam, IP đó nợ thêm KICK_PENALTY token CONNECT nên ngắt rồi
+# kết nối lại để có xô mới chỉ làm IP bị chặn lâu hơn.
+#
+# Địa chỉ trong TRUSTED_IPS (mặc định loopback: bot/benchmark chạy cùng máy) chỉ
+# bị giới hạn theo từng kết nối, không theo IP.
+
+OTHER = "*" # Loại gói không có trong bảng (kể cả gói không có "type")
+
+# loại gói: (tốc độ nạp/giây, sức chứa) cho 1 kết nối
+CONNECTION_LIMITS = {
+    "LOGIN": (1.0, 3),
+    "RESUME": (1.0, 3),
+    "START": (1.0, 3),
+    "ANSWER": (5.0, 10),
+    "PING": (2.0, 10),
+    "PONG": (2.0, 10),
+    OTHER: (10.0, 20),
+}
+# Cho cả 1 IP (lớp học sau NAT: vài chục người cùng vào, cùng trả lời 1 lúc)
+IP_LIMITS = {
+    "CONNECT": (10.0, 100),
+    "LOGIN": (20.0, 100),
+    "RESUME": (20.0, 100),
+    "START": (5.0, 20),
+    "ANSWER": (200.0, 1000),
+    "PING": (100.0, 500),
+    "PONG": (100.0, 500),
+    OTHER: (200.0, 1000),
+}
+STRIKES = (1.0, 20)                # Xô vi phạm: hết thì ngắt kết nối
+KICK_PENALTY = 30                  # Số token CONNECT IP bị trừ mỗi lần 1 kết nối của nó bị ngắt
+TRUSTED_IPS = ("127.0.0.1", "::1")
+
+DROP = "drop" # Kết quả check(): bỏ gói
+KICK = "kick" #                     bỏ gói và ngắt kết nối
+
+
+class Buckets:
+    """Mức token và lần nạp cuối của 1 nhóm xô (theo chỉ số loại gói của RateLimiter)"""
+    __slots__ = ("tokens", "stamps")
+
+    def __init__(self, caps):
+        self.tokens = list(caps) # Bắt đầu đầy
+        self.stamps = [0.0] * len(caps)
+
+    def take(self, i, rate, cap, now):
+        level = self.tokens[i] + (now - self.stamps[i]) * rate
+        if level > cap:
+            level = cap
+        self.stamps[i] = now
+        if level < 1.0:
+            self.tokens[i] = level
+            return False
+        self.tokens[i] = level - 1.0
+        return True
+
+
+class ConnectionLimit(Buckets):
+    """Xô của 1 kết nối (Player.limit) + xô vi phạm, trỏ tới xô của IP (None nếu IP tin cậy)"""
+    __slots__ = ("ip", "strikes", "strike_stamp")
+
+    def __init__(self, caps, ip):
+        super().__init__(caps)
+        self.ip = ip
+        self.strikes = float(STRIKES[1])
+        self.strike_stamp = 0.0
+
+
+class IpLimit(Buckets):
+    __slots__ = ("connections", "last_seen")
+
+    def __init__(self, caps):
+        super().__init__(caps)
+        self.connections = 0
+        self.last_seen = 0.0
+
+
+class RateLimiter:
+    """Bảng giới hạn dùng chung cho mọi kết nối của 1 server.
+    scale nhân tốc độ và sức chứa của mọi xô (2 = nới gấp đôi)"""
+
+    def __init__(self, scale=1.0, limits=CONNECTION_LIMITS, ip_limits=IP_LIMITS, trusted=TRUSTED_IPS):
+        self.index = {kind: i for i, kind in enumerate(limits)}
+        self.other = self.index[OTHER]
+        self.rates = [limits[kind][0] * scale for kind in limits]
+        self.caps = [limits[kind][1] * scale for kind in limits]
+        # Xô IP theo cùng chỉ số với xô kết nối, CONNECT ở cuối
+        kinds = list(limits) + ["CONNECT"]
+        self.ip_rates = [ip_limits[kind][0] * scale for kind in kinds]
+        self.ip_caps = [ip_limits[kind][1] * scale for kind in kinds]
+        self.connect = len(kinds) - 1
+        # Lâu nhất bao lâu thì mọi xô của 1 IP nạp đầy lại (sau đó xóa được IP không còn kết nối)
+        self.refill = max(cap / rate for rate, cap in zip(self.ip_rates, self.ip_caps))
+        self.trusted = set(trusted)
+        self.ips = {}                # {ip: IpLimit}
+        self.lock = threading.Lock() # Xô IP dùng chung giữa các luồng handler (chế độ thread)
+        self._sweep_at = 1024
+        self.stats = {"dropped": 0, "kicked": 0, "refused": 0}
+
+    def open(self, addr, now):
+        """Kết nối mới: ConnectionLimit của nó, None nếu IP mở kết nối quá nhanh (từ chối)"""
+        ip = addr[0] if isinstance(addr, tuple) and addr else None
+        if ip is None or ip in self.trusted:
+            return ConnectionLimit(self.caps, None)
+        with self.lock:
+            state = self.ips.get(ip)
+            if state is None:
+                if len(self.ips) >= self._sweep_at:
+                    self._sweep(now)
+                state = self.ips[ip] = IpLimit(self.ip_caps)
+            state.last_seen = now
+            i = self.connect
+            if not state.take(i, self.ip_rates[i], self.ip_caps[i], now):
+                self.stats["refused"] += 1
+                return None
+            state.connections += 1
+        return ConnectionLimit(self.caps, state)
+
+    def close(self, limit):
+        """Kết nối đã đóng (IP được xóa khỏi bảng sau khi các xô nạp đầy lại)"""
+        if limit is not None and limit.ip is not None:
+            with self.lock:
+                limit.ip.connections -= 1
+
+    def check(self, limit, kind, now):
+        """1 gói tin loại kind: None = xử lý bình thường, DROP = bỏ qua, KICK = ngắt kết nối"""
+        i = self.index.get(kind, self.other) if isinstance(kind, str) else self.other
+        allowed = limit.take(i, self.rates[i], self.caps[i], now)
+        ip = limit.ip
+        if allowed and ip is not None:
+            with self.lock:
+                ip.last_seen = now
+                allowed = ip.take(i, self.ip_rates[i], self.ip_caps[i], now)
+        if allowed:
+            return None
+        self.stats["dropped"] += 1
+        rate, cap = STRIKES
+        level = min(cap, limit.strikes + (now - limit.strike_stamp) * rate) - 1.0
+        limit.strikes, limit.strike_stamp = level, now
+        if level < 0.0:
+            self.stats["kicked"] += 1
+            if ip is not None:
+                with self.lock:
+                    i = self.connect
+                    ip.take(i, self.ip_rates[i], self.ip_caps[i], now)
+                    ip.tokens[i] = min(ip.tokens[i], 0.0) - KICK_PENALTY
+            return KICK
+        return DROP
+
+    def _sweep(self, now):
+        """Xóa IP không còn kết nối và đã nạp đầy xô (giữ lại chẳng khác gì tạo mới)"""
+        stale = [ip for ip, state in self.ips.items()
+                 if state.connections <= 0 and now - state.last_seen >= self.refill]
+        for ip in stale:
+            del self.ips[ip]
+        self._sweep_at = max(1024, 2 * len(self.ips))
+
+    def __len__(self):
+        with self.lock:
+            return len(self.ips)
@@ -0,0 +1,50 @@
+import threading
+
+
+class ClientRegistry:
+    """
+    Danh sách kết nối dùng chung giữa các luồng (handler, scheduler, broadcast).
+    Mọi thao tác đều giữ khóa; duyệt danh sách thì lấy bản chụp (snapshot)
+    nên không bao giờ gặp lỗi "dictionary changed size during iteration".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {} # {kết nối: Player}
+
+    def add(self, client, info):
+        with self._lock:
+            self._clients[client] = info
+
+    def pop(self, client, default=None):
+        """Xóa và trả về bản ghi. Chỉ 1 luồng nhận được bản ghi nên việc dọn dẹp không bị chạy 2 lần"""
+        with self._lock:
+            return self._clients.pop(client, default)
+
+    def get(self, client, default=None):
+        with self._lock:
+            return self._clients.get(client, default)
+
+    def __getitem__(self, client):
+        with self._lock:
+            return self._clients[client]
+
+    def __contains__(self, client):
+        with self._lock:
+            return client in self._clients
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
+
+    def keys(self):
+        with self._lock:
+            return list(self._clients)
+
+    def values(self):
+        with self._lock:
+            return list(self._clients.values())
+
+    def items(self):
+        with self._lock:
+            return list(self._clients.items())
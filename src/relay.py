@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import itertools
+import sys
+import os
+import time
+
+# Relay cho khán giả: phòng có hàng chục nghìn người xem mà chỉ vài trăm người chơi.
+#
+# Relay là 1 tiến trình riêng (1 event loop). Khán giả kết nối vào relay như vào
+# server (LOGIN, "room"), relay mở 1 kết nối duy nhất lên trên cho mỗi (phòng, codec)
+# với "role": "spectator" rồi chuyển nguyên bytes mọi gói nhận được (QUESTION,
+# ROUND_RESULT, GAME_OVER, INFO...) cho các khán giả của nó: không giải mã lại,
+# không mã hóa lại, server chỉ thấy 1 khán giả thay cho cả nghìn người.
+# Phía trên có thể là server hoặc 1 relay khác -> ghép thành cây:
+#
+#   server <- relay A <- relay A1 <- khán giả
+#                     <- relay A2 <- khán giả
+#
+# Khán giả qua relay không trả lời được (ANSWER bị bỏ qua). Heartbeat chạy riêng
+# từng chặng: relay trả PONG cho PING của phía trên và tự PING khán giả im lặng.
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from protocol import FrameDecoder, RECV_SIZE, encode
+from codec import negotiate
+from room import normalize_room_id
+from outbox import AsyncOutbox, MAX_QUEUE_BYTES, WRITE_TIMEOUT
+from scheduler import AsyncioScheduler
+from registry import ClientRegistry
+from player import Player
+from heartbeat import HeartbeatMonitor, HEARTBEAT_INTERVAL, HEARTBEAT_TIMEOUT, PING, PONG
+from metrics import default_registry, serve_metrics
+from server import create_listener, HOST, PORT
+from logs import get_logger, setup_logging
+
+log = get_logger("relay")
+
+RELAY_PORT = 65433
+RECONNECT_DELAY = 0.5 # Chờ trước khi kết nối lại phía trên (tăng gấp đôi mỗi lần lỗi)
+RECONNECT_MAX = 8.0
+# Các gói chỉ dành cho chặng relay <-> phía trên, không chuyển xuống khán giả
+HOP_TYPES = ("LOGIN_OK", "PING", "PONG")
+
+
+class Upstream:
+    """1 kết nối lên phía trên cho 1 (phòng, codec), sống khi phòng còn khán giả trên relay"""
+
+    def __init__(self, relay, room_id, codec):
+        self.relay = relay
+        self.room_id = room_id
+        self.codec = codec
+        self.viewers = {} # {player.id: Player}
+        self.task = None
+        self.connected = False
+
+    def add(self, player):
+        self.viewers[player.id] = player
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._run())
+
+    def remove(self, player):
+        self.viewers.pop(player.id, None)
+        if not self.viewers and self.task is not None:
+            # Khán giả cuối cùng đã rời -> đóng kết nối lên trên
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        delay = RECONNECT_DELAY
+        while self.viewers:
+            try:
+                await self._session()
+                delay = RECONNECT_DELAY # Đã kết nối được -> lần lỗi sau chờ lại từ đầu
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                log.warning(" [%s] Mất kết nối phía trên: %s", self.room_id, e)
+            self.connected = False
+            if self.viewers:
+                self.relay.m_reconnects.inc()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+
+    async def _session(self):
+        relay = self.relay
+        reader, writer = await asyncio.open_connection(relay.upstream_host, relay.upstream_port)
+        try:
+            base, _, compress = self.codec.name.partition("+")
+            writer.write(encode({"type": "LOGIN", "name": relay.name, "room": self.room_id, "role": "spectator",
+                                 "codecs": [base], "compress": [compress] if compress else []}))
+            decoder = FrameDecoder()
+            timeout = None # Biết chu kỳ heartbeat của phía trên sau LOGIN_OK
+            pinged = False
+            while True:
+                try:
+                    data = await asyncio.wait_for(reader.read(RECV_SIZE), timeout)
+                except asyncio.TimeoutError:
+                    if pinged:
+                        raise # Đã PING mà phía trên vẫn im lặng
+                    pinged = True
+                    writer.write(encode(PING, self.codec))
+                    continue
+                if not data:
+                    return
+                pinged = False
+                relay.m_bytes_in.inc(len(data))
+                for message, frame in decoder.feed_frames(data):
+                    msg_type = message.get("type") if isinstance(message, dict) else None
+                    if msg_type == "PING":
+                        writer.write(encode(PONG, self.codec))
+                    elif msg_type == "LOGIN_OK":
+                        self.connected = True
+                        log.info(" [%s] Đã nối lên %s:%d (%s)", self.room_id, relay.upstream_host,
+                                 relay.upstream_port, self.codec.name)
+                        heartbeat = message.get("heartbeat")
+                        if isinstance(heartbeat, (int, float)) and heartbeat > 0:
+                            timeout = 2 * heartbeat
+                    elif msg_type not in HOP_TYPES:
+                        relay.fan_out(list(self.viewers.values()), frame)
+        finally:
+            writer.transport.abort()
+
+
+class RelayServer:
+    """Nhận khán giả, gom theo (phòng, codec), mỗi nhóm 1 Upstream"""
+
+    def __init__(self, upstream_host=HOST, upstream_port=PORT, host=HOST, port=RELAY_PORT,
+                 max_queue_bytes=MAX_QUEUE_BYTES, write_timeout=WRITE_TIMEOUT, heartbeat=HEARTBEAT_INTERVAL,
+                 heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self.upstream_host, self.upstream_port = upstream_host, upstream_port
+        self.server_socket = create_listener(host, port)
+        self.server_socket.setblocking(False)
+        self.host, self.port = self.server_socket.getsockname()[:2]
+        self.name = f"relay@{self.host}:{self.port}"
+
+        self.clients = ClientRegistry() # {StreamWriter: Player}
+        self._player_ids = itertools.count(1)
+        self.upstreams = {} # {(room_id, codec name): Upstream}
+        self.max_queue_bytes = max_queue_bytes
+        self.write_timeout = write_timeout
+        self.stats = {"evicted_high_water": 0, "evicted_timeout": 0, "reaped_idle": 0}
+
+        self.scheduler = AsyncioScheduler()
+        self.heartbeat = None
+        if heartbeat > 0:
+            self.heartbeat = HeartbeatMonitor(self.scheduler, self.clients.get, self._ping, self._reap_idle,
+                                              heartbeat, heartbeat_timeout)
+
+        self.metrics = default_registry()
+        m = self.metrics
+        self.m_connections = m.counter("relay_connections_total", "Số kết nối khán giả đã nhận")
+        self.m_bytes_in = m.counter("relay_bytes_in_total", "Số byte nhận từ phía trên")
+        self.m_frames_out = m.counter("relay_frames_out_total", "Số gói chuyển xuống khán giả")
+        self.m_bytes_out = m.counter("relay_bytes_out_total", "Số byte chuyển xuống khán giả")
+        self.m_reconnects = m.counter("relay_upstream_reconnects_total", "Số lần kết nối lại phía trên")
+        self.m_fan_out = m.histogram("relay_fan_out_seconds", "Thời gian chuyển 1 gói cho cả nhóm khán giả")
+        m.gauge("relay_viewers", "Số khán giả đang kết nối", fn=lambda: len(self.clients))
+        m.gauge("relay_upstreams", "Số kết nối lên phía trên",
+                fn=lambda: sum(up.connected for up in list(self.upstreams.values())))
+        m.gauge("relay_evicted", "Số khán giả bị ngắt vì nhận quá chậm",
+                fn=lambda: self.stats["evicted_high_water"] + self.stats["evicted_timeout"])
+        m.gauge("relay_reaped_idle", "Số kết nối bị đóng vì không trả lời PING", fn=lambda: self.stats["reaped_idle"])
+
+        print(f" Relay đang chạy tại {self.host}:{self.port}, phía trên {upstream_host}:{upstream_port}")
+
+    def fan_out(self, players, data):
+        """Chuyển nguyên bytes 1 gói cho cả nhóm"""
+        started = time.perf_counter()
+        for player in players:
+            reason = player.outbox.put(data)
+            if reason:
+                self.evict_client(player.conn, reason)
+        self.m_frames_out.inc(len(players))
+        self.m_bytes_out.inc(len(players) * len(data))
+        self.m_fan_out.observe(time.perf_counter() - started)
+
+    def send_to_client(self, player, message_dict):
+        reason = player.outbox.put(encode(message_dict, player.codec))
+        if reason:
+            self.evict_client(player.conn, reason)
+
+    def evict_client(self, writer, reason):
+        player = self.clients.get(writer)
+        if player is None:
+            return
+        self.stats["evicted_" + reason] += 1
+        log.warning(" Ngắt khán giả chậm %s (%s)", player.name, reason)
+        self.remove_client(writer)
+
+    def _ping(self, player):
+        self.send_to_client(player, PING)
+
+    def _reap_idle(self, writer):
+        if self.clients.get(writer) is not None:
+            self.stats["reaped_idle"] += 1
+            self.remove_client(writer)
+
+    def remove_client(self, writer):
+        player = self.clients.pop(writer, None)
+        if player is None:
+            return
+        player.outbox.close()
+        writer.transport.abort()
+        upstream = self.upstreams.get((player.room, player.codec.name))
+        if upstream is not None:
+            upstream.remove(player)
+            if not upstream.viewers:
+                del self.upstreams[(player.room, player.codec.name)]
+
+    def handle_message(self, writer, msg_obj):
+        player = self.clients.get(writer)
+        if player is None or not isinstance(msg_obj, dict):
+            return
+        player.last_seen = self.scheduler.time()
+        msg_type = msg_obj.get("type")
+
+        if msg_type == "LOGIN":
+            if player.room is not None:
+                return
+            player.name = msg_obj.get("name", "NoName")
+            player.room = normalize_room_id(msg_obj.get("room"))
+            player.id = next(self._player_ids)
+            player.spectator = True
+            player.codec = negotiate(msg_obj.get("codecs"), msg_obj.get("compress"))
+            login_ok = {"type": "LOGIN_OK", "message": "Chào mừng! (chỉ xem)", "room": player.room, "host": False,
+                        "codec": player.codec.name, "role": "spectator"}
+            if self.heartbeat is not None:
+                login_ok["heartbeat"] = self.heartbeat.interval
+            self.send_to_client(player, login_ok)
+            key = (player.room, player.codec.name)
+            upstream = self.upstreams.get(key)
+            if upstream is None:
+                upstream = self.upstreams[key] = Upstream(self, player.room, player.codec)
+            upstream.add(player)
+        elif msg_type == "START":
+            self.send_to_client(player, {"type": "ERROR", "message": "Khán giả không thể bắt đầu ván!"})
+        elif msg_type == "PING":
+            self.send_to_client(player, PONG)
+        # ANSWER, RESUME: khán giả không trả lời, không giữ chỗ -> bỏ qua
+
+    async def handle_client_async(self, reader, writer):
+        self.m_connections.inc()
+        outbox = AsyncOutbox(writer, self.evict_client, self.max_queue_bytes, self.write_timeout)
+        player = Player(conn=writer, addr=writer.get_extra_info("peername"), outbox=outbox)
+        self.clients.add(writer, player)
+        if self.heartbeat is not None:
+            self.heartbeat.watch(writer, player)
+
+        decoder = FrameDecoder()
+        try:
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data: break
+                for msg_obj in decoder.feed(data):
+                    self.handle_message(writer, msg_obj)
+        except:
+            pass
+        finally:
+            self.remove_client(writer)
+
+    async def serve(self):
+        self.scheduler.attach(asyncio.get_running_loop())
+        server = await asyncio.start_server(self.handle_client_async, sock=self.server_socket)
+        async with server:
+            await server.serve_forever()
+
+    def start(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("\nRelay shutting down...")
+        finally:
+            self.server_socket.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Network Quiz Battle relay (khán giả chỉ xem)")
+    parser.add_argument("--upstream-host", default=HOST, help="Server hoặc relay phía trên")
+    parser.add_argument("--upstream-port", type=int, default=PORT)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=RELAY_PORT)
+    parser.add_argument("--max-queue-bytes", type=int, default=MAX_QUEUE_BYTES,
+                        help="Số byte tối đa chờ gửi cho 1 khán giả trước khi ngắt")
+    parser.add_argument("--write-timeout", type=float, default=WRITE_TIMEOUT,
+                        help="Số giây tối đa 1 khán giả không nhận dữ liệu trước khi ngắt")
+    parser.add_argument("--heartbeat", type=float, default=HEARTBEAT_INTERVAL,
+                        help="Khán giả im lặng bao nhiêu giây thì gửi PING (0 = tắt)")
+    parser.add_argument("--heartbeat-timeout", type=float, default=HEARTBEAT_TIMEOUT,
+                        help="Số giây chờ trả lời PING trước khi đóng kết nối")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Mở http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(args.log_level)
+    relay = RelayServer(args.upstream_host, args.upstream_port, args.host, args.port, args.max_queue_bytes,
+                        args.write_timeout, args.heartbeat, args.heartbeat_timeout)
+    if args.metrics_port is not None:
+        serve_metrics(relay.metrics, args.metrics_port)
+        print(f" Số liệu đo: http://127.0.0.1:{args.metrics_port}/metrics")
+    relay.start()
@@ -0,0 +1,116 @@
+import threading
+
+from game_logic import GameLogic
+from columnar import ColumnarGameLogic
+
+DEFAULT_ROOM = "lobby" # Phòng mặc định khi client không gửi tên phòng
+MAX_ROOM_NAME = 32
+# Engine chấm điểm: "columnar" lưu người chơi trong mảng, dành cho phòng hàng chục nghìn người
+ENGINES = {"dict": GameLogic, "columnar": ColumnarGameLogic}
+
+
+def normalize_game_settings(message):
+    """Lấy chủ đề / độ khó / số câu hợp lệ từ gói START (bỏ qua giá trị sai kiểu)"""
+    settings = {}
+    for key in ("category", "difficulty"):
+        value = message.get(key)
+        if isinstance(value, (str, int)) and not isinstance(value, bool):
+            settings[key] = value
+    count = message.get("count")
+    if isinstance(count, int) and not isinstance(count, bool) and count > 0:
+        settings["count"] = count
+    return settings
+
+
+def normalize_room_id(raw):
+    """Chuẩn hóa tên phòng client gửi lên (rỗng -> phòng mặc định)"""
+    return str(raw or DEFAULT_ROOM).strip()[:MAX_ROOM_NAME] or DEFAULT_ROOM
+
+
+class Room:
+    """
+    1 phòng chơi = 1 ván đấu độc lập: có GameLogic, danh sách thành viên
+    và cờ trạng thái riêng. Mọi phòng dùng chung ngân hàng câu hỏi của Server,
+    mỗi ván bốc bộ câu hỏi riêng theo settings do chủ phòng chọn.
+    """
+
+    def __init__(self, room_id, bank, scheduler=None, engine=GameLogic, **game_options):
+        self.room_id = room_id
+        self.game = engine(bank=bank, scheduler=scheduler, **game_options)
+        self.settings = {} # {"category":..., "difficulty":..., "count":...} cho ván tới
+        self.members = {}  # {player_id: Player}
+        self.spectators = {} # {player_id: Player} chỉ xem: nhận câu hỏi/kết quả chung, không vào GameLogic
+        self.host = None   # Player tạo phòng, được quyền bắt đầu ván
+        self.is_game_running = False
+        self.phase = "WAITING" # WAITING -> QUESTION -> RESULT -> QUESTION ... -> WAITING
+        self.drain_pending = False # Đã hẹn người ghi chấm các câu trả lời đang chờ chưa
+        self.drain_requested = 0.0 # Thời điểm (perf_counter) hẹn lượt chấm đang chờ
+        self.prefetched = None # (số thứ tự câu, khóa, {Player đã nhận bản mã}) của câu gửi trước
+        self.journal = None # GameJournal của ván đang chơi (server chạy với --journal)
+        self.lock = threading.Lock()
+
+    def add_member(self, player):
+        """player: bản ghi Player (đã có id) của server"""
+        with self.lock:
+            self.members[player.id] = player
+            if self.host is None:
+                self.host = player
+        self.game.add_player(player.id, player.name, player)
+
+    def remove_member(self, player):
+        with self.lock:
+            self.members.pop(player.id, None)
+            if self.host is player:
+                # Chuyển quyền chủ phòng cho người vào sớm nhất còn lại
+                self.host = next(iter(self.members.values()), None)
+        self.game.remove_player(player.id)
+
+    def detach_member(self, player):
+        """Rớt mạng: bỏ khỏi danh sách nhận tin, nhưng GameLogic vẫn giữ điểm để kết nối lại"""
+        with self.lock:
+            self.members.pop(player.id, None)
+            if self.host is player:
+                self.host = next(iter(self.members.values()), None)
+        self.game.detach_player(player.id)
+
+    def reattach_member(self, player):
+        """Kết nối lại (cùng bản ghi, cùng id). False nếu người chơi đã bị xóa"""
+        if not self.game.reattach_player(player.id):
+            return False
+        with self.lock:
+            self.members[player.id] = player
+            if self.host is None:
+                self.host = player
+        return True
+
+    def member_list(self):
+        """Bản chụp danh sách thành viên (Player) để duyệt an toàn"""
+        with self.lock:
+            return list(self.members.values())
+
+    def add_spectator(self, player):
+        with self.lock:
+            self.spectators[player.id] = player
+
+    def remove_spectator(self, player):
+        with self.lock:
+            self.spectators.pop(player.id, None)
+
+    def spectator_list(self):
+        with self.lock:
+            return list(self.spectators.values())
+
+    def audience_list(self):
+        """Người chơi + khán giả: mọi người nhận gói tin phát cho cả phòng"""
+        with self.lock:
+            return list(self.members.values()) + list(self.spectators.values())
+
+    def is_empty(self):
+        """Không còn người chơi lẫn khán giả"""
+        with self.lock:
+            return not self.members and not self.spectators
+
+    def __repr__(self):
+        state = "đang chơi" if self.is_game_running else "đang chờ"
+        watching = f", {len(self.spectators)} khán giả" if self.spectators else ""
+        return f"<Room {self.room_id}: {len(self.members)} người{watching}, {state}>"
@@ -0,0 +1,112 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+# Bộ hẹn giờ dùng chung cho mọi phòng: 1 heap các deadline, phục vụ bởi 1 luồng
+# (hoặc bởi chính event loop ở chế độ async). Thay cho việc mỗi phòng/mỗi timer
+# tự tạo thread rồi time.sleep(1) để kiểm tra.
+
+
+class TimerHandle:
+    """Kết quả của call_at/call_later, dùng để hủy hẹn giờ"""
+
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        # Hủy kiểu "lười": phần tử vẫn nằm trong heap, tới hạn thì bị bỏ qua
+        self.cancelled = True
+
+
+class Scheduler:
+    """Heap deadline chạy trên 1 luồng riêng (chế độ server đa luồng)"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count() # Phá hòa khi 2 deadline trùng nhau
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def time(self):
+        return time.monotonic()
+
+    def call_at(self, when, callback, *args):
+        handle = TimerHandle(when, callback, args)
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._seq), handle))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            # Chỉ cần đánh thức luồng nếu deadline mới sớm hơn deadline đang chờ
+            if self._heap[0][2] is handle:
+                self._cond.notify()
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.time() + delay, callback, *args)
+
+    def call_soon(self, callback, *args):
+        """Chạy callback trên luồng scheduler ngay khi có thể (an toàn từ mọi luồng)"""
+        return self.call_at(self.time(), callback, *args)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - self.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                _, _, handle = heapq.heappop(self._heap)
+            if handle.cancelled:
+                continue
+            try:
+                handle.callback(*handle.args)
+            except Exception:
+                traceback.print_exc()
+
+
+class AsyncioScheduler:
+    """Cùng giao diện với Scheduler nhưng dùng timer heap sẵn có của event loop"""
+
+    def __init__(self, loop=None):
+        self.loop = loop
+
+    def attach(self, loop):
+        self.loop = loop
+
+    def time(self):
+        return self.loop.time()
+
+    def call_at(self, when, callback, *args):
+        return self.loop.call_at(when, callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        return self.loop.call_later(delay, callback, *args)
+
+    def call_soon(self, callback, *args):
+        # call_soon_threadsafe: lệnh admin có thể đến từ luồng console
+        return self.loop.call_soon_threadsafe(callback, *args)
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """Scheduler dùng chung của tiến trình (tạo khi cần lần đầu)"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = Scheduler()
+        return _default_scheduler
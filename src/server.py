@@ -1,235 +1,919 @@
 import socket
 import threading
-import json
 import time
 import sys
 import os
+import asyncio
+import argparse
+import itertools
 
 # --- IMPORT MODULES CỦA THÀNH VIÊN KHÁC ---
 # Thêm đường dẫn để import được file trong cùng thư mục src
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from game_logic import GameLogic
 from data_manager import DataManager
+from question_cache import default_question_cache
+from room import Room, ENGINES, DEFAULT_ROOM, normalize_room_id, normalize_game_settings
+from protocol import FrameDecoder, RECV_SIZE, encode
+from codec import negotiate
+from prefetch import KEY_SIZE, seal, pack_bytes
+from outbox import ThreadOutbox, AsyncOutbox, MAX_QUEUE_BYTES, WRITE_TIMEOUT
+from scheduler import Scheduler, AsyncioScheduler
+from registry import ClientRegistry
+from player import Player
+from session import SessionStore, RESUME_GRACE
+from heartbeat import HeartbeatMonitor, HEARTBEAT_INTERVAL, HEARTBEAT_TIMEOUT, PING, PONG
+from journal import (JournalStore, load_state, restore_game, players_in_order, pack_answers, JOURNAL_DIR,
+                     RECOVERY_PAUSE, JOIN, LEAVE, QUESTION, ANSWERS, RESULT, GAME_OVER)
+from ratelimit import RateLimiter, KICK, TRUSTED_IPS
+from metrics import default_registry, serve_metrics
+from logs import get_logger, setup_logging
+
+log = get_logger("server")
 
 # Cấu hình Server
 HOST = '127.0.0.1' # Hoặc '0.0.0.0' để chạy LAN
 PORT = 65432
+BACKLOG = 1024 # Hàng đợi kết nối chờ accept (cần lớn khi hàng nghìn client vào cùng lúc)
+RESULT_PAUSE = 3 # Số giây hiển thị kết quả trước câu tiếp theo
+LIVE_TOP = 10    # Số người trong bảng xếp hạng trực tiếp (ROUND_RESULT) gửi sau mỗi câu
+
+def create_listener(host, port):
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Tránh lỗi "Address already in use"
+    server_socket.bind((host, port))
+    server_socket.listen(BACKLOG)
+    return server_socket
 
 class QuizServer:
-    def __init__(self):
-        # 1. Khởi tạo kết nối mạng
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Tránh lỗi "Address already in use"
-        self.server_socket.bind((HOST, PORT))
-        self.server_socket.listen()
+    def __init__(self, host=HOST, port=PORT, max_queue_bytes=MAX_QUEUE_BYTES, write_timeout=WRITE_TIMEOUT, listen=True,
+                 resume_grace=RESUME_GRACE, engine="dict", time_bonus=0, heartbeat=HEARTBEAT_INTERVAL,
+                 heartbeat_timeout=HEARTBEAT_TIMEOUT, journal_dir=None, rate_limit=1.0, trusted_ips=TRUSTED_IPS):
+        # 1. Khởi tạo kết nối mạng (worker của cluster không tự listen, nhận kết nối từ tiến trình cha)
+        self.server_socket = None
+        self.host, self.port = host, port
+        if listen:
+            self.server_socket = create_listener(host, port)
+            self.host, self.port = self.server_socket.getsockname()[:2]
         
-        # 2. Quản lý Client: {client_socket: {"addr":..., "name":...}}
-        self.clients = {} 
+        # 2. Quản lý Client: {client_socket: Player} (an toàn khi nhiều luồng cùng thêm/xóa/duyệt).
+        # Cùng bản ghi Player nằm trong Room.members và GameLogic.players theo player.id
+        self.clients = ClientRegistry()
+        self._player_ids = itertools.count(1) # id số nguyên nhỏ cấp lúc LOGIN
+
+        # Hàng đợi gửi của từng client: giới hạn byte tồn và thời gian không nhận được
+        self.max_queue_bytes = max_queue_bytes
+        self.write_timeout = write_timeout
+        self.stats = {"evicted_high_water": 0, "evicted_timeout": 0, "reaped_idle": 0}
         
         # 3. Tích hợp Data & Logic (Core của Server)
         self.db = DataManager()
-        self.game = GameLogic(self.db)
-        
-        # Biến điều khiển vòng lặp game
-        self.is_game_running = False
+        # Ngân hàng câu hỏi có chỉ mục, dùng chung cho mọi phòng (nội dung đọc khi cần)
+        self.bank = self.db.question_bank()
+        # Gói QUESTION mã hóa sẵn, dùng chung giữa các phòng (LRU có giới hạn)
+        self.question_cache = default_question_cache()
+
+        # 4. Các phòng chơi: {room_id: Room}, mỗi phòng có GameLogic riêng.
+        # Mọi phòng chạy theo deadline trong 1 scheduler chung (không thread/phòng)
+        self.rooms = {}
+        self.scheduler = self._create_scheduler()
+        # Engine chấm điểm cho phòng mới (xem room.ENGINES); time_bonus chỉ engine columnar dùng
+        self.game_options = {"engine": ENGINES[engine]}
+        if time_bonus and engine == "columnar":
+            self.game_options["time_bonus"] = time_bonus
+        elif time_bonus:
+            log.warning("--time-bonus chỉ dùng được với --engine columnar, bỏ qua.")
+
+        # Phiên chơi theo token: rớt mạng giữa ván thì được giữ chỗ resume_grace giây (0 = tắt)
+        self.sessions = SessionStore(resume_grace)
+        # PING kết nối im lặng, đóng kết nối không trả lời (1 bánh xe hẹn giờ cho mọi kết nối, 0 = tắt)
+        self.heartbeat = None
+        if heartbeat > 0:
+            self.heartbeat = HeartbeatMonitor(self.scheduler, self.clients.get, self._ping, self._reap_idle,
+                                              heartbeat, heartbeat_timeout)
+        # Nhật ký từng ván để khôi phục khi server chết giữa ván (None = tắt, xem journal.py)
+        self.journal = JournalStore(journal_dir) if journal_dir else None
+        # Token bucket theo loại gói cho từng kết nối và từng IP, ngắt client spam (0 = tắt, xem ratelimit.py)
+        self.limiter = RateLimiter(rate_limit, trusted=trusted_ips) if rate_limit > 0 else None
+
+        # 5. Số liệu đo (xem bằng lệnh 'metrics' hoặc --metrics-port)
+        self.metrics = default_registry()
+        self._init_metrics()
+
+        if listen:
+            print(f" Server đang chạy tại {self.host}:{self.port}")
+            print(f" Đã tải dữ liệu: {len(self.bank)} câu hỏi.")
+            print(" Gõ 'start [phòng]' vào terminal này để bắt đầu game khi đủ người! ('rooms' để xem danh sách phòng)")
+            print(" Gõ 'stats' để xem hàng đợi gửi và số client bị ngắt, 'metrics' để xem số liệu đo.")
+
+    def _create_scheduler(self):
+        return Scheduler()
 
-        print(f" Server đang chạy tại {HOST}:{PORT}")
-        print(f" Đã tải dữ liệu: {self.game.total_questions} câu hỏi.")
-        print(" Gõ 'start' vào terminal này để bắt đầu game khi đủ người!")
+    def _init_metrics(self):
+        m = self.metrics
+        self.m_connections = m.counter("quiz_connections_total", "Số kết nối đã nhận")
+        self.m_disconnects = m.counter("quiz_disconnects_total", "Số kết nối đã đóng")
+        self.m_messages_in = m.counter("quiz_messages_in_total", "Số gói tin nhận từ client")
+        self.m_messages_out = m.counter("quiz_messages_out_total", "Số gói tin đưa vào hàng đợi gửi")
+        self.m_bytes_in = m.counter("quiz_bytes_in_total", "Số byte nhận từ client")
+        self.m_bytes_out = m.counter("quiz_bytes_out_total", "Số byte đưa vào hàng đợi gửi")
+        self.m_answers = m.counter("quiz_answers_total", "Số câu trả lời đã chấm")
+        self.m_broadcast = m.histogram("quiz_broadcast_seconds", "Thời gian phát 1 gói cho cả phòng (mã hóa + xếp hàng gửi)")
+        self.m_answer_latency = m.histogram("quiz_answer_latency_seconds",
+                                            "Từ lúc nhận ANSWER tới lúc chấm xong (câu chờ lâu nhất mỗi lượt chấm)")
+        self.m_transition = m.histogram("quiz_question_transition_seconds", "Thời gian chuẩn bị và phát 1 câu hỏi")
+        self.m_resumes = m.counter("quiz_resumes_total", "Số lần kết nối lại thành công bằng token")
+        self.m_resume_failures = m.counter("quiz_resume_failures_total", "Số lần RESUME thất bại (token sai/hết hạn)")
+        m.gauge("quiz_sessions_detached", "Số người chơi rớt mạng đang được giữ chỗ", fn=self.sessions.detached_count)
+        self.m_save_scores = m.histogram("quiz_save_scores_seconds", "Thời gian luồng game bị chặn khi lưu điểm cuối ván")
+        m.gauge("quiz_clients", "Số client đang kết nối", fn=lambda: len(self.clients))
+        m.gauge("quiz_rooms", "Số phòng đang mở", fn=lambda: len(self.rooms))
+        m.gauge("quiz_spectators", "Số khán giả (chỉ xem) đang kết nối",
+                fn=lambda: sum(len(room.spectators) for room in list(self.rooms.values())))
+        m.gauge("quiz_send_queue_bytes", "Tổng số byte đang chờ gửi",
+                fn=lambda: sum(player.outbox.depth() for player in self.clients.values()))
+        m.gauge("quiz_evicted_high_water", "Số client bị ngắt vì hàng đợi gửi đầy",
+                fn=lambda: self.stats["evicted_high_water"])
+        m.gauge("quiz_evicted_timeout", "Số client bị ngắt vì không nhận dữ liệu", fn=lambda: self.stats["evicted_timeout"])
+        m.gauge("quiz_reaped_idle", "Số kết nối bị đóng vì không trả lời PING", fn=lambda: self.stats["reaped_idle"])
+        if self.limiter is not None:
+            stats = self.limiter.stats
+            m.gauge("quiz_rate_limited", "Số gói tin bị bỏ vì vượt giới hạn tốc độ", fn=lambda: stats["dropped"])
+            m.gauge("quiz_kicked_flood", "Số client bị ngắt vì spam gói tin", fn=lambda: stats["kicked"])
+            m.gauge("quiz_refused_connections", "Số kết nối bị từ chối vì IP mở kết nối quá nhanh",
+                    fn=lambda: stats["refused"])
+            m.gauge("quiz_rate_limit_ips", "Số IP đang được theo dõi giới hạn tốc độ", fn=lambda: len(self.limiter))
+        m.gauge("quiz_question_cache_hits", "Số lần lấy câu hỏi từ cache", fn=lambda: self.question_cache.hits)
+        m.gauge("quiz_question_cache_misses", "Số lần phải mã hóa câu hỏi mới", fn=lambda: self.question_cache.misses)
 
     def broadcast(self, message_dict, exclude_socket=None):
-        """Gửi tin nhắn JSON cho TOÀN BỘ client"""
+        """Gửi tin nhắn cho TOÀN BỘ client"""
         try:
-            msg_bytes = json.dumps(message_dict).encode('utf-8')
-            for client_sock in list(self.clients.keys()):
+            frames = {} # Mỗi codec chỉ mã hóa 1 lần
+            sent = sent_bytes = 0
+            for client_sock, player in self.clients.items():
                 if client_sock != exclude_socket:
                     try:
-                        client_sock.sendall(msg_bytes)
+                        codec = player.codec
+                        if codec not in frames:
+                            frames[codec] = encode(message_dict, codec)
+                        self._send_bytes(player, frames[codec])
+                        sent += 1
+                        sent_bytes += len(frames[codec])
                     except:
                         self.remove_client(client_sock)
+            self.m_messages_out.inc(sent)
+            self.m_bytes_out.inc(sent_bytes)
         except Exception as e:
-            print(f" Broadcast Error: {e}")
+            log.error(" Broadcast Error: %s", e)
 
-    def send_to_client(self, client_socket, message_dict):
-        """Gửi tin nhắn cho 1 Client cụ thể"""
+    def broadcast_room(self, room, message_dict):
+        """Gửi tin nhắn cho mọi thành viên trong 1 phòng (mã hóa 1 lần cho mỗi codec)"""
+        self.broadcast_room_frames(room, lambda codec: encode(message_dict, codec))
+
+    def broadcast_room_frames(self, room, make_frame, alt=None):
+        """Gửi cho cả phòng gói tin do make_frame(codec) tạo ra. make_frame chỉ
+        được gọi 1 lần cho mỗi codec, mọi người cùng codec dùng chung 1 bytes.
+        alt = (tập Player, make_alt_frame): những người trong tập nhận gói khác.
+        Khán giả cũng nhận (câu hỏi, kết quả chung, bảng xếp hạng, thông báo)"""
+        self.send_frames(room.audience_list(), make_frame, alt)
+
+    def send_frames(self, players, make_frame, alt=None):
+        """Như broadcast_room_frames nhưng cho 1 danh sách Player bất kỳ"""
+        started = time.perf_counter()
+        frames = {}
+        alt_players, make_alt = alt or ((), None)
+        sent = sent_bytes = 0
+        for player in players:
+            key = (player.codec, player in alt_players)
+            data = frames.get(key)
+            if data is None:
+                data = frames[key] = (make_alt if key[1] else make_frame)(key[0])
+            self._send_bytes(player, data)
+            sent += 1
+            sent_bytes += len(data)
+        # Đếm 1 lần cho cả phòng, không khóa counter cho từng client
+        self.m_messages_out.inc(sent)
+        self.m_bytes_out.inc(sent_bytes)
+        self.m_broadcast.observe(time.perf_counter() - started)
+
+    def send_each(self, messages, shared=None):
+        """Gửi gói riêng cho nhiều người: [(Player, dict)], đếm số liệu 1 lần.
+        shared: gói chung đi trước mỗi gói riêng, mã hóa 1 lần cho mỗi codec và
+        ghép với gói riêng thành 1 lần gửi (1 lần vào hàng đợi) cho mỗi client"""
+        started = time.perf_counter()
+        frames = {}
+        sent = sent_bytes = 0
+        for player, message_dict in messages:
+            codec = player.codec
+            data = encode(message_dict, codec)
+            if shared is not None:
+                prefix = frames.get(codec)
+                if prefix is None:
+                    prefix = frames[codec] = encode(shared, codec)
+                data = prefix + data
+                sent += 1
+            self._send_bytes(player, data)
+            sent += 1
+            sent_bytes += len(data)
+        self.m_messages_out.inc(sent)
+        self.m_bytes_out.inc(sent_bytes)
+        if shared is not None:
+            self.m_broadcast.observe(time.perf_counter() - started)
+
+    def send_to_client(self, player, message_dict):
+        """Gửi tin nhắn cho 1 người chơi cụ thể"""
         try:
-            msg_bytes = json.dumps(message_dict).encode('utf-8')
-            client_socket.sendall(msg_bytes)
+            data = encode(message_dict, player.codec)
+            self._send_bytes(player, data)
+            self.m_messages_out.inc()
+            self.m_bytes_out.inc(len(data))
         except:
             pass
 
+    def _send_bytes(self, player, data):
+        """Đưa bytes vào hàng đợi gửi của người chơi, không chờ gửi xong
+        (đã rời phòng thì hàng đợi đã đóng, put không làm gì)"""
+        reason = player.outbox.put(data)
+        if reason:
+            self.evict_client(player.conn, reason)
+
+    def evict_client(self, client, reason):
+        """Ngắt client nhận quá chậm (hàng đợi đầy hoặc không nhận dữ liệu quá lâu)"""
+        player = self.clients.get(client)
+        if player is None:
+            return
+        self.stats["evicted_" + reason] += 1
+        log.warning(" Ngắt client chậm %s (%s)", player.name, reason)
+        self.remove_client(client)
+
+    def _ping(self, player):
+        self.send_to_client(player, PING)
+
+    def _reap_idle(self, client):
+        """Kết nối im lặng quá lâu (không trả lời PING): đóng như khi client ngắt"""
+        player = self.clients.get(client)
+        if player is None:
+            return
+        self.stats["reaped_idle"] += 1
+        log.info(" Đóng kết nối im lặng của %s", player.name)
+        self.remove_client(client)
+
+    def _kick_flooder(self, client, player):
+        """Client gửi gói tin quá nhanh liên tục: ngắt và không giữ chỗ để RESUME"""
+        log.warning(" Ngắt client spam %s %s", player.name, player.addr)
+        self._drop_session(player)
+        self.remove_client(client)
+
+    def _drop_session(self, player):
+        """Bỏ token của người chơi (không RESUME được nữa)"""
+        session = self.sessions.get(player.token) if player.token else None
+        if session is not None and session.player is player:
+            self.sessions.discard(session)
+
+    def get_metrics(self):
+        """Số liệu hàng đợi gửi: tổng/lớn nhất số byte đang chờ và số client bị ngắt"""
+        depths = [player.outbox.depth() for player in self.clients.values()]
+        metrics = {
+            "clients": len(depths),
+            "queue_bytes_total": sum(depths),
+            "queue_bytes_max": max(depths, default=0),
+        }
+        metrics.update(self.stats)
+        if self.limiter is not None:
+            metrics.update({"rate_limit_" + key: value for key, value in self.limiter.stats.items()})
+        metrics["question_cache_size"] = len(self.question_cache)
+        metrics["question_cache_hits"] = self.question_cache.hits
+        metrics["question_cache_misses"] = self.question_cache.misses
+        return metrics
+
+    def _close_client(self, client_socket):
+        # shutdown để đánh thức luồng gửi/nhận đang bị chặn trên socket này
+        try:
+            client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client_socket.close()
+
     def remove_client(self, client_socket):
         """Xử lý khi client ngắt kết nối"""
-        if client_socket in self.clients:
-            name = self.clients[client_socket]["name"]
-            print(f" {name} đã thoát.")
+        player = self.clients.pop(client_socket, None)
+        if player:
+            name = player.name
+            self.m_disconnects.inc()
+            log.debug(" %s đã thoát.", name)
             
             # Xóa khỏi Logic game và Danh sách mạng
-            self.game.remove_player(client_socket) 
-            del self.clients[client_socket]
-            client_socket.close()
-            
-            # Cập nhật số lượng người chơi cho mọi người
-            self.broadcast({"type": "INFO", "message": f"{name} đã rời phòng."})
+            player.outbox.close()
+            self._close_client(client_socket)
+            if self.limiter is not None:
+                self.limiter.close(player.limit)
+
+            room = self.rooms.get(player.room)
+            if room and player.spectator:
+                # Khán giả rời đi: không có điểm/lượt trả lời, không báo cả phòng
+                room.remove_spectator(player)
+                if room.is_empty() and not room.is_game_running:
+                    self._close_room(room)
+            elif room:
+                # Chỉ giữ chỗ khi ván đang chơi; rời phòng chờ thì rời hẳn (không chiếm chỗ lúc bắt đầu ván)
+                if player.token and room.is_game_running and self._detach(room, player):
+                    return # Giữ chỗ chờ kết nối lại, không báo cả phòng
+                self._drop_session(player)
+                room.remove_member(player)
+                self._journal(room, LEAVE, player.id)
+                if room.is_empty() and not room.is_game_running:
+                    self._close_room(room)
+                else:
+                    # Cập nhật số lượng người chơi cho mọi người trong phòng
+                    self.broadcast_room(room, {"type": "INFO", "message": f"{name} đã rời phòng."})
+                    # Người vừa thoát có thể là người cuối cùng chưa trả lời
+                    self._check_round_done(room)
+
+    def _detach(self, room, player):
+        """Người chơi rớt mạng: giữ điểm/hạng trong GameLogic, hẹn xóa sau thời gian chờ"""
+        session = self.sessions.detach(player.token, player, lambda s: self.scheduler.call_later(
+            self.sessions.grace, self._expire_session, s))
+        if session is None:
+            return False
+        room.detach_member(player)
+        # Không chờ người vừa rớt trả lời câu hiện tại
+        self._check_round_done(room)
+        return True
+
+    def _expire_session(self, session):
+        """Hết thời gian chờ mà chưa kết nối lại -> rời phòng như bình thường"""
+        if not self.sessions.expire(session):
+            return
+        room = session.room
+        room.remove_member(session.player)
+        self._journal(room, LEAVE, session.player.id)
+        if self.rooms.get(room.room_id) is not room:
+            return # Phòng đã đóng
+        if room.is_empty() and not room.is_game_running:
+            self._close_room(room)
+        else:
+            self.broadcast_room(room, {"type": "INFO", "message": f"{session.player.name} đã rời phòng."})
+            self._check_round_done(room)
+
+    def resume(self, player, msg_obj):
+        """RESUME {"token", "room"}: bản ghi Player cũ (đang tạm vắng) nhận kết nối mới.
+        player: bản ghi tạm của kết nối mới, bị thay bằng bản ghi cũ nếu thành công"""
+        token = msg_obj.get("token")
+        session = self.sessions.get(token) if isinstance(token, str) else None
+        if session is not None and not session.detached and self.clients.get(session.player.conn) is session.player:
+            # Kết nối cũ đứt nhưng server chưa phát hiện (half-open) -> đóng nó trước
+            self.remove_client(session.player.conn)
+        session = self.sessions.attach(token) if session else None
+        room = session.room if session else None
+        resumed = None
+        if session is not None and self.rooms.get(room.room_id) is room:
+            resumed = session.player
+            # Gắn kết nối mới trước khi vào lại danh sách nhận tin của phòng
+            resumed.conn, resumed.addr, resumed.outbox = player.conn, player.addr, player.outbox
+            resumed.limit = player.limit
+            if not room.reattach_member(resumed):
+                resumed = None
+        if resumed is None:
+            if session is not None:
+                self.sessions.discard(session)
+            self.m_resume_failures.inc()
+            self.send_to_client(player, {"type": "RESUME_FAILED", "message": "Phiên đã hết hạn, hãy đăng nhập lại."})
+            return
+
+        self.clients.add(resumed.conn, resumed)
+        if self.heartbeat is not None:
+            self.heartbeat.watch(resumed.conn, resumed)
+        codec = self._apply_client_options(resumed, msg_obj)
+        self.m_resumes.inc()
+        log.debug(" %s đã kết nối lại phòng %s.", resumed.name, room.room_id)
+        self.send_to_client(resumed, self._resume_snapshot(room, resumed, codec))
+
+    def _resume_snapshot(self, room, player, codec):
+        """Gói RESUME_OK: trạng thái hiện tại đủ để client vẽ lại màn hình (không gửi lại lịch sử)"""
+        game = room.game
+        snapshot = {"type": "RESUME_OK", "room": room.room_id, "host": room.host is player, "codec": codec.name,
+                    "token": player.token, "phase": room.phase, "score": game.players[player.id].score,
+                    "rank": game.get_rank(player.id), "total_players": len(game.players)}
+        if self.heartbeat is not None:
+            snapshot["heartbeat"] = self.heartbeat.interval
+        q_data = game.current_question_data
+        if room.phase == "QUESTION" and q_data is not None:
+            payload = self.question_cache.get(q_data).payload
+            snapshot["question"] = {"type": "QUESTION", "question": payload["text"], "options": payload["options"],
+                                    "question_number": game.current_q_index, "total_questions": game.total_questions,
+                                    "time_limit": game.time_left}
+            snapshot["answered"] = game.has_answered(player.id)
+        return snapshot
+
+    def _apply_client_options(self, player, msg_obj):
+        """Codec và prefetch client đề nghị trong LOGIN/RESUME"""
+        # Thỏa thuận codec: client không đề nghị -> JSON như cũ
+        player.codec = negotiate(msg_obj.get("codecs"), msg_obj.get("compress"))
+        # Client nhận được câu hỏi mã hóa gửi trước (PREFETCH/REVEAL)
+        player.prefetch = msg_obj.get("prefetch") is True
+        return player.codec
+
+    def register(self, conn, addr, outbox):
+        """Kết nối mới -> bản ghi Player (chưa có id, chưa vào phòng).
+        None nếu IP đang mở kết nối quá nhanh (người gọi đóng kết nối)"""
+        limit = None
+        if self.limiter is not None:
+            limit = self.limiter.open(addr, self.scheduler.time())
+            if limit is None:
+                log.debug(" Từ chối kết nối %s: mở kết nối quá nhanh", addr)
+                return None
+        player = Player(conn=conn, addr=addr, outbox=outbox)
+        player.limit = limit
+        self.clients.add(conn, player)
+        if self.heartbeat is not None:
+            self.heartbeat.watch(conn, player)
+        return player
+
+    def join_room(self, player, room_id):
+        """Đưa người chơi vào phòng (tạo phòng mới nếu chưa có)"""
+        room = self.rooms.get(room_id)
+        if room is None:
+            # setdefault: 2 người cùng tạo 1 phòng thì vẫn chỉ có 1 Room
+            new_room = Room(room_id, self.bank, self.scheduler, **self.game_options)
+            room = self.rooms.setdefault(room_id, new_room)
+            if room is new_room:
+                self._room_opened(room)
+        if player.id is None:
+            player.id = next(self._player_ids)
+        player.room = room_id
+        if player.spectator:
+            room.add_spectator(player)
+        else:
+            room.add_member(player)
+        return room
+
+    def _close_room(self, room):
+        if self.rooms.pop(room.room_id, None) is room:
+            self._room_closed(room)
+
+    def _room_opened(self, room):
+        """Hook: phòng vừa được tạo"""
+
+    def _room_closed(self, room):
+        """Hook: phòng vừa bị xóa (hết người và không còn chơi)"""
+
+    def room_of(self, player):
+        return self.rooms.get(player.room)
 
     def handle_client(self, client_socket, addr):
         """Luồng xử lý riêng cho từng người chơi"""
-        print(f"➕ Kết nối mới: {addr}")
-        self.clients[client_socket] = {"addr": addr, "name": "Unknown"}
+        log.debug("➕ Kết nối mới: %s", addr)
+        self.m_connections.inc()
+        outbox = ThreadOutbox(client_socket, self.max_queue_bytes, self.write_timeout, on_evict=self.evict_client)
+        if self.register(client_socket, addr, outbox) is None:
+            outbox.close()
+            self._close_client(client_socket)
+            return
 
+        # Buffer nhận dùng lại cho mọi lần recv, bộ tách gói giữ phần gói dở dang
+        recv_buf = bytearray(RECV_SIZE)
+        recv_view = memoryview(recv_buf)
+        decoder = FrameDecoder()
         try:
             while True:
-                data = client_socket.recv(1024)
-                if not data: break
+                n = client_socket.recv_into(recv_buf)
+                if not n: break
+                self.m_bytes_in.inc(n)
 
-                try:
-                    msg_obj = json.loads(data.decode('utf-8'))
-                    msg_type = msg_obj.get("type")
-
-                    # --- XỬ LÝ GÓI TIN TỪ CLIENT ---
-                    
-                    if msg_type == "LOGIN":
-                        # 1. Đăng nhập
-                        username = msg_obj.get("name", "NoName")
-                        self.clients[client_socket]["name"] = username
-                        
-                        # Thêm vào Logic Game
-                        self.game.add_player(client_socket, username)
-                        
-                        print(f" {username} đã tham gia.")
-                        self.send_to_client(client_socket, {"type": "LOGIN_OK", "message": "Chào mừng!"})
-                        self.broadcast({"type": "INFO", "message": f"{username} đã vào phòng chờ."})
-
-                    elif msg_type == "ANSWER":
-                        # 2. Nhận đáp án
-                        choice = msg_obj.get("answer") # Chú ý: UI gửi key là "answer"
-                        # Gọi Logic để chấm điểm
-                        score, is_correct, correct_ans = self.game.check_answer(client_socket, choice)
-                        # (Kết quả sẽ được gửi chung sau khi hết giờ, không gửi ngay để tránh lộ)
-
-                except json.JSONDecodeError:
-                    continue
+                for msg_obj in decoder.feed(recv_view[:n]):
+                    self.handle_message(client_socket, msg_obj)
+                if client_socket not in self.clients:
+                    break # Bị ngắt trong lúc xử lý (VD: spam), không đọc tiếp
         except:
             pass
         finally:
             self.remove_client(client_socket)
 
-    def game_loop(self):
-        """VÒNG LẶP TRÒ CHƠI (GAME LOOP) - Phần quan trọng nhất"""
-        print("\n GAME BẮT ĐẦU!")
-        self.is_game_running = True
-        
+    def handle_message(self, client, msg_obj):
+        """Xử lý 1 gói tin từ client (dùng chung cho cả 2 chế độ server)"""
+        msg_type = msg_obj.get("type")
+        self.m_messages_in.inc()
+        # Tra theo kết nối mỗi gói: sau RESUME kết nối này trỏ tới bản ghi Player cũ
+        player = self.clients.get(client)
+        if player is None:
+            return
+        now = player.last_seen = self.scheduler.time() # Còn sống (heartbeat)
+        if self.limiter is not None:
+            # Vượt giới hạn tốc độ: bỏ gói (spam liên tục thì ngắt kết nối)
+            verdict = self.limiter.check(player.limit, msg_type, now)
+            if verdict is not None:
+                if verdict == KICK:
+                    self._kick_flooder(client, player)
+                return
+
+        # --- XỬ LÝ GÓI TIN TỪ CLIENT ---
+
+        if msg_type == "LOGIN":
+            # 1. Đăng nhập (mỗi kết nối chỉ vào 1 phòng)
+            if player.room is not None:
+                return
+            username = msg_obj.get("name", "NoName")
+            room_id = normalize_room_id(msg_obj.get("room"))
+            player.name = username
+            # "role": "spectator" -> chỉ xem (VD: relay.py), không trả lời, không có trong GameLogic
+            player.spectator = msg_obj.get("role") == "spectator"
+            codec = self._apply_client_options(player, msg_obj)
+
+            # Thêm vào phòng (Logic Game của phòng đó), cấp id cho người chơi
+            room = self.join_room(player, room_id)
+
+            log.debug(" %s đã tham gia phòng %s.", username, room_id)
+            login_ok = {"type": "LOGIN_OK", "message": "Chào mừng!",
+                        "room": room_id, "host": room.host is player, "codec": codec.name}
+            if player.spectator:
+                # Khán giả không cần giữ chỗ: kết nối lại chỉ cần LOGIN lại
+                login_ok["role"] = "spectator"
+                if self.heartbeat is not None:
+                    login_ok["heartbeat"] = self.heartbeat.interval
+                self.send_to_client(player, login_ok)
+                return
+            if self.sessions.grace > 0:
+                # Token để kết nối lại (RESUME) nếu rớt mạng
+                login_ok["token"] = player.token = self.sessions.issue(room, player).token
+            if self.heartbeat is not None:
+                # Client biết server sẽ PING khi im lặng -> tự phát hiện server/kết nối chết
+                login_ok["heartbeat"] = self.heartbeat.interval
+            self._journal(room, JOIN, [player.id, username, player.token])
+            self.send_to_client(player, login_ok)
+            self.broadcast_room(room, {"type": "INFO", "message": f"{username} đã vào phòng chờ."})
+
+        elif msg_type == "RESUME":
+            # Kết nối lại bằng token thay cho LOGIN (mỗi kết nối chỉ vào 1 phòng)
+            if player.room is None:
+                self.resume(player, msg_obj)
+
+        elif msg_type == "START":
+            # Chủ phòng bấm bắt đầu ván
+            room = self.room_of(player)
+            if room is None:
+                return
+            if room.host is not player:
+                self.send_to_client(player, {"type": "ERROR", "message": "Chỉ chủ phòng mới được bắt đầu!"})
+            else:
+                # Tùy chọn: "category", "difficulty", "count" để bốc bộ câu hỏi cho ván
+                self.start_room(room, normalize_game_settings(msg_obj))
+
+        elif msg_type == "ANSWER":
+            # 2. Nhận đáp án
+            room = self.room_of(player)
+            if room is None or player.spectator:
+                return # Khán giả không được trả lời
+            choice = msg_obj.get("answer") # Chú ý: UI gửi key là "answer"
+            # Xếp hàng cho người ghi của phòng chấm điểm (không chấm trên luồng nhận)
+            room.game.submit_answer(player.id, choice)
+            if not room.drain_pending:
+                room.drain_pending = True
+                room.drain_requested = time.perf_counter() # Câu trả lời đầu tiên của lượt chấm này
+                self.scheduler.call_soon(self._drain_answers, room)
+            # (Kết quả sẽ được gửi chung sau khi hết giờ, không gửi ngay để tránh lộ)
+
+        elif msg_type == "PING":
+            # Client kiểm tra kết nối khi server im lặng lâu
+            self.send_to_client(player, PONG)
+        # PONG: không cần làm gì, last_seen đã được cập nhật ở trên
+
+    # --- VÒNG ĐỜI 1 VÁN (chạy theo deadline trên scheduler) ---
+    # start_room -> _game_start -> _next_question -> (hết giờ | mọi người đã trả lời)
+    #   -> _end_question -> nghỉ RESULT_PAUSE -> _next_question ... -> _finish_game
+    # Mọi bước đều chạy trên luồng scheduler (hoặc event loop), nên 1 phòng không bao giờ
+    # bị 2 bước chạy song song.
+
+    def _game_start(self, room):
+        if self._begin_game(room):
+            self._next_question(room)
+
+    def _next_question(self, room):
+        if not room.is_game_running:
+            self._finish_game(room)
+            return
+        # 1-3. Lấy câu hỏi tiếp theo và gửi cho tất cả
+        started = time.perf_counter()
+        time_limit = self._send_next_question(room)
+        self.m_transition.observe(time.perf_counter() - started)
+        if time_limit is None:
+            self._finish_game(room) # Hết câu hỏi -> Kết thúc
+            return
+
+        # 4. Hẹn giờ hết thời gian trả lời
+        room.phase = "QUESTION"
+        q_no = room.game.current_q_index
+        room.game.start_timer(time_limit, lambda: self._end_question(room, q_no))
+
+    def _drain_answers(self, room):
+        """Người ghi duy nhất của phòng: chấm mọi câu trả lời đang chờ trong 1 lượt"""
+        # Hạ cờ trước khi chấm: câu trả lời tới sau đó sẽ hẹn 1 lượt chấm mới
+        requested = room.drain_requested
+        room.drain_pending = False
+        results = room.game.process_answers()
+        if results:
+            self.m_answers.inc(len(results))
+            self.m_answer_latency.observe(time.perf_counter() - requested)
+            self._journal_answers(room, results)
+        self._check_round_done(room)
+
+    def _journal(self, room, kind, payload):
+        """Ghi 1 sự kiện vào journal của ván đang chơi (nếu có)"""
+        if room.journal is not None:
+            room.journal.record(kind, payload)
+
+    def _journal_answers(self, room, results):
+        """1 bản ghi ANSWERS cho cả lượt chấm: chỉ những câu trả lời được nhận"""
+        if room.journal is None:
+            return
+        accepted = [pid for pid, _, _, reason in results if reason and reason != "ALREADY_ANSWERED"]
+        if accepted:
+            room.journal.record(ANSWERS, pack_answers(room.game.answers_of(accepted)))
+
+    def _check_round_done(self, room):
+        """Gọi sau mỗi câu trả lời/mỗi lần có người rời phòng"""
+        if room.phase == "QUESTION" and room.game.check_all_answered():
+            self.scheduler.call_soon(self._end_question, room, room.game.current_q_index, True)
+
+    def _end_question(self, room, q_no, early=False):
+        # Bỏ qua nếu câu này đã được kết thúc (hết giờ và "đủ người trả lời" đến cùng lúc)
+        if room.phase != "QUESTION" or room.game.current_q_index != q_no:
+            return
+        room.phase = "RESULT"
+        room.game.stop_timer()
+        self._journal_answers(room, room.game.close_question())
+        self._journal(room, RESULT, q_no)
+        if room.journal is not None:
+            room.journal.maybe_snapshot()
+        if early:
+            log.info("⚡ [%s] Tất cả đã trả lời sớm!", room.room_id)
+
+        # 5. Gửi KẾT QUẢ
+        self._send_results(room)
+        # Tranh thủ lúc nghỉ: gửi trước câu tiếp theo (đã mã hóa)
+        self._prefetch_next(room)
+
+        # Nghỉ RESULT_PAUSE giây trước câu tiếp theo
+        self.scheduler.call_later(RESULT_PAUSE, self._next_question, room)
+
+    def _begin_game(self, room):
+        """Reset trạng thái để bắt đầu ván mới. Trả về False nếu không thể bắt đầu"""
+        log.info(" [%s] GAME BẮT ĐẦU!", room.room_id)
+        room.is_game_running = True
+        room.prefetched = None
+
         # Gọi logic bắt đầu
-        success, msg = self.game.start_game()
+        success, msg = room.game.start_game(**room.settings)
         if not success:
-            print(f" Không thể bắt đầu: {msg}")
-            self.is_game_running = False
+            log.warning(" [%s] Không thể bắt đầu: %s", room.room_id, msg)
+            room.is_game_running = False
+        elif self.journal is not None:
+            # Thứ tự = thứ tự trên bảng xếp hạng (người bằng điểm) sau khi reset điểm
+            tokens = self.sessions.tokens_in(room)
+            players = [[pid, info.name, tokens.get(pid)] for pid, info in room.game.get_leaderboard()]
+            room.journal = self.journal.open_game(room.room_id, room.settings, room.game.questions, players)
+        return success
+
+    def _send_next_question(self, room):
+        """Gửi câu hỏi tiếp theo cho cả phòng. Trả về thời gian trả lời, hoặc None nếu hết câu"""
+        game = room.game
+        # 1. Lấy câu hỏi tiếp theo
+        is_over, question_payload = game.next_question()
+
+        if is_over:
+            return None
+        self._journal(room, QUESTION, [game.current_q_index, question_payload.get("time_limit", 15)])
+
+        # 2. Gói QUESTION theo chuẩn UI Client yêu cầu
+        # (type, question, options, question_number, total_questions, time_limit):
+        # phần nội dung câu hỏi lấy từ cache đã mã hóa sẵn, chỉ ghép thêm số thứ tự
+        time_limit = question_payload.get("time_limit", 15)
+        q_data, q_no, total = game.current_question_data, game.current_q_index, game.total_questions
+        make_frame = lambda codec: self.question_cache.frame(q_data, q_no, total, time_limit, codec)
+
+        # Ai đã nhận câu này (mã hóa) trong lúc nghỉ thì chỉ cần khóa để mở
+        alt = None
+        prefetched, room.prefetched = room.prefetched, None
+        if prefetched and prefetched[0] == q_no:
+            _, key, recipients = prefetched
+            make_reveal = lambda codec: encode(
+                {"type": "REVEAL", "question_number": q_no, "key": pack_bytes(key, codec)}, codec)
+            alt = (recipients, make_reveal)
+
+        # 3. Gửi câu hỏi cho cả phòng
+        log.info(" [%s] Đang gửi câu hỏi %d...", room.room_id, game.current_q_index)
+        self.broadcast_room_frames(room, make_frame, alt)
+        return time_limit
+
+    def _prefetch_next(self, room):
+        """Gửi trước câu tiếp theo (đã mã hóa, khóa giữ ở server) cho các client hỗ trợ prefetch"""
+        room.prefetched = None
+        game = room.game
+        if game.current_q_index >= game.total_questions:
             return
+        recipients = [player for player in room.member_list() if player.prefetch]
+        if not recipients:
+            return
+        # Bản rõ = đúng thân gói QUESTION mà _send_next_question sẽ gửi (theo codec của
+        # client, đã nén nếu cần); mọi codec dùng chung 1 khóa, mỗi lần mã hóa 1 nonce mới
+        q_data = game.questions[game.current_q_index]
+        q_no, total = game.current_q_index + 1, game.total_questions
+        time_limit = self.question_cache.get(q_data).payload["time_limit"]
+        key = os.urandom(KEY_SIZE)
 
-        # Vòng lặp từng câu hỏi
-        while self.is_game_running:
-            # 1. Lấy câu hỏi tiếp theo
-            is_over, question_payload = self.game.next_question()
-            
-            if is_over:
-                break # Hết câu hỏi -> Kết thúc
-            
-            # 2. Format dữ liệu cho đúng chuẩn UI Client yêu cầu
-            # UI cần: type, question, options, question_number, total_questions
-            client_payload = {
-                "type": "QUESTION",
-                "question": question_payload["text"],
-                "options": question_payload["options"],
-                "question_number": self.game.current_q_index,
-                "total_questions": self.game.total_questions,
-                "time_limit": question_payload.get("time_limit", 15)
-            }
-            
-            # 3. Gửi câu hỏi cho tất cả
-            print(f" Đang gửi câu hỏi {self.game.current_q_index}...")
-            self.broadcast(client_payload)
-            
-            # 4. Đếm ngược (Thời gian trả lời)
-            time_limit = question_payload.get("time_limit", 10)
-            for i in range(time_limit, 0, -1):
-                # (Optional) Có thể gửi tick thời gian nếu muốn
-                time.sleep(1)
-                # Kiểm tra nếu tất cả đã trả lời thì skip
-                if self.game.check_all_answered():
-                    print("⚡ Tất cả đã trả lời sớm!")
-                    break
-            
-            # 5. Gửi KẾT QUẢ (Sau khi hết giờ)
-            print(" Hết giờ! Đang gửi kết quả...")
-            
-            # Duyệt từng người để gửi kết quả riêng (Vì điểm số khác nhau)
-            for player_sock in list(self.clients.keys()):
-                player_info = self.game.players.get(player_sock)
-                if player_info:
-                    # Lấy thông tin đáp án đúng hiện tại từ Logic
-                    current_q_data = self.game.current_question_data
-                    correct_ans = current_q_data["answer"]
-                    
-                    # Logic kiểm tra xem user này đúng hay sai (để UI hiện màu đỏ/xanh)
-                    # Lưu ý: Logic đã tính điểm lúc nhận ANSWER rồi, giờ chỉ cần lấy Score tổng
-                    
-                    # Gửi gói tin RESULT
-                    # Cần xác định user này trả lời đúng hay sai ở câu vừa rồi để UI hiện
-                    # Tuy nhiên, server đơn giản hóa bằng cách gửi đáp án đúng, UI tự so sánh nếu cần
-                    # Hoặc tốt nhất: Server báo luôn Đúng/Sai.
-                    
-                    # (Ở đây ta gửi đáp án đúng và bảng điểm, UI sẽ tự hiện)
-                    res_payload = {
-                        "type": "RESULT",
-                        "correct_answer": correct_ans, # Đáp án đúng (VD: "A")
-                        "score": player_info["score"], # Tổng điểm hiện tại
-                        "correct": False # UI sẽ cần logic này, nhưng tạm thời gửi chung
-                    }
-                    # *Nâng cao: Để biết chính xác user đó đúng hay sai, cần lưu history trong Logic
-                    # Tạm thời gửi đáp án đúng về cho Client tự so sánh với lựa chọn của mình
-                    
-                    self.send_to_client(player_sock, res_payload)
-            
-            # Nghỉ 3 giây trước câu tiếp theo
-            time.sleep(3)
+        def make_frame(codec):
+            _, blob = seal(self.question_cache.body(q_data, q_no, total, time_limit, codec), key)
+            return encode({"type": "PREFETCH", "question_number": q_no, "data": pack_bytes(blob, codec)}, codec)
 
+        self.send_frames(recipients, make_frame)
+        room.prefetched = (q_no, key, set(recipients))
+
+    def _send_results(self, room):
+        """Gửi kết quả câu vừa rồi: 1 gói chung cho cả phòng + 1 gói nhỏ riêng cho từng người"""
+        log.info(" [%s] Hết giờ! Đang gửi kết quả...", room.room_id)
+
+        # Phần chung (đáp án đúng, số người chọn mỗi đáp án, top 10): mã hóa 1 lần mỗi codec
+        game = room.game
+        top = [{"name": info.name, "score": info.score} for _, info in game.get_top(LIVE_TOP)]
+        shared = {"type": "ROUND_RESULT", "question_number": game.current_q_index,
+                  "correct_answer": game.current_question_data["answer"],
+                  "distribution": game.round_summary(), "top": top, "total_players": len(game.players)}
+
+        # Phần riêng: đúng/sai, điểm được cộng, tổng điểm, hạng (vài chục byte mỗi người),
+        # ghép sau phần chung -> mỗi người 1 lần gửi
+        members = {player.id: player for player in room.member_list()}
+        self.send_each(((members[pid], {"type": "RESULT", "correct": correct, "points": points, "score": score,
+                                        "rank": rank})
+                        for pid, correct, points, score, rank in game.round_results(members)),
+                       shared)
+        # Khán giả chỉ nhận phần chung (cùng 1 bytes cho mọi người cùng codec)
+        spectators = room.spectator_list()
+        if spectators:
+            self.send_frames(spectators, lambda codec: encode(shared, codec))
+
+    def _finish_game(self, room):
+        """Gửi bảng xếp hạng và lưu điểm khi kết thúc ván"""
         # --- KẾT THÚC GAME ---
-        print(" Game Over!")
-        leaderboard = self.game.get_leaderboard()
-        
+        log.info(" [%s] Game Over!", room.room_id)
+        leaderboard = room.game.get_leaderboard()
+
         # Format bảng xếp hạng cho Client
-        # leaderboard từ logic trả về list các tuple: [(sock, info), ...]
+        # leaderboard từ logic trả về list các tuple: [(player_id, Player), ...]
         leaderboard_data = []
-        for sock, info in leaderboard:
-            leaderboard_data.append({"name": info["name"], "score": info["score"]})
-            
-            # Lưu điểm cao (Gọi DataManager)
-            self.db.save_score(info["name"], info["score"])
+        for pid, info in leaderboard:
+            leaderboard_data.append({"name": info.name, "score": info.score})
+
+        # Đóng journal trước khi lưu điểm: khởi động lại sau đó không chơi lại (và lưu lại) ván này
+        if room.journal is not None:
+            room.journal.record(GAME_OVER, None)
+            room.journal.close()
+            room.journal = None
+
+        # Lưu điểm cao (Gọi DataManager)
+        self.save_scores(leaderboard_data)
 
         end_msg = {
             "type": "GAME_OVER",
             "message": "Trò chơi kết thúc!",
             "leaderboard": leaderboard_data
         }
-        self.broadcast(end_msg)
-        self.is_game_running = False
+        self.broadcast_room(room, end_msg)
+        room.is_game_running = False
+        room.phase = "WAITING"
+        if room.is_empty():
+            self._close_room(room)
+
+    # --- KHÔI PHỤC VÁN TỪ JOURNAL (khởi động lại sau khi server chết giữa ván) ---
+    def recover_journals(self):
+        """Dựng lại mọi ván chưa xong trong thư mục journal"""
+        if self.journal is None:
+            return
+        for path in self.journal.active():
+            self.recover_journal(path)
+
+    def recover_journal(self, path):
+        """Dựng lại 1 phòng từ ảnh chụp + đuôi journal: người chơi được giữ chỗ như vừa rớt
+        mạng (RESUME bằng token cũ), ván chơi tiếp sau RECOVERY_PAUSE giây"""
+        started = time.perf_counter()
+        try:
+            state, end, replayed = load_state(path)
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            log.error(" Không đọc được journal %s: %s", path, e)
+            self.journal.archive(path)
+            return None
+        if state.room is None or state.finished or state.room in self.rooms:
+            self.journal.archive(path)
+            return None
+
+        room = Room(state.room, self.bank, self.scheduler, **self.game_options)
+        self.rooms[room.room_id] = room
+        self._room_opened(room)
+        expire = lambda s: self.scheduler.call_later(self.sessions.grace, self._expire_session, s)
+        for pid, (name, token, _, _) in players_in_order(state):
+            player = Player(pid, name)
+            player.room = room.room_id
+            room.add_member(player)
+            room.detach_member(player) # Chưa ai kết nối lại
+            if token and self.sessions.grace > 0:
+                player.token = token
+                self.sessions.restore(token, room, player, expire)
+        restore_game(state, room.game)
+        self._reserve_player_ids(max(state.players, default=0))
+        room.journal = self.journal.resume(path, state, end)
+        room.is_game_running = True
+        room.phase = "RESULT" # Chưa mở lại câu hỏi: RESUME_OK chỉ có điểm/hạng
+        log.info(" [%s] Khôi phục ván từ journal: %d người chơi, câu %d/%d, đọc lại %d bản ghi trong %.1f ms",
+                 room.room_id, len(state.players), state.q_index, len(state.questions), replayed,
+                 (time.perf_counter() - started) * 1000)
+        self.scheduler.call_later(RECOVERY_PAUSE, self._continue_game, room, state.question_open)
+        return room
+
+    def _reserve_player_ids(self, max_id):
+        """id cấp sau này không trùng id của người chơi khôi phục từ journal"""
+        self._player_ids = itertools.count(max(next(self._player_ids), max_id + 1))
+
+    def _continue_game(self, room, reopen):
+        """Hết RECOVERY_PAUSE: mở lại câu đang dở (giữ các câu trả lời đã chấm) hoặc sang câu tiếp"""
+        if room.phase != "RESULT":
+            return
+        if reopen and room.is_game_running and room.game.current_question_data is not None:
+            self._reopen_question(room)
+        else:
+            self._next_question(room)
+
+    def _reopen_question(self, room):
+        game = room.game
+        q_data, q_no, total = game.current_question_data, game.current_q_index, game.total_questions
+        time_limit = self.question_cache.get(q_data).payload["time_limit"]
+        game.question_open = True
+        self._journal(room, QUESTION, [q_no, time_limit])
+        log.info(" [%s] Mở lại câu hỏi %d...", room.room_id, q_no)
+        self.broadcast_room_frames(room, lambda codec: self.question_cache.frame(q_data, q_no, total, time_limit,
+                                                                                codec))
+        room.phase = "QUESTION"
+        game.start_timer(time_limit, lambda: self._end_question(room, q_no))
+
+    def save_scores(self, entries):
+        """Lưu điểm của cả ván: entries = [{"name":..., "score":...}]"""
+        # 1 lần xếp hàng cho cả ván, luồng nền của DataManager ghi xuống đĩa
+        started = time.perf_counter()
+        self.db.save_scores(entries)
+        self.m_save_scores.observe(time.perf_counter() - started)
 
     def admin_input_loop(self):
         """Luồng lắng nghe lệnh từ Admin (Server Console)"""
         while True:
-            cmd = input()
-            if cmd.strip().lower() == "start":
-                if not self.is_game_running:
-                    # Chạy Game Loop trong luồng riêng để không chặn input
-                    threading.Thread(target=self.game_loop).start()
-                else:
-                    print(" Game đang chạy rồi!")
-            elif cmd.strip().lower() == "stop":
-                self.is_game_running = False
-                print(" Đang dừng game...")
+            try:
+                cmd = input()
+            except EOFError:
+                return # stdin bị đóng (chạy nền) -> bỏ qua console
+            self.admin_command(cmd)
+
+    def admin_command(self, cmd):
+        """Thực hiện 1 lệnh admin: start/stop [phòng], rooms, stats, metrics"""
+        parts = cmd.strip().split(maxsplit=1)
+        if not parts:
+            return
+        action = parts[0].lower()
+        room_id = parts[1] if len(parts) > 1 else DEFAULT_ROOM
+
+        if action == "start":
+            room = self.rooms.get(room_id)
+            if room is None:
+                print(f" Không có phòng '{room_id}'!")
+            else:
+                self.start_room(room)
+        elif action == "stop":
+            room = self.rooms.get(room_id)
+            if room:
+                room.is_game_running = False
+                print(f" Đang dừng game phòng {room_id}...")
+        elif action == "rooms":
+            for room in list(self.rooms.values()):
+                print(f"   {room}")
+        elif action == "stats":
+            for key, value in self.get_metrics().items():
+                print(f"   {key}: {value}")
+            for metric in self.metrics:
+                if metric.kind == "histogram":
+                    print(f"   {metric.name}: {metric.summary()}")
+        elif action == "metrics":
+            print(self.metrics.render(), end="")
+
+    def start_room(self, room, settings=None):
+        """Bắt đầu ván của 1 phòng (nếu phòng chưa chơi)"""
+        if room.is_game_running:
+            print(f" Phòng {room.room_id} đang chơi rồi!")
+            return
+        if settings is not None:
+            room.settings = settings
+        room.is_game_running = True
+        self.scheduler.call_soon(self._game_start, room)
 
     def start(self):
+        # 0. Ván đang dở lúc server chết (--journal)
+        self.recover_journals()
+
         # 1. Luồng Admin Input
         threading.Thread(target=self.admin_input_loop, daemon=True).start()
         
@@ -245,6 +929,133 @@ class QuizServer:
         finally:
             self.server_socket.close()
 
+
+class AsyncQuizServer(QuizServer):
+    """
+    Server chạy trên 1 event loop (asyncio): mọi kết nối và game loop
+    dùng chung 1 luồng, không tạo thread cho từng client.
+    """
+
+    def __init__(self, host=HOST, port=PORT, max_queue_bytes=MAX_QUEUE_BYTES, write_timeout=WRITE_TIMEOUT, listen=True,
+                 resume_grace=RESUME_GRACE, engine="dict", time_bonus=0, heartbeat=HEARTBEAT_INTERVAL,
+                 heartbeat_timeout=HEARTBEAT_TIMEOUT, journal_dir=None, rate_limit=1.0, trusted_ips=TRUSTED_IPS):
+        super().__init__(host, port, max_queue_bytes, write_timeout, listen, resume_grace, engine, time_bonus,
+                         heartbeat, heartbeat_timeout, journal_dir, rate_limit, trusted_ips)
+        if self.server_socket:
+            self.server_socket.setblocking(False)
+        self.loop = None
+
+    def _close_client(self, writer):
+        # abort: bỏ dữ liệu tồn thay vì chờ gửi hết cho client chậm
+        writer.transport.abort()
+
+    async def handle_client_async(self, reader, writer, initial_data=b""):
+        """Coroutine xử lý 1 người chơi (thay cho handle_client).
+        initial_data: bytes đã được đọc trước (kết nối do tiến trình cha chuyển sang)"""
+        addr = writer.get_extra_info("peername")
+        log.debug("➕ Kết nối mới: %s", addr)
+        self.m_connections.inc()
+        outbox = AsyncOutbox(writer, self.evict_client, self.max_queue_bytes, self.write_timeout)
+        if self.register(writer, addr, outbox) is None:
+            outbox.close()
+            self._close_client(writer)
+            return
+
+        decoder = FrameDecoder()
+        try:
+            self.m_bytes_in.inc(len(initial_data))
+            for msg_obj in decoder.feed(initial_data):
+                self.handle_message(writer, msg_obj)
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data: break
+                self.m_bytes_in.inc(len(data))
+
+                for msg_obj in decoder.feed(data):
+                    self.handle_message(writer, msg_obj)
+                if writer not in self.clients:
+                    break # Bị ngắt trong lúc xử lý (VD: spam), không đọc tiếp
+        except:
+            pass
+        finally:
+            self.remove_client(writer)
+
+    def _create_scheduler(self):
+        # Dùng timer heap của event loop, gắn loop khi serve() chạy
+        return AsyncioScheduler()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.scheduler.attach(self.loop)
+        self.recover_journals()
+        server = await asyncio.start_server(self.handle_client_async, sock=self.server_socket)
+        threading.Thread(target=self.admin_input_loop, daemon=True).start()
+        async with server:
+            await server.serve_forever()
+
+    def start(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("\nServer shutting down...")
+        finally:
+            if self.server_socket:
+                self.server_socket.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Network Quiz Battle server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--mode", choices=["thread", "async"], default="thread",
+                        help="thread: 1 luồng/kết nối; async: 1 event loop cho mọi kết nối")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số tiến trình worker (>1: chạy cluster nhiều core, mỗi worker là 1 event loop)")
+    parser.add_argument("--max-queue-bytes", type=int, default=MAX_QUEUE_BYTES,
+                        help="Số byte tối đa chờ gửi cho 1 client trước khi ngắt")
+    parser.add_argument("--write-timeout", type=float, default=WRITE_TIMEOUT,
+                        help="Số giây tối đa 1 client không nhận dữ liệu trước khi ngắt")
+    parser.add_argument("--resume-grace", type=float, default=RESUME_GRACE,
+                        help="Số giây giữ chỗ cho người chơi rớt mạng để kết nối lại bằng token (0 = tắt)")
+    parser.add_argument("--heartbeat", type=float, default=HEARTBEAT_INTERVAL,
+                        help="Client im lặng bao nhiêu giây thì gửi PING (0 = tắt, không đóng kết nối im lặng)")
+    parser.add_argument("--heartbeat-timeout", type=float, default=HEARTBEAT_TIMEOUT,
+                        help="Số giây chờ trả lời PING trước khi đóng kết nối")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="dict",
+                        help="columnar: lưu người chơi trong mảng, chấm cả lượt 1 lần (phòng rất đông)")
+    parser.add_argument("--time-bonus", type=int, default=0,
+                        help="Điểm thưởng tối đa khi trả lời đúng ngay lúc mở câu (chỉ --engine columnar)")
+    parser.add_argument("--journal", nargs="?", const=JOURNAL_DIR, default=None, metavar="DIR",
+                        help=f"Ghi nhật ký từng ván để khôi phục khi server chết giữa ván (mặc định {JOURNAL_DIR})")
+    parser.add_argument("--rate-limit", type=float, default=1.0,
+                        help="Hệ số nhân các giới hạn tốc độ gói tin (xem ratelimit.py; 2 = nới gấp đôi, 0 = tắt)")
+    parser.add_argument("--trusted-ip", action="append", default=None, metavar="IP",
+                        help="IP chỉ giới hạn theo từng kết nối, không theo IP (lặp lại được, mặc định loopback)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Mở http://127.0.0.1:<port>/metrics (cluster: worker i dùng port + i)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="DEBUG in cả từng câu trả lời / kết nối (chậm khi đông người)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    server = QuizServer()
-    server.start()
\ No newline at end of file
+    args = parse_args()
+    setup_logging(args.log_level)
+    if args.workers > 1:
+        from cluster import ClusterServer
+        server = ClusterServer(args.workers, args.host, args.port, metrics_port=args.metrics_port,
+                               max_queue_bytes=args.max_queue_bytes, write_timeout=args.write_timeout,
+                               resume_grace=args.resume_grace, engine=args.engine, time_bonus=args.time_bonus,
+                               heartbeat=args.heartbeat, heartbeat_timeout=args.heartbeat_timeout,
+                               journal_dir=args.journal, rate_limit=args.rate_limit,
+                               trusted_ips=args.trusted_ip or TRUSTED_IPS)
+    else:
+        server_cls = AsyncQuizServer if args.mode == "async" else QuizServer
+        server = server_cls(args.host, args.port, args.max_queue_bytes, args.write_timeout,
+                            resume_grace=args.resume_grace, engine=args.engine, time_bonus=args.time_bonus,
+                            heartbeat=args.heartbeat, heartbeat_timeout=args.heartbeat_timeout,
+                            journal_dir=args.journal, rate_limit=args.rate_limit,
+                            trusted_ips=args.trusted_ip or TRUSTED_IPS)
+        if args.metrics_port is not None:
+            serve_metrics(server.metrics, args.metrics_port)
+            print(f" Số liệu đo: http://127.0.0.1:{args.metrics_port}/metrics")
+    server.start()
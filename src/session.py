@@ -0,0 +1,100 @@
+import secrets
+import threading
+
+# Phiên chơi để kết nối lại giữa ván mà không mất điểm.
+#
+# LOGIN_OK trả về "token". Khi kết nối TCP bị đứt, người chơi KHÔNG bị xóa khỏi
+# GameLogic mà chỉ "tạm vắng" (detach) trong RESUME_GRACE giây. Trong thời gian đó
+# client mở kết nối mới và gửi RESUME {"token", "room"}: server gắn lại trạng thái
+# cũ (bản ghi Player: điểm, hạng, câu đã trả lời) vào socket mới và gửi 1 gói RESUME_OK gọn (câu
+# hỏi hiện tại, thời gian còn lại, điểm, hạng), không phát INFO cho cả phòng.
+# Hết thời gian chờ mà không quay lại thì người chơi mới bị xóa như trước.
+
+RESUME_GRACE = 30.0 # Số giây giữ chỗ cho người chơi bị rớt mạng
+
+
+class Session:
+    __slots__ = ("token", "room", "player", "expire_handle")
+
+    def __init__(self, token, room, player):
+        self.token = token
+        self.room = room        # Room (kiểm tra lại khi RESUME: phòng có thể đã bị đóng)
+        self.player = player    # Bản ghi Player (giữ nguyên qua các lần kết nối lại)
+        self.expire_handle = None # Khác None khi đang tạm vắng
+
+    @property
+    def detached(self):
+        return self.expire_handle is not None
+
+
+class SessionStore:
+    """token -> Session. Dùng chung giữa các luồng handler và scheduler"""
+
+    def __init__(self, grace=RESUME_GRACE):
+        self.grace = grace
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def issue(self, room, player):
+        session = Session(secrets.token_urlsafe(16), room, player)
+        with self._lock:
+            self._sessions[session.token] = session
+        return session
+
+    def detach(self, token, player, expire_handle_factory):
+        """Kết nối của player vừa đứt: giữ chỗ, hẹn hết hạn. Trả về Session hoặc None"""
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None or session.player is not player or session.detached:
+                return None
+            session.expire_handle = expire_handle_factory(session)
+            return session
+
+    def restore(self, token, room, player, expire_handle_factory):
+        """Server vừa khôi phục ván từ journal: người chơi cũ được giữ chỗ như vừa rớt mạng"""
+        session = Session(token, room, player)
+        with self._lock:
+            self._sessions[token] = session
+            session.expire_handle = expire_handle_factory(session)
+        return session
+
+    def tokens_in(self, room):
+        """{player.id: token} của mọi người có phiên trong phòng (kể cả đang tạm vắng)"""
+        with self._lock:
+            return {s.player.id: s.token for s in self._sessions.values() if s.room is room}
+
+    def attach(self, token):
+        """RESUME: nhận lại phiên đang tạm vắng. Trả về Session hoặc None"""
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None or not session.detached:
+                return None
+            session.expire_handle.cancel()
+            session.expire_handle = None
+            return session
+
+    def expire(self, session):
+        """Hết thời gian chờ: xóa phiên nếu vẫn chưa quay lại. Trả về True nếu đã xóa"""
+        with self._lock:
+            if not session.detached or self._sessions.get(session.token) is not session:
+                return False
+            del self._sessions[session.token]
+            return True
+
+    def discard(self, session):
+        """Bỏ phiên không dùng được nữa (VD: phòng đã đóng)"""
+        with self._lock:
+            if self._sessions.get(session.token) is session:
+                del self._sessions[session.token]
+
+    def get(self, token):
+        with self._lock:
+            return self._sessions.get(token)
+
+    def detached_count(self):
+        with self._lock:
+            return sum(1 for s in self._sessions.values() if s.detached)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
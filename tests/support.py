@@ -0,0 +1,58 @@
+"""Đồ dùng chung cho test: server thật trong tiến trình, client giả (không có socket)"""
+import contextlib
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import server as server_module
+from protocol import FrameDecoder
+
+
+class FakeOutbox:
+    """Hàng đợi gửi giả: giải mã lại mọi gói server gửi để test đọc"""
+
+    def __init__(self):
+        self.decoder = FrameDecoder()
+        self.messages = []
+
+    def put(self, data):
+        self.messages.extend(self.decoder.feed(data))
+        return None
+
+    def depth(self):
+        return 0
+
+    def close(self):
+        pass
+
+    def of_type(self, msg_type):
+        return [m for m in self.messages if m.get("type") == msg_type]
+
+
+class FakeClient:
+    """Đứng thay socket: server chỉ cần dùng nó làm khóa và gọi shutdown/close"""
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_server(cls=server_module.QuizServer, **kwargs):
+    """Server không listen, không heartbeat/giới hạn tốc độ (client giả không trả lời PING)"""
+    kwargs.setdefault("heartbeat", 0)
+    kwargs.setdefault("rate_limit", 0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return cls(listen=False, **kwargs)
+
+
+def login(srv, name, room_id):
+    """Client giả LOGIN vào phòng: (client, outbox)"""
+    client, outbox = FakeClient(), FakeOutbox()
+    srv.register(client, None, outbox)
+    srv.handle_message(client, {"type": "LOGIN", "name": name, "room": room_id})
+    return client, outbox
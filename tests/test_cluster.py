@@ -0,0 +1,166 @@
+import asyncio
+import itertools
+import os
+import socket
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol import FrameDecoder, encode
+from cluster import ClusterServer, RoomDirectory, WorkerServer
+
+_addrs = itertools.count(1)
+
+
+class RoomDirectoryTest(unittest.TestCase):
+    def test_close_crossing_a_routed_connection_keeps_owner(self):
+        directory = RoomDirectory(2)
+        index, seq = directory.route("r")
+        self.assertTrue(directory.closed(index, "r", seq))
+
+        index, first = directory.route("r")
+        _, second = directory.route("r") # Chuyển đi trong lúc worker đang báo đóng phòng
+        self.assertFalse(directory.closed(index, "r", first))
+        self.assertEqual(directory.owner["r"], index)
+        self.assertTrue(directory.closed(index, "r", second))
+        self.assertNotIn("r", directory.owner)
+        self.assertEqual(directory.counts, [0, 0])
+
+    def test_conflicting_open_is_reported(self):
+        directory = RoomDirectory(2)
+        owner = directory.pick("r")
+        other = 1 - owner
+        self.assertEqual(directory.opened(other, "r"), owner)
+        self.assertFalse(directory.closed(other, "r", 0)) # Báo đóng của phòng bị từ chối không nhả phòng
+        self.assertEqual(directory.owner["r"], owner)
+
+
+class Client:
+    """Người chơi thật qua socketpair, đi qua ClusterServer.route như kết nối TCP"""
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.messages = []
+        self.closed = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def open(cls, parent, *messages):
+        ours, theirs = socket.socketpair()
+        theirs.setblocking(False)
+        ours.sendall(b"".join(encode(m) for m in messages))
+        asyncio.ensure_future(parent.route(theirs, ("test", next(_addrs))))
+        return cls(*await asyncio.open_connection(sock=ours))
+
+    async def _read(self):
+        decoder = FrameDecoder()
+        while True:
+            data = await self.reader.read(65536)
+            if not data:
+                return
+            self.messages.extend(decoder.feed(data))
+
+    def got(self, msg_type):
+        return any(m.get("type") == msg_type for m in self.messages)
+
+    def close(self):
+        self.writer.close()
+
+
+def login(name, room_id):
+    return {"type": "LOGIN", "name": name, "room": room_id}
+
+
+@unittest.skipUnless(hasattr(socket, "send_fds"), "cần socket.send_fds (Linux)")
+class ClusterRoutingTest(unittest.TestCase):
+    """Tiến trình cha và 2 worker chạy chung 1 event loop (không fork), kênh IPC thật"""
+
+    def run_cluster(self, scenario):
+        async def main():
+            loop = asyncio.get_running_loop()
+            parent = ClusterServer.__new__(ClusterServer)
+            parent.directory = RoomDirectory(2)
+            parent.pending_scores = [[], []]
+            parent.channels, workers = [], []
+            for index in range(2):
+                parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+                parent.channels.append(parent_end)
+                workers.append(WorkerServer(index, child_end, heartbeat=0, rate_limit=0))
+                loop.add_reader(parent_end, parent.on_worker_message, index)
+            tasks = [loop.create_task(worker.serve()) for worker in workers]
+            try:
+                await scenario(parent, workers)
+            finally:
+                # Như khi tiến trình cha thoát: worker nhận EOF trên kênh IPC rồi dừng
+                for channel in parent.channels:
+                    loop.remove_reader(channel)
+                    channel.close()
+                await asyncio.wait_for(asyncio.gather(*tasks), 5)
+                for worker in workers:
+                    worker.channel.close()
+        asyncio.run(main())
+
+    async def until(self, cond, timeout=5.0):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not cond():
+            if loop.time() > deadline:
+                self.fail("Hết thời gian chờ")
+            await asyncio.sleep(0.005)
+
+    def holders(self, workers, room_id):
+        return [w.index for w in workers if room_id in w.rooms]
+
+    def test_concurrent_close_and_reopen_stays_on_one_worker(self):
+        async def scenario(parent, workers):
+            for delay in range(8):
+                # Phòng phụ ở worker 0, phòng "r" ở worker 1: nhả cả 2 thì "r" mới sẽ về worker 0
+                filler = await Client.open(parent, login("f", "filler"))
+                first = await Client.open(parent, login("a", "r"))
+                await self.until(lambda: filler.got("LOGIN_OK") and first.got("LOGIN_OK"))
+                self.assertEqual(self.holders(workers, "r"), [1])
+
+                # Người cuối rời phòng trong lúc người mới đang vào cùng phòng đó
+                filler.close()
+                first.close()
+                for _ in range(delay):
+                    await asyncio.sleep(0)
+                newcomers = [await Client.open(parent, login(f"n{i}", "r")) for i in range(3)]
+                await self.until(lambda: all(c.got("LOGIN_OK") for c in newcomers))
+
+                await self.until(lambda: "filler" not in parent.directory.owner)
+                holders = self.holders(workers, "r")
+                self.assertEqual(len(holders), 1, f"delay={delay}: phòng bị tách {holders}")
+                self.assertEqual(parent.directory.owner["r"], holders[0])
+                self.assertEqual(len(workers[holders[0]].rooms["r"].members), 3)
+
+                for c in newcomers:
+                    c.close()
+                await self.until(lambda: not parent.directory.owner and not any(w.rooms for w in workers))
+                self.assertEqual(parent.directory.counts, [0, 0])
+        self.run_cluster(scenario)
+
+    def test_room_opened_on_wrong_worker_is_rejected(self):
+        async def scenario(parent, workers):
+            filler = await Client.open(parent, login("f", "filler"))
+            owner = await Client.open(parent, login("a", "r"))
+            await self.until(lambda: filler.got("LOGIN_OK") and owner.got("LOGIN_OK"))
+            self.assertEqual(parent.directory.owner["r"], 1)
+
+            # Gói đầu không có phòng -> cha chuyển theo phòng mặc định (worker 0), LOGIN sau đó vào "r"
+            stray = await Client.open(parent, {"type": "PING"}, login("b", "r"))
+            await asyncio.wait_for(stray.closed, 5)
+            self.assertTrue(stray.got("ERROR"))
+            await self.until(lambda: "r" not in workers[0].rooms)
+            self.assertEqual(self.holders(workers, "r"), [1])
+            self.assertEqual(parent.directory.owner["r"], 1)
+            self.assertEqual(len(workers[1].rooms["r"].members), 1)
+            filler.close()
+            owner.close()
+            await self.until(lambda: not parent.directory.owner)
+        self.run_cluster(scenario)
+
+
+if __name__ == "__main__":
+    unittest.main()
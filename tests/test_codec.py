@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+import unittest
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from codec import BINARY_FLAG, FLAG_MSGPACK, FLAG_ZLIB, CodecError, decode_body, unpackb
+from protocol import HEADER, FrameDecoder, encode
+
+
+def frame(body):
+    return HEADER.pack(len(body)) + body
+
+
+class HostileBodyTest(unittest.TestCase):
+    def test_deeply_nested_json(self):
+        with self.assertRaises(CodecError):
+            decode_body(b"[" * 100000)
+
+    def test_deeply_nested_compressed_json(self):
+        with self.assertRaises(CodecError):
+            decode_body(bytes([BINARY_FLAG | FLAG_ZLIB]) + zlib.compress(b"[" * 100000))
+
+    def test_invalid_utf8_json(self):
+        with self.assertRaises(CodecError):
+            decode_body(b'{"type": "\xff\xfe"}')
+
+    def test_deeply_nested_msgpack(self):
+        with self.assertRaises(CodecError):
+            unpackb(b"\x91" * 100000)
+
+    def test_unhashable_msgpack_key(self):
+        with self.assertRaises(CodecError):
+            unpackb(bytes([0x81, 0x91, 0x01, 0x02])) # {[1]: 2}
+
+    def test_non_object_message(self):
+        for body in (b"[1, 2]", b"5", b'"PING"', bytes([BINARY_FLAG | FLAG_MSGPACK, 0x92, 0x01, 0x02])):
+            with self.assertRaises(CodecError):
+                decode_body(body)
+
+    def test_decoder_skips_hostile_frames(self):
+        data = (frame(b"[" * 100000) + frame(b"[1, 2]") + frame(b'{"a": "\xff"}')
+                + frame(bytes([BINARY_FLAG | FLAG_MSGPACK, 0x81, 0x91, 0x01, 0x02])) + encode({"type": "PING"}))
+        self.assertEqual(FrameDecoder().feed(data), [{"type": "PING"}])
+
+    def test_valid_json_still_decodes(self):
+        message = {"type": "ANSWER", "answer": "Ê", "nested": [[[1]]]}
+        self.assertEqual(decode_body(json.dumps(message).encode("utf-8")), message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from room import ENGINES
+
+# Câu có 6 phương án, đáp án đúng ngoài A..D
+QUESTIONS = [
+    {"id": 1, "question": "Q1", "options": {k: f"{k}1" for k in "ABCDEF"}, "answer": "E"},
+    {"id": 2, "question": "Q2", "options": {k: f"{k}2" for k in "ABCDEF"}, "answer": "B"},
+    {"id": 3, "question": "Q3", "options": {k: f"{k}3" for k in "ABCDEFGH"}, "answer": "H"},
+]
+# Mỗi người: đáp án cho từng câu (kể cả chữ thường, có khoảng trắng, ngoài số phương án, không hợp lệ)
+ANSWERS = {
+    1: ["E", "B", "H"],
+    2: ["e", " b ", "h"],
+    3: ["F", "F", "G"],
+    4: ["A", "Z", "1"],
+    5: ["D", "B", None],
+}
+
+
+def play(engine):
+    game = ENGINES[engine](questions=[dict(q) for q in QUESTIONS])
+    for pid in ANSWERS:
+        game.add_player(pid, f"p{pid}")
+    game.start_game()
+    rounds = []
+    for r in range(len(QUESTIONS)):
+        game.next_question()
+        for pid, choices in ANSWERS.items():
+            if choices[r] is not None:
+                game.submit_answer(pid, choices[r])
+        results = sorted((pid, score, correct, key) for pid, score, correct, key in game.process_answers())
+        rounds.append({"results": results, "summary": game.round_summary(),
+                       "answers": sorted(tuple(a) for a in game.answers_of(list(ANSWERS))),
+                       "all_answered": game.check_all_answered()})
+    scores = {pid: game.players[pid].score for pid in ANSWERS}
+    top = [(pid, player.name, player.score) for pid, player in game.get_top(10)]
+    return rounds, scores, game.get_rank(1), top
+
+
+class EngineParityTest(unittest.TestCase):
+    def test_more_than_four_options(self):
+        rounds, scores, rank, top = play("dict")
+        self.assertEqual(scores, {1: 30, 2: 30, 3: 0, 4: 0, 5: 10})
+        self.assertEqual(rounds[0]["summary"], {"A": 1, "B": 0, "C": 0, "D": 1, "E": 2, "F": 1})
+
+        col_rounds, col_scores, col_rank, col_top = play("columnar")
+        self.assertEqual(col_scores, scores)
+        self.assertEqual(col_rank, rank)
+        self.assertEqual(col_top, top)
+        for r, (expected, actual) in enumerate(zip(rounds, col_rounds)):
+            self.assertEqual(actual["results"], expected["results"], f"câu {r + 1}")
+            self.assertEqual(actual["summary"], expected["summary"], f"câu {r + 1}")
+            self.assertEqual(actual["all_answered"], expected["all_answered"], f"câu {r + 1}")
+            # Đáp án hợp lệ ghi lại giống nhau (journal); đáp án không phải chữ cái thì columnar ghi "?"
+            self.assertEqual([a for a in actual["answers"] if a[1] != "?"],
+                             [a for a in expected["answers"] if a[1].isalpha() and len(a[1]) == 1], f"câu {r + 1}")
+
+
+if __name__ == "__main__":
+    unittest.main()
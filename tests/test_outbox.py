@@ -0,0 +1,85 @@
+import socket
+import threading
+import time
+import unittest
+
+from support import make_server
+from outbox import SocketWriter, ThreadOutbox
+
+
+def wait(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def fill(outbox, chunk=b"x" * 65536):
+    """Gửi tới khi socket đầy và hàng đợi có dữ liệu tồn"""
+    while outbox.depth() == 0:
+        assert outbox.put(chunk) is None
+
+
+class StalledPeerTest(unittest.TestCase):
+    def setUp(self):
+        self.writer = SocketWriter(check_interval=0.05)
+        self.ours, self.peer = socket.socketpair()
+        self.evicted = []
+        self.done = threading.Event()
+
+    def tearDown(self):
+        self.ours.close()
+        self.peer.close()
+
+    def on_evict(self, sock, reason):
+        self.evicted.append((sock, reason))
+        self.done.set()
+
+    def test_peer_that_never_reads_is_evicted_without_more_puts(self):
+        outbox = ThreadOutbox(self.ours, max_bytes=4 << 20, write_timeout=0.2, writer=self.writer,
+                              on_evict=self.on_evict)
+        fill(outbox)
+        # Không put() thêm: chỉ luồng ghi chung phát hiện được client treo
+        self.assertTrue(self.done.wait(3), "client không nhận dữ liệu không bị ngắt")
+        self.assertEqual(self.evicted, [(self.ours, "timeout")])
+        self.assertTrue(outbox.closed)
+        self.assertEqual(outbox.depth(), 0)
+        # Socket đã được gỡ khỏi selector (chỉ còn socket đánh thức)
+        self.assertTrue(wait(lambda: len(self.writer.selector.get_map()) == 1))
+
+    def test_slow_reader_is_not_evicted(self):
+        outbox = ThreadOutbox(self.ours, max_bytes=4 << 20, write_timeout=0.5, writer=self.writer,
+                              on_evict=self.on_evict)
+        fill(outbox)
+        total = outbox.depth()
+        received = 0
+        self.peer.settimeout(1.0)
+        while not (outbox.depth() == 0 and received >= total):
+            time.sleep(0.05) # Chậm nhưng vẫn nhận trong write_timeout
+            received += len(self.peer.recv(65536))
+        self.assertFalse(self.done.is_set())
+        self.assertFalse(outbox.closed)
+
+
+class ServerEvictionTest(unittest.TestCase):
+    def test_stalled_client_is_removed_from_server(self):
+        srv = make_server(write_timeout=0.2)
+        ours, peer = socket.socketpair()
+        try:
+            outbox = ThreadOutbox(ours, srv.max_queue_bytes, srv.write_timeout, writer=SocketWriter(0.05),
+                                  on_evict=srv.evict_client)
+            srv.register(ours, None, outbox)
+            srv.handle_message(ours, {"type": "LOGIN", "name": "treo", "room": "r"})
+            fill(outbox)
+            self.assertTrue(wait(lambda: ours not in srv.clients, 3))
+            self.assertEqual(srv.stats["evicted_timeout"], 1)
+            self.assertNotIn("r", srv.rooms)
+        finally:
+            ours.close()
+            peer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from support import make_server, login
+
+
+class LobbyDisconnectTest(unittest.TestCase):
+    def setUp(self):
+        self.srv = make_server()
+        self.host, self.host_box = login(self.srv, "an", "lobby")
+        self.guest, _ = login(self.srv, "binh", "lobby")
+        self.room = self.srv.rooms["lobby"]
+
+    def test_lobby_disconnect_leaves_room(self):
+        guest = self.srv.clients.get(self.guest)
+        self.srv.remove_client(self.guest)
+
+        self.assertNotIn(guest.id, self.room.members)
+        self.assertNotIn(guest.id, self.room.game.players)
+        self.assertEqual(self.srv.sessions.detached_count(), 0)
+        self.assertIsNone(self.srv.sessions.get(guest.token)) # Token không RESUME được nữa
+        self.assertIn("binh đã rời phòng.", [m["message"] for m in self.host_box.of_type("INFO")])
+
+    def test_lobby_disconnect_of_last_player_closes_room(self):
+        self.srv.remove_client(self.guest)
+        self.srv.remove_client(self.host)
+        self.assertNotIn("lobby", self.srv.rooms)
+        self.assertEqual(len(self.srv.sessions), 0)
+
+    def test_disconnect_mid_game_keeps_seat(self):
+        guest = self.srv.clients.get(self.guest)
+        self.room.is_game_running = True
+        self.srv.remove_client(self.guest)
+
+        self.assertIn(guest.id, self.room.game.players)
+        self.assertEqual(self.srv.sessions.detached_count(), 1)
+        self.assertNotIn("binh đã rời phòng.", [m["message"] for m in self.host_box.of_type("INFO")])
+
+
+if __name__ == "__main__":
+    unittest.main()